@@ -0,0 +1,106 @@
+import itertools, threading, time, uuid
+import datetime as dt
+from concurrent.futures import ThreadPoolExecutor
+from agent import run_agent
+
+
+class QueueFull(RuntimeError):
+    pass
+
+
+class Job:
+    """One agent run. `events` grows while the run is in flight; read it with events_since()."""
+
+    def __init__(self, job_id: str, prompt: str):
+        self.id = job_id
+        self.prompt = prompt
+        self.status = "queued"          # queued -> running -> done | failed
+        self.outcome: str | None = None  # done | failed, set before on_done; status follows after it
+        self.events: list[dict] = []
+        self.result: dict | None = None
+        self.error: str | None = None
+        self.trace_file: str | None = None
+        self.created = dt.datetime.now().isoformat(timespec="seconds")
+        self.started: str | None = None
+        self.finished: str | None = None
+        self._lock = threading.Lock()
+
+    def add_event(self, step: dict) -> None:
+        with self._lock:
+            self.events.append({"seq": len(self.events), "at": time.time(), **step})
+
+    def events_since(self, seq: int = 0) -> list[dict]:
+        with self._lock:
+            return self.events[seq:]
+
+
+class AgentExecutor:
+    """
+    Runs agents on a bounded thread pool. submit() returns a job id at once;
+    at most `max_workers` runs execute concurrently and at most `max_pending`
+    wait behind them (QueueFull beyond that). Steps stream into Job.events as
+    the agent emits them; on_done(job) runs on the worker after each run,
+    before the job's status leaves "running" (it can read job.outcome), so
+    a finished job is always fully recorded.
+    """
+
+    def __init__(self, max_workers: int = 4, max_pending: int = 64, run=run_agent, on_done=None,
+                 keep_finished: int = 200):
+        self.max_pending = max_pending
+        self.keep_finished = keep_finished
+        self._run = run
+        self._on_done = on_done
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="agent")
+        self._jobs: dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+
+    def submit(self, prompt: str) -> str:
+        with self._lock:
+            if sum(j.status in ("queued", "running") for j in self._jobs.values()) >= self.max_pending:
+                raise QueueFull(f"{self.max_pending} agent runs already pending")
+            job = Job(f"{next(self._seq):04d}-{uuid.uuid4().hex[:6]}", prompt)
+            self._jobs[job.id] = job
+            self._prune()
+        self._pool.submit(self._execute, job)
+        return job.id
+
+    def _execute(self, job: Job) -> None:
+        job.status = "running"
+        job.started = dt.datetime.now().isoformat(timespec="seconds")
+        try:
+            job.result = self._run(job.prompt, on_step=job.add_event)
+            job.outcome = "done"
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            job.outcome = "failed"
+        job.finished = dt.datetime.now().isoformat(timespec="seconds")
+        if self._on_done:
+            try:
+                self._on_done(job)
+            except Exception as e:
+                job.error = f"on_done failed: {e}"
+        job.status = job.outcome
+
+    def _prune(self) -> None:
+        finished = [j for j in self._jobs.values() if j.status in ("done", "failed")]
+        for j in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[j.id]
+
+    def get(self, job_id: str) -> Job | None:
+        return self._jobs.get(job_id)
+
+    def jobs(self) -> list[Job]:
+        """Most recent first."""
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def wait(self, job_id: str, timeout: float | None = None) -> Job:
+        deadline = None if timeout is None else time.time() + timeout
+        job = self._jobs[job_id]
+        while job.status in ("queued", "running") and (deadline is None or time.time() < deadline):
+            time.sleep(0.05)
+        return job
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
@@ -1,5 +1,6 @@
-import json, datetime as dt
+import datetime as dt, uuid
 from agent import run_agent
+from trace_store import TraceStore, DB_PATH
 
 if __name__ == "__main__":
     prompt = "Post 'Hello from the mock GrowthOps Agent!' to #general."
@@ -8,7 +9,9 @@ if __name__ == "__main__":
     print("\n=== TRACE (summary) ===")
     for step in result["trace"]["steps"]:
         print("-", step["type"])
-    ts = dt.datetime.now().strftime("%Y%m%d-%H%M%S")
-    with open(f"../../logs/mock-agent-{ts}.json", "w", encoding="utf-8") as f:
-        json.dump(result, f, indent=2)
-    print(f"\nTrace written to logs/mock-agent-{ts}.json")
+    # Runs started in the same second must not replace each other's row
+    run_id = f"mock-agent-{dt.datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+    store = TraceStore()
+    store.put(run_id, result, prompt=prompt)
+    store.close()  # flush the queued trace before exiting
+    print(f"\nTrace {run_id} written to {DB_PATH}")
@@ -0,0 +1,248 @@
+"""
+Append-only trace log: compact JSON lines in compressed, rotating segments.
+
+    logs/traces/traces-20261018-120000-4242-001.jsonl.gz       one compressed member per run
+    logs/traces/traces-20261018-120000-4242-001.jsonl.gz.idx   "run_id<TAB>member offset" per record
+
+append() only queues the record; a background thread writes the queue every
+`flush_every` records or `flush_interval` seconds, in one write but with
+each record compressed as its own member. Concatenated gzip members (zstd
+frames) are still one valid stream, so segments can be read with plain
+gunzip, while the .idx sidecars give get() the member holding a run, so
+it decompresses that run and nothing else. The sidecars are read
+incrementally into an in-memory run -> (segment, offset) index. Each
+process writes its own segments, so writers never need locks; a segment is
+closed once it passes `max_bytes` or `max_age_s`.
+"""
+import atexit, itertools, json, logging, os, threading, time, zlib
+from pathlib import Path
+
+LOGS_DIR = Path(__file__).resolve().parents[2] / "logs"
+TRACE_DIR = LOGS_DIR / "traces"
+
+_EXT = {"gzip": ".jsonl.gz", "zstd": ".jsonl.zst"}
+
+log = logging.getLogger(__name__)
+
+
+def _compress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        import zstandard
+        return zstandard.ZstdCompressor(level=6).compress(data)
+    c = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    return c.compress(data) + c.flush()
+
+
+def _decompress_member(f, codec: str) -> bytes:
+    """Decompress exactly one member/frame starting at f's current position."""
+    if codec == "zstd":
+        import zstandard
+        d = zstandard.ZstdDecompressor().decompressobj()
+    else:
+        d = zlib.decompressobj(31)
+    out = []
+    while not d.eof:
+        chunk = f.read(1 << 16)
+        if not chunk:
+            break
+        out.append(d.decompress(chunk))
+    # Leave f at the start of the next member
+    if d.unused_data:
+        f.seek(-len(d.unused_data), os.SEEK_CUR)
+    return b"".join(out)
+
+
+def _codec_of(path: Path) -> str:
+    return "zstd" if path.name.endswith(_EXT["zstd"]) else "gzip"
+
+
+class TraceLog:
+    def __init__(self, root: str | Path = TRACE_DIR, codec: str = "gzip", max_bytes: int = 32 << 20,
+                 max_age_s: float = 86400, flush_every: int = 50, flush_interval: float = 2.0, on_flush=None):
+        """on_flush([(run_id, segment name, offset), ...]) runs on the writer after each flush."""
+        if codec not in _EXT:
+            raise ValueError(f"unknown codec {codec!r}; expected one of {sorted(_EXT)}")
+        if codec == "zstd":
+            # Fail here rather than on the writer thread at the first flush
+            try:
+                import zstandard  # noqa: F401
+            except ImportError as e:
+                raise ImportError("codec='zstd' needs the zstandard package (pip install zstandard)") from e
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.codec = codec
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_s
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.on_flush = on_flush
+        self._queue: list[dict] = []
+        self._pending: dict[str, dict] = {}   # run_id -> record, until it is on disk
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._segment: Path | None = None
+        self._segment_opened = 0.0
+        self._rotations = 0
+        self._index: dict[str, tuple[str, int]] = {}   # run_id -> newest (segment name, offset)
+        self._idx_read: dict[str, int] = {}             # .idx name -> bytes already indexed
+        self._indexed_at = 0.0
+        self._index_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="trace-log", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # --- writing ------------------------------------------------------------
+
+    def append(self, run_id: str, record: dict) -> None:
+        """Queue one run's record; returns without touching the disk."""
+        record = {"run_id": run_id, **record}
+        with self._lock:
+            self._queue.append(record)
+            self._pending[run_id] = record
+            full = len(self._queue) >= self.flush_every
+        if full:
+            self._wake.set()
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                # flush() has requeued the batch; try again on the next wake-up
+                log.exception("trace log flush failed")
+
+    def flush(self) -> None:
+        """
+        Write everything queued so far, one compressed member per record. If
+        compressing or writing fails the batch goes back on the queue (ahead
+        of newer records) and the error is raised.
+        """
+        with self._io_lock:
+            with self._lock:
+                batch, self._queue = self._queue, []
+            if not batch:
+                return
+            try:
+                members = [_compress((json.dumps(r, separators=(",", ":")) + "\n").encode("utf-8"), self.codec)
+                           for r in batch]
+                seg = self._current_segment()
+                with open(seg, "ab") as f:
+                    offsets = list(itertools.accumulate((len(m) for m in members[:-1]), initial=f.tell()))
+                    f.write(b"".join(members))
+                with open(f"{seg}.idx", "a", encoding="utf-8") as f:
+                    f.writelines(f"{r['run_id']}\t{off}\n" for r, off in zip(batch, offsets))
+            except Exception:
+                with self._lock:
+                    self._queue[:0] = batch
+                raise
+            entries = [(r["run_id"], seg.name, off) for r, off in zip(batch, offsets)]
+            with self._index_lock:
+                for rid, name, off in entries:
+                    self._index_entry(rid, name, off)
+            if self.on_flush:
+                self.on_flush(entries)
+            with self._lock:
+                for r in batch:
+                    if self._pending.get(r["run_id"]) is r:
+                        del self._pending[r["run_id"]]
+
+    def _current_segment(self) -> Path:
+        seg = self._segment
+        if seg is None or seg.stat().st_size >= self.max_bytes or time.time() - self._segment_opened >= self.max_age_s:
+            self._rotations += 1
+            name = f"traces-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self._rotations:03d}{_EXT[self.codec]}"
+            seg = self._segment = self.root / name
+            seg.touch()
+            self._segment_opened = time.time()
+        return seg
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._thread.join(timeout=5)
+        self.flush()
+
+    # --- reading --------------------------------------------------------------
+
+    def segments(self) -> list[Path]:
+        """Oldest first (names start with the segment's creation time)."""
+        return sorted(p for p in self.root.iterdir() if p.name.endswith(tuple(_EXT.values())))
+
+    def __iter__(self):
+        """Stream every flushed record, oldest segment first, one member in memory at a time."""
+        for seg in self.segments():
+            codec = _codec_of(seg)
+            with open(seg, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                while f.tell() < size:
+                    start = f.tell()
+                    member = _decompress_member(f, codec)
+                    for line in member.splitlines():
+                        yield json.loads(line)
+                    if f.tell() == start:
+                        break
+
+    def _index_entry(self, run_id: str, segment: str, offset: int) -> None:
+        # Segment names sort by creation time and offsets grow within one, so the max is the newest
+        if (segment, offset) > self._index.get(run_id, ("", -1)):
+            self._index[run_id] = (segment, offset)
+
+    def _refresh_index(self) -> None:
+        """Index the .idx lines written since the last refresh (by any process)."""
+        for seg in self.segments():
+            idx = Path(f"{seg}.idx")
+            done = self._idx_read.get(idx.name, 0)
+            try:
+                if idx.stat().st_size <= done:
+                    continue
+                with open(idx, "rb") as f:
+                    f.seek(done)
+                    data = f.read()
+            except FileNotFoundError:
+                continue
+            # A line another process is still writing is left for the next refresh
+            data = data[:data.rfind(b"\n") + 1]
+            for line in data.decode("utf-8").splitlines():
+                rid, _, off = line.partition("\t")
+                self._index_entry(rid, seg.name, int(off))
+            self._idx_read[idx.name] = done + len(data)
+        self._indexed_at = time.monotonic()
+
+    def locate(self, run_id: str) -> tuple[Path, int] | None:
+        """(segment, member offset) of the newest record for run_id, from the in-memory index."""
+        with self._index_lock:
+            # Misses always look for new sidecar lines; hits at most once a second (re-written runs)
+            if run_id not in self._index or time.monotonic() - self._indexed_at > 1.0:
+                self._refresh_index()
+            loc = self._index.get(run_id)
+        return (self.root / loc[0], loc[1]) if loc else None
+
+    def get(self, run_id: str) -> dict | None:
+        """One run's record: still-queued records first, else seek to its member and decompress only that."""
+        with self._lock:
+            if run_id in self._pending:
+                return self._pending[run_id]
+        loc = self.locate(run_id)
+        return self.read_at(loc[0].name, loc[1], run_id) if loc else None
+
+    def read_at(self, segment: str, offset: int, run_id: str) -> dict | None:
+        """
+        Record for run_id in the member at (segment, offset), e.g. as passed to
+        on_flush. Segments written before one-member-per-run hold several runs per member.
+        """
+        seg = self.root / segment
+        with open(seg, "rb") as f:
+            f.seek(offset)
+            member = _decompress_member(f, _codec_of(seg))
+        found = None
+        for line in member.splitlines():
+            rec = json.loads(line)
+            if rec["run_id"] == run_id:
+                found = rec
+        return found
@@ -0,0 +1,189 @@
+"""
+Agent traces: a SQLite `runs` table with the metadata used for listing and
+filtering, and the full traces in the compressed append-only TraceLog
+(see trace_log.py). Each run row records where its record landed
+(segment, member offset), so a listing never touches trace payloads and
+opening a run (or one of its steps) decompresses that run's member only.
+"""
+import json, sqlite3, threading, zlib
+import datetime as dt
+from pathlib import Path
+from trace_log import TraceLog, TRACE_DIR
+
+LOGS_DIR = Path(__file__).resolve().parents[2] / "logs"
+DB_PATH = LOGS_DIR / "traces.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id     TEXT PRIMARY KEY,
+    created    TEXT NOT NULL,
+    day        TEXT NOT NULL,
+    mode       TEXT,
+    status     TEXT NOT NULL,
+    prompt     TEXT,
+    final_text TEXT,
+    n_steps    INTEGER NOT NULL,
+    started    TEXT,
+    ended      TEXT,
+    step_types TEXT,
+    segment    TEXT,
+    member_offset INTEGER
+);
+CREATE INDEX IF NOT EXISTS runs_created ON runs (created DESC);
+CREATE INDEX IF NOT EXISTS runs_mode ON runs (mode, created DESC);
+CREATE INDEX IF NOT EXISTS runs_status ON runs (status, created DESC);
+CREATE INDEX IF NOT EXISTS runs_day ON runs (day, created DESC);
+"""
+_RUN_COLUMNS = ["run_id", "created", "day", "mode", "status", "prompt", "final_text", "n_steps",
+                "started", "ended", "step_types", "segment", "member_offset"]
+
+_LIST_COLUMNS = ["run_id", "created", "mode", "status", "prompt", "n_steps"]
+
+
+class TraceStore:
+    def __init__(self, path: str | Path = DB_PATH, log: TraceLog | None = None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._migrate()
+        self.log = log or TraceLog(self.path.parent / TRACE_DIR.name)
+        self.log.on_flush = self._located
+
+    def _migrate(self) -> None:
+        # Stores written before traces moved to the TraceLog keep per-step blobs in `steps`
+        have = {r[1] for r in self._db.execute("PRAGMA table_info(runs)")}
+        for col, kind in (("step_types", "TEXT"), ("segment", "TEXT"), ("member_offset", "INTEGER")):
+            if col not in have:
+                self._db.execute(f"ALTER TABLE runs ADD COLUMN {col} {kind}")
+        self._legacy_steps = bool(self._db.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'steps'").fetchone())
+
+    def close(self) -> None:
+        self.log.close()
+        self._db.close()
+
+    # --- writing ------------------------------------------------------------
+
+    def put(self, run_id: str, result: dict, status: str = "done", prompt: str | None = None,
+            created: str | None = None) -> None:
+        """
+        Index one run (a run_agent result dict plus run metadata) and queue its
+        trace on the log; compression and disk writes happen off this thread.
+        """
+        trace = result.get("trace", {})
+        steps = trace.get("steps", [])
+        created = created or trace.get("start") or dt.datetime.now().isoformat()
+        row = (run_id, created, created[:10], trace.get("mode"), status, prompt,
+               result.get("final_text"), len(steps), trace.get("start"), trace.get("end"),
+               json.dumps([s.get("type") for s in steps]), None, None)
+        with self._lock, self._db:
+            self._db.execute(f"INSERT OR REPLACE INTO runs ({', '.join(_RUN_COLUMNS)}) "
+                             f"VALUES ({', '.join('?' * len(row))})", row)
+        self.log.append(run_id, result)
+
+    def _located(self, entries: list[tuple]) -> None:
+        with self._lock, self._db:
+            self._db.executemany("UPDATE runs SET segment = ?, member_offset = ? WHERE run_id = ?",
+                                 [(seg, off, rid) for rid, seg, off in entries])
+
+    def flush(self) -> None:
+        self.log.flush()
+
+    def import_json_logs(self, logs_dir: str | Path = LOGS_DIR, pattern: str = "mock-agent-*.json") -> int:
+        """Index legacy one-file-per-run traces (run_id = file stem); files already stored are skipped."""
+        known = {r[0] for r in self._query("SELECT run_id FROM runs")}
+        n = 0
+        for path in sorted(Path(logs_dir).glob(pattern)):
+            if path.stem in known:
+                continue
+            try:
+                result = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+            self.put(path.stem, result)
+            n += 1
+        return n
+
+    # --- reading --------------------------------------------------------------
+
+    def _query(self, sql: str, params=()) -> list[tuple]:
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    @staticmethod
+    def _where(mode=None, status=None, day_from: dt.date | None = None, day_to: dt.date | None = None):
+        clauses, params = [], []
+        if mode:
+            clauses.append("mode = ?")
+            params.append(mode)
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if day_from:
+            clauses.append("day >= ?")
+            params.append(day_from.isoformat())
+        if day_to:
+            clauses.append("day <= ?")
+            params.append(day_to.isoformat())
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def list_runs(self, limit: int = 25, offset: int = 0, **filters) -> list[dict]:
+        """Newest first; filters: mode, status, day_from, day_to."""
+        where, params = self._where(**filters)
+        rows = self._query(f"SELECT {', '.join(_LIST_COLUMNS)} FROM runs{where} "
+                           f"ORDER BY created DESC LIMIT ? OFFSET ?", [*params, limit, offset])
+        return [dict(zip(_LIST_COLUMNS, r)) for r in rows]
+
+    def count(self, **filters) -> int:
+        where, params = self._where(**filters)
+        return self._query(f"SELECT COUNT(*) FROM runs{where}", params)[0][0]
+
+    def modes(self) -> list[str]:
+        return [r[0] for r in self._query("SELECT DISTINCT mode FROM runs WHERE mode IS NOT NULL ORDER BY mode")]
+
+    def get_run(self, run_id: str) -> dict | None:
+        cols = [c for c in _RUN_COLUMNS if c not in ("day", "step_types", "segment", "member_offset")]
+        rows = self._query(f"SELECT {', '.join(cols)} FROM runs WHERE run_id = ?", (run_id,))
+        return dict(zip(cols, rows[0])) if rows else None
+
+    def step_types(self, run_id: str) -> list[str]:
+        """Step types in order, from the index alone."""
+        rows = self._query("SELECT step_types FROM runs WHERE run_id = ?", (run_id,))
+        if rows and rows[0][0] is not None:
+            return json.loads(rows[0][0])
+        if self._legacy_steps:
+            return [r[0] for r in self._query("SELECT type FROM steps WHERE run_id = ? ORDER BY idx", (run_id,))]
+        return []
+
+    def load(self, run_id: str) -> dict | None:
+        """The run_agent-shaped result ({"final_text", "trace"}), or None."""
+        rows = self._query("SELECT segment, member_offset FROM runs WHERE run_id = ?", (run_id,))
+        if not rows:
+            return None
+        seg, off = rows[0]
+        if seg is not None:
+            rec = self.log.read_at(seg, off, run_id)
+        else:
+            rec = self.log.get(run_id) or self._load_legacy(run_id)
+        if rec is None:
+            return None
+        return {"final_text": rec.get("final_text"), "trace": rec.get("trace", {})}
+
+    def step(self, run_id: str, idx: int) -> dict | None:
+        """One step; decompresses the whole run, so keep load() when reading several."""
+        rec = self.load(run_id)
+        steps = rec["trace"].get("steps", []) if rec else []
+        return steps[idx] if 0 <= idx < len(steps) else None
+
+    def _load_legacy(self, run_id: str) -> dict | None:
+        if not self._legacy_steps:
+            return None
+        run = self.get_run(run_id)
+        blobs = self._query("SELECT blob FROM steps WHERE run_id = ? ORDER BY idx", (run_id,))
+        steps = [json.loads(zlib.decompress(b[0])) for b in blobs]
+        return {"final_text": run["final_text"],
+                "trace": {"start": run["started"], "end": run["ended"], "mode": run["mode"], "steps": steps}}
@@ -1,11 +1,44 @@
+import sys
+from pathlib import Path
 import streamlit as st
 import pandas as pd
-from src.digest import run_digest
+import datetime as dt
+
+# Shared helpers (apps/httputil.py) live in the repo-level `apps` package
+REPO_ROOT = Path(__file__).resolve().parents[2]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.append(str(REPO_ROOT))
+
+from src.digest import cached_digest, notify_digest, default_cache, history_store, record_history
+from src.history import kpi_windows
+from src.digest_cache import DigestCache, source_snapshot, CACHE_TTL_S
 
 st.set_page_config(page_title="GrowthOps Digest v2", page_icon="📈", layout="wide")
 st.title("📈 GrowthOps Digest — Comparative View")
 
-res = run_digest()
+report_date = st.sidebar.date_input("Report date", value=dt.date.today(), max_value=dt.date.today())
+refresh = st.sidebar.button("Refresh data")
+send = st.sidebar.button("Send to Slack")
+
+
+@st.cache_data(ttl=CACHE_TTL_S, show_spinner="Building digest…")
+def load_digest(report_date: dt.date, snapshot: str):
+    # snapshot only keys the cache; the disk layer below survives restarts
+    return cached_digest(report_date)
+
+
+if refresh:
+    load_digest.clear()
+    default_cache().clear(DigestCache.key(report_date, source_snapshot()))
+res = load_digest(report_date, source_snapshot())
+# Today's digest goes to Slack on its own, once per day; past dates only on request
+if send:
+    if notify_digest(res, force=True):
+        st.sidebar.success("Sent to Slack.")
+    else:
+        st.sidebar.warning("SLACK_WEBHOOK_URL is not set.")
+elif report_date == dt.date.today():
+    notify_digest(res)
 today, yday, deltas = res["today"], res["yesterday"], res["deltas"]
 
 # KPI row
@@ -22,6 +55,20 @@ st.subheader("Channel Breakdown")
 st.bar_chart(res["channels"].set_index("channel")[["revenue","sessions"]])
 st.dataframe(res["channels"].assign(conversion_rate = res["channels"]["revenue"]/res["channels"]["sessions"]).style.format({"conversion_rate":"{:.2%}","revenue":"${:,.0f}"}))
 
+# Multi-week comparisons, precomputed when the day was appended to the history
+st.subheader("Trends")
+kpi = kpi_windows(record_history(res))
+if kpi.empty:
+    st.info("No KPI history yet.")
+else:
+    st.dataframe(kpi[["value", "wow_pct", "vs_7d_pct", "vs_28d_pct", "z_28d"]].rename(columns={
+        "value": "today", "wow_pct": "WoW %", "vs_7d_pct": "vs 7d avg %", "vs_28d_pct": "vs 28d avg %",
+        "z_28d": "z-score (28d)",
+    }).style.format("{:,.2f}", na_rep="–"))
+    hist = history_store().read("kpis", report_date - dt.timedelta(days=55), report_date)
+    if hist["date"].nunique() > 1:
+        st.line_chart(hist.pivot_table(index="date", columns="metric", values="value"))
+
 # Top products by channel
 st.subheader("Top Converting Products by Channel")
 st.dataframe(res["products"].style.format({"revenue":"${:,.0f}","cvr":"{:.1%}"}))
@@ -0,0 +1,243 @@
+import asyncio, json, os, random
+import datetime as dt
+from urllib.parse import urlsplit, parse_qsl
+import pandas as pd
+from apps.httputil import retry_after_seconds
+
+# Request fields that change every day; left out of recorded fixture matches
+_VOLATILE = {"dateRanges", "created_at_min", "created_at_max"}
+
+
+class FetchError(RuntimeError):
+    pass
+
+
+class HttpConnector:
+    """
+    Base for JSON-over-HTTP sources. Calls share the caller's pooled
+    httpx.AsyncClient; each request gets its own timeout and is retried on
+    transport errors, 429 and 5xx with jittered exponential backoff.
+    With record_to set, every response is appended there as a stub_server fixture.
+    """
+
+    def __init__(self, base_url: str, headers: dict | None = None, timeout: float = 10.0,
+                 retries: int = 3, backoff: float = 0.5, record_to: str | None = None):
+        self.base_url = base_url.rstrip("/")
+        self.headers = headers or {}
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.record_to = record_to
+
+    async def request(self, client, method: str, path: str, params: dict | None = None,
+                      body: dict | None = None) -> dict:
+        return (await self.fetch(client, method, path, params, body)).json()
+
+    async def auth_headers(self) -> dict:
+        """Per-request auth headers; subclasses with expiring credentials override this."""
+        return {}
+
+    async def fetch(self, client, method: str, path: str, params: dict | None = None,
+                    body: dict | None = None):
+        """Like request(), but returns the httpx.Response (for Link headers and the like)."""
+        import httpx
+        url = f"{self.base_url}{path}"
+        for attempt in range(self.retries + 1):
+            try:
+                headers = {**self.headers, **await self.auth_headers()}
+                resp = await client.request(method, url, params=params, json=body,
+                                            headers=headers, timeout=self.timeout)
+            except httpx.TransportError as e:  # includes timeouts
+                if attempt == self.retries:
+                    raise FetchError(f"{method} {url}: {type(e).__name__}") from e
+                await asyncio.sleep(self._delay(attempt))
+                continue
+            if resp.status_code == 429 or resp.status_code >= 500:
+                if attempt == self.retries:
+                    raise FetchError(f"{method} {url}: HTTP {resp.status_code}")
+                await asyncio.sleep(retry_after_seconds(resp.headers.get("Retry-After"), self._delay(attempt)))
+                continue
+            if resp.status_code >= 400:
+                raise FetchError(f"{method} {url}: HTTP {resp.status_code} {resp.text[:200]}")
+            if self.record_to:
+                self._record(method, path, params, body, resp)
+            return resp
+
+    def _delay(self, attempt: int) -> float:
+        return self.backoff * (2 ** attempt) * (0.5 + random.random())
+
+    def _record(self, method, path, params, body, resp) -> None:
+        match = {k: v for k, v in {**(params or {}), **(body or {})}.items() if k not in _VOLATILE}
+        entries = []
+        if os.path.exists(self.record_to):
+            with open(self.record_to, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        entry = {"method": method, "path": path, "match": match, "status": 200, "body": resp.json()}
+        if "Link" in resp.headers:
+            entry["headers"] = {"Link": resp.headers["Link"]}
+        entries.append(entry)
+        with open(self.record_to, "w", encoding="utf-8") as f:
+            json.dump(entries, f, indent=2)
+
+
+class GA4Connector(HttpConnector):
+    """
+    GA4 Data API runReport: KPI totals for several days in one call, and the channel split.
+    Authenticates with Google credentials (a service-account key via
+    GOOGLE_APPLICATION_CREDENTIALS); credentials=None sends no auth, for a stub_server.
+    """
+
+    METRICS = {"revenue": "totalRevenue", "purchases": "ecommercePurchases",
+               "users": "totalUsers", "sessions": "sessions"}
+    SCOPES = ["https://www.googleapis.com/auth/analytics.readonly"]
+
+    def __init__(self, property_id: str, credentials=None,
+                 base_url: str = "https://analyticsdata.googleapis.com", **kw):
+        super().__init__(base_url, **kw)
+        self.path = f"/v1beta/properties/{property_id}:runReport"
+        self.credentials = credentials
+        self._refresh_lock = asyncio.Lock()
+
+    @classmethod
+    def default_credentials(cls):
+        """Application default credentials: the service-account JSON named by GOOGLE_APPLICATION_CREDENTIALS."""
+        import google.auth
+        credentials, _ = google.auth.default(scopes=cls.SCOPES)
+        return credentials
+
+    async def auth_headers(self) -> dict:
+        if self.credentials is None:
+            return {}
+        async with self._refresh_lock:
+            if not self.credentials.valid:
+                # google-auth refreshes synchronously; keep the event loop free
+                from google.auth.transport.requests import Request
+                await asyncio.to_thread(self.credentials.refresh, Request())
+        return {"Authorization": f"Bearer {self.credentials.token}"}
+
+    @staticmethod
+    def _number(v: str):
+        f = float(v)
+        return int(f) if f.is_integer() else f
+
+    async def kpis(self, client, days: list[dt.date]) -> list[dict]:
+        """One KPI dict per day, in the order given."""
+        body = {
+            "dateRanges": [{"startDate": d.isoformat(), "endDate": d.isoformat()} for d in days],
+            "metrics": [{"name": m} for m in self.METRICS.values()],
+        }
+        data = await self.request(client, "POST", self.path, body=body)
+        names = [m["name"] for m in data.get("metricHeaders", [])]
+        out = [{k: 0 for k in self.METRICS} for _ in days]
+        for row in data.get("rows", []):
+            # With several date ranges GA4 adds a dateRange dimension: date_range_0, date_range_1, ...
+            dims = row.get("dimensionValues", [])
+            i = int(dims[-1]["value"].rsplit("_", 1)[-1]) if dims else 0
+            values = {n: self._number(v["value"]) for n, v in zip(names, row["metricValues"])}
+            out[i] = {k: values.get(m, 0) for k, m in self.METRICS.items()}
+        return out
+
+    async def channels(self, client, day: dt.date) -> pd.DataFrame:
+        body = {
+            "dateRanges": [{"startDate": day.isoformat(), "endDate": day.isoformat()}],
+            "dimensions": [{"name": "sessionDefaultChannelGroup"}],
+            "metrics": [{"name": "sessions"}, {"name": "totalRevenue"}],
+            "orderBys": [{"metric": {"metricName": "totalRevenue"}, "desc": True}],
+        }
+        data = await self.request(client, "POST", self.path, body=body)
+        rows = [{
+            "channel": r["dimensionValues"][0]["value"],
+            "sessions": self._number(r["metricValues"][0]["value"]),
+            "revenue": self._number(r["metricValues"][1]["value"]),
+        } for r in data.get("rows", [])]
+        return pd.DataFrame(rows, columns=["channel", "sessions", "revenue"])
+
+
+class ShopifyConnector(HttpConnector):
+    """
+    Shopify Admin REST: the day's orders, rolled up to revenue per (sales channel, product).
+    Orders come 250 per page; later pages follow the Link header's page_info cursor.
+    """
+
+    def __init__(self, shop: str, token: str, api_version: str = "2024-07", base_url: str | None = None, **kw):
+        super().__init__(base_url or f"https://{shop}.myshopify.com", {"X-Shopify-Access-Token": token}, **kw)
+        self.path = f"/admin/api/{api_version}/orders.json"
+
+    async def top_products(self, client, day: dt.date, limit: int = 10) -> pd.DataFrame:
+        params = {
+            "status": "any", "limit": 250, "fields": "source_name,line_items",
+            "created_at_min": f"{day.isoformat()}T00:00:00", "created_at_max": f"{day.isoformat()}T23:59:59",
+        }
+        orders = []
+        while params:
+            resp = await self.fetch(client, "GET", self.path, params=params)
+            orders.extend(resp.json().get("orders", []))
+            params = self._next_page(resp, params)
+        rows = [
+            {"channel": o.get("source_name") or "unknown", "product": li["title"],
+             "revenue": float(li["price"]) * li.get("quantity", 1)}
+            for o in orders for li in o.get("line_items", [])
+        ]
+        df = pd.DataFrame(rows, columns=["channel", "product", "revenue"])
+        # Shopify has no sessions, so no conversion rate here
+        df = df.groupby(["channel", "product"], as_index=False)["revenue"].sum()
+        df["cvr"] = float("nan")
+        return df.sort_values("revenue", ascending=False, kind="stable").head(limit).reset_index(drop=True)
+
+    @staticmethod
+    def _next_page(resp, params: dict) -> dict | None:
+        """Params for the next page, or None on the last one."""
+        link = resp.links.get("next")
+        if not link:
+            return None
+        page_info = dict(parse_qsl(urlsplit(link["url"]).query)).get("page_info")
+        if not page_info:
+            return None
+        # With page_info Shopify rejects the original filters; only limit and fields may be repeated
+        return {"limit": params["limit"], "fields": params["fields"], "page_info": page_info}
+
+
+def connectors_from_env() -> tuple[GA4Connector, ShopifyConnector]:
+    """
+    GA4 and Shopify connectors from env; *_BASE_URL points them at a stub_server
+    (GA4 then sends no credentials).
+    """
+    kw = {
+        "timeout": float(os.getenv("FETCH_TIMEOUT_S", "10")),
+        "retries": int(os.getenv("FETCH_RETRIES", "3")),
+        "record_to": os.getenv("RECORD_FIXTURES_TO") or None,
+    }
+    if os.getenv("GA4_BASE_URL"):
+        ga4_kw = {"base_url": os.environ["GA4_BASE_URL"]}
+    else:
+        ga4_kw = {"credentials": GA4Connector.default_credentials()}
+    ga4 = GA4Connector(os.getenv("GA4_PROPERTY_ID", "0"), **ga4_kw, **kw)
+    # SHOPIFY_STORE_DOMAIN is "<shop>.myshopify.com" as in .env.example
+    shop = os.getenv("SHOPIFY_STORE_DOMAIN", "shop").removesuffix(".myshopify.com")
+    shopify = ShopifyConnector(shop, os.getenv("SHOPIFY_ADMIN_TOKEN", ""),
+                               base_url=os.getenv("SHOPIFY_BASE_URL") or None, **kw)
+    return ga4, shopify
+
+
+async def fetch_digest_inputs(report_date: dt.date, ga4: GA4Connector, shopify: ShopifyConnector,
+                              max_connections: int = 10) -> dict:
+    """
+    today/yesterday KPIs, channel breakdown and top products, fetched
+    concurrently over one pooled client: latency is the slowest call, not the sum.
+    """
+    import httpx
+    yday = report_date - dt.timedelta(days=1)
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+    async with httpx.AsyncClient(limits=limits) as client:
+        kpis, channels, products = await asyncio.gather(
+            ga4.kpis(client, [report_date, yday]),
+            ga4.channels(client, report_date),
+            shopify.top_products(client, report_date),
+        )
+    return {"today": kpis[0], "yesterday": kpis[1], "channels": channels, "products": products}
+
+
+def fetch_digest_inputs_sync(report_date: dt.date, ga4=None, shopify=None) -> dict:
+    if ga4 is None or shopify is None:
+        ga4, shopify = connectors_from_env()
+    return asyncio.run(fetch_digest_inputs(report_date, ga4, shopify))
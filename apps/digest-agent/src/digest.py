@@ -1,12 +1,21 @@
 import os
+import datetime as dt
 import pandas as pd
 from dotenv import load_dotenv, find_dotenv
 from .summarizer import summarize
+from .connectors import fetch_digest_inputs_sync
+from .history import HistoryStore, history_dir
+from .digest_cache import DigestCache, source_snapshot, claim_period, release_period
 from .slack import post_to_slack
 
 load_dotenv(find_dotenv(), override=True)
 
-def run_digest():
+def build_digest(report_date: dt.date | None = None) -> dict:
+    """
+    Fetch, compare and summarize one report date. Nothing is written here
+    (results are cached); record_history() appends the day to the KPI history.
+    """
+    report_date = report_date or dt.date.today()
     mock = os.getenv("MOCK_DATA", "false").lower() == "true"
 
     if mock:
@@ -23,18 +32,13 @@ def run_digest():
             {"channel":"Email","product":"Comfort Slide","revenue":950,"cvr":0.036},
         ])
     else:
-        # TODO: replace with real GA4 + Shopify fetches for today & yesterday + joins
-        raise NotImplementedError("Wire real GA4/Shopify here after mock validation.")
-
-    # deltas
-    def pct(new, old): 
-        return None if not old else (new - old) / old * 100
-    deltas = {
-        "revenue_pct": pct(today["revenue"], yday["revenue"]),
-        "purchases_pct": pct(today["purchases"], yday["purchases"]),
-        "users_pct": pct(today["users"], yday["users"]),
-        "sessions_pct": pct(today["sessions"], yday["sessions"]),
-    }
+        # GA4 KPIs + channels and Shopify products, fetched concurrently
+        data = fetch_digest_inputs_sync(report_date)
+        today, yday = data["today"], data["yesterday"]
+        channels, products = data["channels"], data["products"]
+
+    deltas = {f"{k}_pct": (today[k] - yday[k]) / yday[k] * 100 if yday.get(k) else float("nan")
+              for k in ("revenue", "purchases", "users", "sessions")}
 
     # AI summary (uses canned text if no OPENAI_API_KEY)
     summary = summarize(
@@ -50,11 +54,84 @@ Users: {today['users']} ({deltas['users_pct']:.2f}%), Sessions: {today['sessions
 Topline:
 {summary}
 """
-    if os.getenv("SLACK_WEBHOOK_URL"): 
-        post_to_slack(msg)
-
     return {
+        "report_date": report_date,
         "today": today, "yesterday": yday, "deltas": deltas,
         "channels": channels, "products": products,
-        "summary": summary
+        "summary": summary, "message": msg,
     }
+
+
+def history_store(mock: bool | None = None) -> HistoryStore:
+    """Mock runs keep their own history so they never mix with real data."""
+    if mock is None:
+        mock = os.getenv("MOCK_DATA", "false").lower() == "true"
+    return HistoryStore(os.path.join(history_dir(), "mock") if mock else history_dir())
+
+
+def record_history(result: dict, store: HistoryStore | None = None) -> pd.DataFrame:
+    """
+    Append a digest's day to the KPI history (yesterday's KPIs too, as the
+    sources may have revised them) and return the day's windows. Unchanged
+    days are not rewritten, so calling this on every view is cheap.
+    """
+    store = store or history_store()
+    report_date = result["report_date"]
+    store.append_day(report_date - dt.timedelta(days=1), kpis=result["yesterday"])
+    return store.append_day(report_date, kpis=result["today"], channels=result["channels"],
+                            products=result["products"])
+
+
+def notify_digest(result: dict, force: bool = False) -> bool:
+    """
+    Post the digest to Slack once per report date; False if already sent (or no webhook).
+    force=True posts again regardless (an explicit "Send to Slack").
+    """
+    if not os.getenv("SLACK_WEBHOOK_URL"):
+        return False
+    if force:
+        post_to_slack(result["message"])
+        claim_period(result["report_date"], "slack")
+        return True
+    if not claim_period(result["report_date"], "slack"):
+        return False
+    try:
+        post_to_slack(result["message"])
+    except Exception:
+        release_period(result["report_date"], "slack")
+        raise
+    return True
+
+
+_cache: DigestCache | None = None
+
+
+def default_cache() -> DigestCache:
+    global _cache
+    if _cache is None:
+        _cache = DigestCache()
+    return _cache
+
+
+def cached_digest(report_date: dt.date | None = None, cache: DigestCache | None = None,
+                  refresh: bool = False) -> dict:
+    """
+    build_digest through a DigestCache keyed by report date and source
+    snapshot, so reloads skip the fetch and the LLM call within the TTL.
+    """
+    report_date = report_date or dt.date.today()
+    cache = cache or default_cache()
+    key = DigestCache.key(report_date, source_snapshot())
+    result = None if refresh else cache.get(key)
+    if result is None:
+        result = build_digest(report_date)
+        cache.put(key, result)
+    return result
+
+
+def run_digest(report_date: dt.date | None = None, notify: bool = True, cache: DigestCache | None = None):
+    result = cached_digest(report_date, cache)
+    record_history(result)
+    if notify:
+        notify_digest(result)
+    return result
@@ -0,0 +1,105 @@
+import hashlib, json, os, pickle, time
+import datetime as dt
+
+CACHE_DIR = os.getenv("DIGEST_CACHE_DIR",
+                      os.path.join(os.path.dirname(os.path.dirname(__file__)), ".cache", "digest"))
+CACHE_TTL_S = float(os.getenv("DIGEST_CACHE_TTL_S", "900"))
+
+# Settings that decide what the sources return; any change is a different snapshot
+_SOURCE_ENV = ["MOCK_DATA", "GA4_PROPERTY_ID", "GA4_BASE_URL", "SHOPIFY_STORE_DOMAIN", "SHOPIFY_BASE_URL"]
+
+
+def source_snapshot() -> str:
+    """Fingerprint of the configured data sources (mock vs live, which property/shop)."""
+    cfg = {k: os.getenv(k, "") for k in _SOURCE_ENV}
+    cfg["MOCK_DATA"] = cfg["MOCK_DATA"].lower()
+    return hashlib.sha256(json.dumps(cfg, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+class DigestCache:
+    """
+    Digest results keyed by (report date, source snapshot): a process-local
+    dict in front of pickle files, so results survive server restarts.
+    Entries older than `ttl_s` are misses and are removed.
+    """
+
+    def __init__(self, root: str = CACHE_DIR, ttl_s: float = CACHE_TTL_S):
+        self.root = root
+        self.ttl_s = ttl_s
+        self._mem: dict[str, tuple[float, dict]] = {}
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def key(report_date: dt.date, snapshot: str) -> str:
+        return f"{report_date.isoformat()}-{snapshot}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.pkl")
+
+    def get(self, key: str) -> dict | None:
+        now = time.time()
+        hit = self._mem.get(key)
+        if hit and now - hit[0] < self.ttl_s:
+            return hit[1]
+        self._mem.pop(key, None)
+        path = self._path(key)
+        try:
+            created = os.stat(path).st_mtime
+            if now - created >= self.ttl_s:
+                os.remove(path)
+                return None
+            with open(path, "rb") as f:
+                result = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # Truncated or foreign file: treat as a miss and let put() replace it
+            return None
+        self._mem[key] = (created, result)
+        return result
+
+    def put(self, key: str, result: dict) -> None:
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        self._mem[key] = (time.time(), result)
+
+    def clear(self, key: str | None = None) -> None:
+        keys = [key] if key else [n[:-4] for n in os.listdir(self.root) if n.endswith(".pkl")]
+        for k in keys:
+            self._mem.pop(k, None)
+            try:
+                os.remove(self._path(k))
+            except FileNotFoundError:
+                pass
+
+
+def _marker(report_date: dt.date, channel: str, root: str) -> str:
+    marker_dir = os.path.join(root, "sent")
+    os.makedirs(marker_dir, exist_ok=True)
+    return os.path.join(marker_dir, f"{channel}-{report_date.isoformat()}")
+
+
+def claim_period(report_date: dt.date, channel: str = "slack", root: str = CACHE_DIR) -> bool:
+    """
+    True exactly once per (report date, channel) across processes and restarts:
+    the first caller creates a marker file, everyone after sees it exists.
+    """
+    path = _marker(report_date, channel, root)
+    try:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+    with os.fdopen(fd, "w") as f:
+        f.write(dt.datetime.now().isoformat(timespec="seconds"))
+    return True
+
+
+def release_period(report_date: dt.date, channel: str = "slack", root: str = CACHE_DIR) -> None:
+    """Undo claim_period, e.g. when the delivery it guarded failed."""
+    try:
+        os.remove(_marker(report_date, channel, root))
+    except FileNotFoundError:
+        pass
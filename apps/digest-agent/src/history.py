@@ -0,0 +1,160 @@
+"""
+Daily KPI history as date-partitioned Parquet:
+
+    <root>/kpis/date=2026-10-18/part.parquet       metric, value
+    <root>/channels/date=.../part.parquet          channel, sessions, revenue
+    <root>/products/date=.../part.parquet          channel, product, revenue, cvr
+    <root>/windows/date=.../part.parquet           precomputed comparisons (WINDOW_COLUMNS)
+
+Appending a day writes only that day's partitions, and only those whose data
+changed; windows are then recomputed from that day forward (a later day's
+averages include it), each from the 28 days before it. Windows cover every series at once:
+KPIs ("kpi:revenue"), channels ("channel:Email:sessions") and products
+("product:web:Luxe Boot:revenue").
+"""
+import os
+import datetime as dt
+import pandas as pd
+
+DEFAULT_HISTORY_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "history")
+TABLES = ("kpis", "channels", "products")
+WINDOW_COLUMNS = ["value", "prev_day", "dod_pct", "wow_pct", "avg_7d", "vs_7d_pct",
+                  "avg_28d", "vs_28d_pct", "z_28d"]
+LOOKBACK_DAYS = 28
+
+
+def history_dir() -> str:
+    """DIGEST_HISTORY_DIR, read at call time so a .env loaded after import still applies."""
+    return os.getenv("DIGEST_HISTORY_DIR", DEFAULT_HISTORY_DIR)
+
+
+def _pct(new: pd.DataFrame, old: pd.DataFrame) -> pd.DataFrame:
+    return (new - old) / old.where(old != 0) * 100
+
+
+def compute_windows(wide: pd.DataFrame) -> pd.DataFrame:
+    """
+    wide: one row per calendar day (DatetimeIndex, gaps allowed), one column
+    per series. Returns long rows (date, metric, *WINDOW_COLUMNS) for every
+    observed value; averages and the z-score use the days *before* each date.
+    """
+    wide = wide.asfreq("D")
+    prior = wide.shift(1)
+    avg7 = prior.rolling(7, min_periods=3).mean()
+    avg28 = prior.rolling(LOOKBACK_DAYS, min_periods=7).mean()
+    std28 = prior.rolling(LOOKBACK_DAYS, min_periods=7).std()
+    fields = {
+        "value": wide, "prev_day": prior, "dod_pct": _pct(wide, prior), "wow_pct": _pct(wide, wide.shift(7)),
+        "avg_7d": avg7, "vs_7d_pct": _pct(wide, avg7),
+        "avg_28d": avg28, "vs_28d_pct": _pct(wide, avg28), "z_28d": (wide - avg28) / std28.where(std28 > 0),
+    }
+    out = pd.concat(fields, axis=1).stack(level=1, future_stack=True)
+    out.index.names = ["date", "metric"]
+    out = out[out["value"].notna()].reset_index()
+    return out[["date", "metric"] + WINDOW_COLUMNS]
+
+
+def _series(table: str, df: pd.DataFrame) -> pd.DataFrame:
+    """A stored table as long (date, metric, value) rows."""
+    if table == "kpis":
+        return df.assign(metric="kpi:" + df["metric"])[["date", "metric", "value"]]
+    keys = ["channel"] if table == "channels" else ["channel", "product"]
+    long = df.melt(id_vars=["date"] + keys, var_name="field", value_name="value").dropna(subset=["value"])
+    prefix = "channel" if table == "channels" else "product"
+    name = long[keys].astype(str).agg(":".join, axis=1)
+    return pd.DataFrame({"date": long["date"], "metric": prefix + ":" + name + ":" + long["field"],
+                         "value": long["value"].astype(float)})
+
+
+class HistoryStore:
+    """Append-only by day; rewriting a day replaces its partitions."""
+
+    def __init__(self, root: str | None = None):
+        self.root = root or history_dir()
+
+    def _partition(self, table: str, day: dt.date) -> str:
+        return os.path.join(self.root, table, f"date={day.isoformat()}", "part.parquet")
+
+    def _write(self, table: str, day: dt.date, df: pd.DataFrame) -> None:
+        path = self._partition(table, day)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        df.reset_index(drop=True).to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+
+    def _unchanged(self, table: str, day: dt.date, df: pd.DataFrame) -> bool:
+        path = self._partition(table, day)
+        return os.path.exists(path) and pd.read_parquet(path).equals(df.reset_index(drop=True))
+
+    def days(self, table: str = "kpis") -> list[dt.date]:
+        base = os.path.join(self.root, table)
+        if not os.path.isdir(base):
+            return []
+        return sorted(dt.date.fromisoformat(n[5:]) for n in os.listdir(base) if n.startswith("date="))
+
+    def read(self, table: str, start: dt.date | None = None, end: dt.date | None = None) -> pd.DataFrame:
+        """Rows of `table` for start..end inclusive, with a `date` column; only those partitions are opened."""
+        frames = []
+        for day in self.days(table):
+            if (start and day < start) or (end and day > end):
+                continue
+            path = self._partition(table, day)
+            if os.path.exists(path):
+                frames.append(pd.read_parquet(path).assign(date=pd.Timestamp(day)))
+        if not frames:
+            return pd.DataFrame(columns=["date"])
+        return pd.concat(frames, ignore_index=True)
+
+    def append_day(self, day: dt.date, kpis: dict | None = None, channels: pd.DataFrame | None = None,
+                   products: pd.DataFrame | None = None) -> pd.DataFrame:
+        """
+        Store (or revise) one day's data and return its windows. Tables equal
+        to what is stored are left alone; when nothing changed, nothing is
+        written or recomputed.
+        """
+        frames = {}
+        if kpis is not None:
+            frames["kpis"] = pd.DataFrame({"metric": list(kpis), "value": [float(v) for v in kpis.values()]})
+        if channels is not None:
+            frames["channels"] = channels[["channel", "sessions", "revenue"]]
+        if products is not None:
+            frames["products"] = products[["channel", "product", "revenue", "cvr"]]
+        changed = [t for t, df in frames.items() if not self._unchanged(t, day, df)]
+        for table in changed:
+            self._write(table, day, frames[table])
+        if changed or not os.path.exists(self._partition("windows", day)):
+            # Windows of the next LOOKBACK_DAYS stored days look back at this one
+            last = max((d for t in TABLES for d in self.days(t)), default=day)
+            self.update_windows(day, min(last, day + dt.timedelta(days=LOOKBACK_DAYS)))
+        return self.windows(day)
+
+    def _wide(self, start: dt.date, end: dt.date) -> pd.DataFrame:
+        parts = [_series(t, df) for t in TABLES if not (df := self.read(t, start, end)).empty]
+        if not parts:
+            return pd.DataFrame(index=pd.DatetimeIndex([], name="date"))
+        long = pd.concat(parts, ignore_index=True)
+        return long.pivot_table(index="date", columns="metric", values="value", aggfunc="last")
+
+    def update_windows(self, start: dt.date, end: dt.date) -> pd.DataFrame:
+        """Recompute and store windows for start..end (e.g. a backfill: the oldest to the newest day)."""
+        wide = self._wide(start - dt.timedelta(days=LOOKBACK_DAYS), end)
+        if wide.empty:
+            return pd.DataFrame(columns=["date", "metric"] + WINDOW_COLUMNS)
+        win = compute_windows(wide)
+        win = win[win["date"] >= pd.Timestamp(start)]
+        for day, part in win.groupby(win["date"].dt.date):
+            self._write("windows", day, part.drop(columns="date"))
+        return win.reset_index(drop=True)
+
+    def windows(self, day: dt.date) -> pd.DataFrame:
+        """Precomputed windows for one day, indexed by metric (empty if not stored)."""
+        path = self._partition("windows", day)
+        if not os.path.exists(path):
+            return pd.DataFrame(columns=WINDOW_COLUMNS, index=pd.Index([], name="metric"))
+        return pd.read_parquet(path).set_index("metric")
+
+
+def kpi_windows(win: pd.DataFrame) -> pd.DataFrame:
+    """KPI rows of a windows frame, indexed by the bare KPI name."""
+    kpi = win[win.index.str.startswith("kpi:")]
+    return kpi.set_axis(kpi.index.str[4:], axis=0)
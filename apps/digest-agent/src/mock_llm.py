@@ -0,0 +1,67 @@
+"""
+Local stand-in for the OpenAI API (Responses and Chat Completions), so the
+summarizer can run against a real HTTP endpoint without a key or spend.
+
+    PYTHONPATH=apps/digest-agent python -m src.mock_llm --port 8766 --delay 1.0
+    OPENAI_API_KEY=mock OPENAI_BASE_URL=http://127.0.0.1:8766/v1 python -m streamlit run apps/digest-agent/app.py
+
+Replies are canned and derived from the prompt hash; `server.calls` counts
+requests so cache hits can be checked.
+"""
+import argparse, hashlib, time
+from apps.httputil import LocalServer
+
+REPLY = ("Wins: revenue up; paid search leads.\n"
+         "Risks: organic soft.\n"
+         "Actions: shift budget to retargeting. [mock {digest}]")
+
+
+class MockLLMServer(LocalServer):
+    @property
+    def calls(self) -> int:
+        return self.hits
+
+    def respond(self, method, path, query, body):
+        body = body or {}
+        if path.endswith("/responses"):
+            prompt = f"{body.get('instructions', '')}\n{body.get('input', '')}"
+            text = REPLY.format(digest=hashlib.sha256(prompt.encode()).hexdigest()[:8])
+            return 200, {
+                "id": "resp_mock", "object": "response", "created_at": int(time.time()),
+                "status": "completed", "model": body.get("model"),
+                "output": [{"type": "message", "id": "msg_mock", "role": "assistant", "status": "completed",
+                            "content": [{"type": "output_text", "text": text, "annotations": []}]}],
+                "usage": {"input_tokens": len(prompt) // 4, "output_tokens": len(text) // 4,
+                          "total_tokens": (len(prompt) + len(text)) // 4},
+            }
+        if path.endswith("/chat/completions"):
+            prompt = "\n".join(m.get("content", "") for m in body.get("messages", []))
+            text = REPLY.format(digest=hashlib.sha256(prompt.encode()).hexdigest()[:8])
+            return 200, {
+                "id": "chatcmpl_mock", "object": "chat.completion", "created": int(time.time()),
+                "model": body.get("model"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": text}}],
+                "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(text) // 4,
+                          "total_tokens": (len(prompt) + len(text)) // 4},
+            }
+        return 404, {"error": {"message": f"mock: unknown path {path}"}}
+
+
+def serve_in_thread(port: int = 0, delay: float = 0.0) -> MockLLMServer:
+    """Start the mock on a daemon thread; base URL is server.url + "/v1"."""
+    return MockLLMServer(port, delay=delay).start()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Mock OpenAI endpoint with canned replies")
+    ap.add_argument("--port", type=int, default=8766)
+    ap.add_argument("--delay", type=float, default=0.0, help="seconds to wait before each reply")
+    args = ap.parse_args()
+    server = MockLLMServer(args.port, delay=args.delay)
+    print(f"Mock LLM on {server.url}/v1")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
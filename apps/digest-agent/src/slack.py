@@ -0,0 +1,241 @@
+"""
+Slack delivery through an on-disk outbox.
+
+post_to_slack() only writes the message to the outbox directory and returns;
+a background sender thread drains it over one pooled HTTP client. Messages
+for the same webhook are batched into one post, failures are retried with
+exponential backoff (429 Retry-After is honoured), posts are spaced to stay
+under the rate limit, and anything still spooled at exit is sent on the next
+start. Messages that keep failing are moved to <outbox>/dead.
+
+Several processes may share one outbox: a sender claims a message by renaming
+it into its own <outbox>/inflight/<pid> directory, so each message is posted
+by exactly one of them; claims left by a dead process are returned to the
+outbox by the next sender to start.
+"""
+import atexit, json, logging, os, threading, time, uuid
+from apps.httputil import retry_after_seconds
+
+log = logging.getLogger(__name__)
+
+OUTBOX_DIR = os.getenv("SLACK_OUTBOX_DIR", os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), ".cache", "digest", "outbox"))
+RATE_PER_S = float(os.getenv("SLACK_RATE_PER_S", "1"))
+BATCH_SIZE = 5
+MAX_ATTEMPTS = 8
+# How long interpreter exit waits for due messages to go out
+EXIT_FLUSH_S = float(os.getenv("SLACK_EXIT_FLUSH_S", "5"))
+
+
+def _write_json(path: str, obj: dict) -> None:
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f)
+    os.replace(tmp, path)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Outbox:
+    """One JSON file per pending message, named so that listing order is enqueue order."""
+
+    def __init__(self, root: str = OUTBOX_DIR):
+        self.root = root
+        self.dead_dir = os.path.join(root, "dead")
+        self.inflight_root = os.path.join(root, "inflight")
+        self.inflight_dir = os.path.join(self.inflight_root, str(os.getpid()))
+        os.makedirs(self.dead_dir, exist_ok=True)
+        os.makedirs(self.inflight_dir, exist_ok=True)
+        self.recover()
+
+    def recover(self) -> int:
+        """Return messages claimed by processes that have since died to the outbox; how many."""
+        n = 0
+        for pid in os.listdir(self.inflight_root):
+            path = os.path.join(self.inflight_root, pid)
+            if not pid.isdigit() or int(pid) == os.getpid() or _pid_alive(int(pid)):
+                continue
+            for name in os.listdir(path):
+                if name.endswith(".json"):
+                    os.replace(os.path.join(path, name), os.path.join(self.root, name))
+                    n += 1
+            try:
+                os.rmdir(path)
+            except OSError:
+                pass
+        return n
+
+    def put(self, text: str, webhook: str) -> str:
+        msg_id = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+        _write_json(os.path.join(self.root, f"{msg_id}.json"),
+                    {"id": msg_id, "text": text, "webhook": webhook, "attempts": 0, "next_at": 0})
+        return msg_id
+
+    def pending(self) -> list[dict]:
+        out = []
+        for name in sorted(os.listdir(self.root)):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.root, name), "r", encoding="utf-8") as f:
+                    out.append(json.load(f))
+            except (FileNotFoundError, ValueError):
+                continue
+        return out
+
+    def claim(self, msg: dict) -> bool:
+        """Move `msg` into this process's inflight dir; False if another process got it first."""
+        name = f"{msg['id']}.json"
+        try:
+            os.rename(os.path.join(self.root, name), os.path.join(self.inflight_dir, name))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def done(self, msg: dict) -> None:
+        try:
+            os.remove(os.path.join(self.inflight_dir, f"{msg['id']}.json"))
+        except FileNotFoundError:
+            pass
+
+    def dead(self, msg: dict) -> None:
+        _write_json(os.path.join(self.dead_dir, f"{msg['id']}.json"), msg)
+        self.done(msg)
+
+    def retry_later(self, msg: dict, next_at: float) -> None:
+        msg = {**msg, "attempts": msg["attempts"] + 1, "next_at": next_at}
+        if msg["attempts"] >= MAX_ATTEMPTS:
+            self.dead(msg)
+        else:
+            # Back into the outbox, where any process may claim it once due
+            _write_json(os.path.join(self.root, f"{msg['id']}.json"), msg)
+            self.done(msg)
+
+
+class SlackSender:
+    """
+    Background thread draining an Outbox. One sender per process; it sleeps
+    until woken by a new message or until the next retry is due.
+    """
+
+    def __init__(self, outbox: Outbox, rate_per_s: float = RATE_PER_S, batch_size: int = BATCH_SIZE,
+                 backoff: float = 1.0, timeout: float = 10.0):
+        self.outbox = outbox
+        self.min_interval = 1.0 / rate_per_s if rate_per_s > 0 else 0.0
+        self.batch_size = batch_size
+        self.backoff = backoff
+        self.timeout = timeout
+        self._wake = threading.Event()
+        self._idle = threading.Event()
+        self._stop = False
+        self._last_post = 0.0
+        self._thread = threading.Thread(target=self._run, name="slack-sender", daemon=True)
+
+    def start(self) -> "SlackSender":
+        self._thread.start()
+        return self
+
+    def wake(self) -> None:
+        self._idle.clear()
+        self._wake.set()
+
+    def stop(self) -> None:
+        self._stop = True
+        self._wake.set()
+        self._thread.join()
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Wait until nothing is due; True if everything due went out in time (retries may remain)."""
+        self.wake()
+        return self._idle.wait(timeout)
+
+    def _run(self) -> None:
+        import httpx
+        with httpx.Client(timeout=self.timeout) as client:
+            while not self._stop:
+                self._wake.clear()
+                wait = self._drain(client)
+                # A wake during the drain may have queued something we did not list
+                if not self._wake.is_set():
+                    self._idle.set()
+                self._wake.wait(wait)
+
+    def _drain(self, client) -> float | None:
+        """Send everything due; seconds until the next retry, or None when empty."""
+        while not self._stop:
+            now = time.time()
+            pending = self.outbox.pending()
+            due = [m for m in pending if m["next_at"] <= now]
+            if not due:
+                return max(0.0, min(m["next_at"] for m in pending) - now) if pending else None
+            batch = [m for m in due if m["webhook"] == due[0]["webhook"]][:self.batch_size]
+            batch = [m for m in batch if self.outbox.claim(m)]
+            if batch:
+                self._send(client, batch)
+        return None
+
+    def _send(self, client, batch: list[dict]) -> None:
+        import httpx
+        webhook = batch[0]["webhook"]
+        if not webhook.startswith("http"):
+            # mock:// and similar: dry run
+            log.info("slack dry-run: %d message(s) to %s", len(batch), webhook)
+            for m in batch:
+                self.outbox.done(m)
+            return
+        gap = self._last_post + self.min_interval - time.time()
+        if gap > 0:
+            time.sleep(gap)
+        retry_after = None
+        try:
+            resp = client.post(webhook, json={"text": "\n\n".join(m["text"] for m in batch)})
+            self._last_post = time.time()
+            ok = resp.status_code < 300
+            if resp.status_code == 429:
+                retry_after = retry_after_seconds(resp.headers.get("Retry-After"), None)
+            elif 400 <= resp.status_code < 500 and resp.status_code != 429:
+                # Bad webhook or payload: retrying will not help
+                for m in batch:
+                    self.outbox.dead({**m, "error": f"HTTP {resp.status_code}"})
+                return
+        except httpx.HTTPError:
+            self._last_post = time.time()
+            ok = False
+        for m in batch:
+            if ok:
+                self.outbox.done(m)
+            else:
+                delay = retry_after if retry_after is not None else self.backoff * 2 ** m["attempts"]
+                self.outbox.retry_later(m, time.time() + delay)
+
+
+_sender: SlackSender | None = None
+_sender_lock = threading.Lock()
+
+
+def get_sender() -> SlackSender:
+    """The process-wide sender, started on first use (it also picks up messages left from earlier runs)."""
+    global _sender
+    with _sender_lock:
+        if _sender is None:
+            _sender = SlackSender(Outbox()).start()
+            # The sender is a daemon thread: give queued messages a chance before exit
+            atexit.register(_sender.flush, EXIT_FLUSH_S)
+        return _sender
+
+
+def post_to_slack(msg: str, webhook: str | None = None) -> str:
+    """Queue `msg` for delivery and return its outbox id without waiting on Slack."""
+    webhook = webhook or os.getenv("SLACK_WEBHOOK_URL", "mock://no-slack")
+    sender = get_sender()
+    msg_id = sender.outbox.put(msg, webhook)
+    sender.wake()
+    return msg_id
@@ -0,0 +1,49 @@
+"""
+Local stand-in for a Slack incoming webhook: accepts posts, keeps them in
+`server.received`, and can be slow or rate limited on demand.
+
+    PYTHONPATH=apps/digest-agent python -m src.slack_stub --port 8767 --delay 2 --limit-every 3
+    SLACK_WEBHOOK_URL=http://127.0.0.1:8767/hook python -m streamlit run apps/digest-agent/app.py
+"""
+import argparse, time
+from apps.httputil import LocalServer
+
+
+class WebhookStub(LocalServer):
+    def __init__(self, port: int = 0, verbose: bool = False, **kw):
+        super().__init__(port, **kw)
+        self.verbose = verbose
+        self.received: list[dict] = []
+
+    def respond(self, method, path, query, body):
+        if method != "POST":
+            return 405, "invalid_method"
+        if not isinstance(body, dict) or "text" not in body:
+            return 400, "no_text"
+        with self.lock:
+            self.received.append(body)
+        if self.verbose:
+            print(f"--- {time.strftime('%H:%M:%S')} ---\n{body['text']}")
+        return 200, "ok"
+
+
+def serve_in_thread(port: int = 0, **kw) -> WebhookStub:
+    """Start the stub on a daemon thread; webhook URL is server.url + "/hook"."""
+    return WebhookStub(port, **kw).start()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Fake Slack incoming webhook")
+    ap.add_argument("--port", type=int, default=8767)
+    ap.add_argument("--delay", type=float, default=0.0, help="seconds to wait before each reply")
+    ap.add_argument("--limit-every", type=int, default=0, help="answer every Nth post with 429")
+    ap.add_argument("--retry-after", type=float, default=1.0)
+    args = ap.parse_args()
+    server = WebhookStub(args.port, verbose=True, delay=args.delay, limit_every=args.limit_every,
+                         retry_after=args.retry_after)
+    print(f"Webhook stub on {server.url}/hook")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
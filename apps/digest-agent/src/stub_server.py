@@ -0,0 +1,77 @@
+"""
+Local stand-in for the GA4 / Shopify APIs: replays recorded fixtures so the
+connectors can run offline.
+
+    PYTHONPATH=apps/digest-agent python -m src.stub_server --port 8765 --delay 0.3
+    GA4_BASE_URL=http://127.0.0.1:8765 SHOPIFY_BASE_URL=http://127.0.0.1:8765 \
+        python -m streamlit run apps/digest-agent/app.py
+
+Fixture entries (see fixtures/connectors.json, or record with RECORD_FIXTURES_TO):
+    {"method": "POST", "path": "...", "match": {...}, "status": 200, "body": {...},
+     "headers": {"Link": "<...?page_info=...>; rel=\"next\""}}
+An entry serves a request when its method and path are equal and every key in
+`match` has the same value in the JSON body or query string; the most specific
+entry wins. "headers" is optional; Shopify pages chain through their Link
+header.
+"""
+import argparse, json, os
+from apps.httputil import LocalServer
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(__file__)), "fixtures", "connectors.json")
+
+
+def _matches(match: dict, request: dict) -> bool:
+    for k, v in match.items():
+        if k not in request:
+            return False
+        got = request[k]
+        # Query-string values arrive as strings
+        if isinstance(got, str) and not isinstance(v, str):
+            v = json.dumps(v) if isinstance(v, (dict, list)) else str(v)
+        if got != v:
+            return False
+    return True
+
+
+class StubServer(LocalServer):
+    def __init__(self, fixtures: list[dict], port: int = 0, **kw):
+        super().__init__(port, **kw)
+        self.fixtures = fixtures
+
+    def lookup(self, method: str, path: str, request: dict) -> dict | None:
+        hits = [f for f in self.fixtures
+                if f["method"] == method and f["path"] == path and _matches(f.get("match", {}), request)]
+        return max(hits, key=lambda f: len(f.get("match", {}))) if hits else None
+
+    def respond(self, method, path, query, body):
+        fixture = self.lookup(method, path, {**query, **(body or {})})
+        if fixture is None:
+            return 404, {"error": f"stub: no fixture for {method} {path}"}
+        return fixture.get("status", 200), fixture["body"], fixture.get("headers")
+
+
+def load_fixtures(path: str = FIXTURES) -> list[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def serve_in_thread(port: int = 0, fixtures_path: str = FIXTURES, delay: float = 0.0,
+                    fail_first: int = 0) -> StubServer:
+    """Start a stub server on a daemon thread; base URL is server.url."""
+    return StubServer(load_fixtures(fixtures_path), port, delay=delay, fail_first=fail_first).start()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Replay recorded GA4/Shopify fixtures over HTTP")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--fixtures", default=FIXTURES)
+    ap.add_argument("--delay", type=float, default=0.0, help="seconds to wait before each response")
+    ap.add_argument("--fail-first", type=int, default=0, help="answer the first N requests with 503")
+    args = ap.parse_args()
+    server = StubServer(load_fixtures(args.fixtures), args.port, delay=args.delay, fail_first=args.fail_first)
+    print(f"Stub server on {server.url} ({len(server.fixtures)} fixtures)")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
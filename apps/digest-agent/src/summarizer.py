@@ -1,4 +1,5 @@
-import os
+import os, json, hashlib, threading, time
+import pandas as pd
 from dotenv import load_dotenv, find_dotenv
 load_dotenv(find_dotenv(), override=True)
 
@@ -7,15 +8,137 @@ what changed and why. Output three sections:
 1) Top 3 Wins, 2) Top 3 Risks, 3) 3 Recommended Actions.
 Reference % changes and channels/products when relevant. Keep under 180 words."""
 
-def summarize(ga4_today: dict, ga4_yday: dict, channels, products) -> str:
+MODEL = os.getenv("OPENAI_MODEL", "gpt-4.1-mini")
+FALLBACK_MODEL = os.getenv("OPENAI_FALLBACK_MODEL", "gpt-4o-mini")
+# Rough budget for the user message; ~4 characters per token
+PROMPT_TOKENS = int(os.getenv("SUMMARY_PROMPT_TOKENS", "600"))
+CACHE_PATH = os.getenv("SUMMARY_CACHE_PATH", os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), ".cache", "digest", "summaries.json"))
+
+
+# --- prompt compaction ---------------------------------------------------------
+
+def _round(v):
+    if isinstance(v, float):
+        return round(v) if abs(v) >= 100 else round(v, 3)
+    return v
+
+
+def compact_table(df: pd.DataFrame, top_n: int, sort_by: str = "revenue") -> str:
+    """Top-N rows by `sort_by`, numbers rounded, as a pipe table (no index, no padding)."""
+    if df is None or df.empty:
+        return "(none)"
+    if sort_by in df.columns:
+        df = df.sort_values(sort_by, ascending=False, kind="stable")
+    df = df.head(top_n).dropna(axis=1, how="all")
+    lines = [" | ".join(map(str, df.columns))]
+    lines += [" | ".join(str(_round(v)) for v in row) for row in df.itertuples(index=False)]
+    return "\n".join(lines)
+
+
+def _kpi_line(today: dict, yday: dict) -> str:
+    parts = []
+    for k, v in today.items():
+        old = yday.get(k)
+        pct = f" ({(v - old) / old * 100:+.1f}%)" if old else ""
+        parts.append(f"{k} {_round(v)} vs {_round(old)}{pct}")
+    return "; ".join(parts)
+
+
+def build_prompt(ga4_today: dict, ga4_yday: dict, channels, products,
+                 max_tokens: int = PROMPT_TOKENS, top_n: int = 8) -> str:
+    """
+    KPI deltas plus the top channels/products. Tables shrink (fewer rows)
+    until the message fits roughly `max_tokens`.
+    """
+    while True:
+        content = (
+            f"KPIs today vs yesterday: {_kpi_line(ga4_today, ga4_yday)}\n\n"
+            f"Channels (top {top_n} by revenue):\n{compact_table(channels, top_n)}\n\n"
+            f"Top products by channel:\n{compact_table(products, top_n)}"
+        )
+        if len(content) <= max_tokens * 4 or top_n <= 1:
+            return content
+        top_n -= 1
+
+
+# --- response cache --------------------------------------------------------------
+
+class SummaryCache:
+    """
+    Summaries keyed by sha256(model, instructions, prompt), kept in one JSON
+    file. Least recently used entries are evicted past `max_entries`;
+    entries older than `ttl_s` (0 = never) are misses. Hits only touch memory;
+    their recency (and expired entries) reach the file with the next put().
+    """
+
+    def __init__(self, path: str = CACHE_PATH, max_entries: int = 256, ttl_s: float = 0):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._entries = None
+
+    @staticmethod
+    def key(model: str, instructions: str, prompt: str) -> str:
+        return hashlib.sha256("\x00".join([model, instructions, prompt]).encode("utf-8")).hexdigest()
+
+    def _load(self) -> dict:
+        if self._entries is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            except (FileNotFoundError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f)
+        os.replace(tmp, self.path)
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            entry = self._load().get(key)
+            if entry is None:
+                return None
+            if self.ttl_s and time.time() - entry["created"] > self.ttl_s:
+                del self._entries[key]
+                return None
+            entry["used"] = time.time()
+            return entry["text"]
+
+    def put(self, key: str, text: str) -> None:
+        with self._lock:
+            entries = self._load()
+            now = time.time()
+            entries[key] = {"text": text, "created": now, "used": now}
+            if len(entries) > self.max_entries:
+                for k in sorted(entries, key=lambda k: entries[k]["used"])[:len(entries) - self.max_entries]:
+                    del entries[k]
+            self._save()
+
+
+_cache = SummaryCache()
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client(key: str):
+    """One OpenAI client per process (keeps its HTTP connection pool); OPENAI_BASE_URL points it at a mock."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            from openai import OpenAI
+            _client = OpenAI(api_key=key, base_url=os.getenv("OPENAI_BASE_URL") or None)
+        return _client
+
+
+def summarize(ga4_today: dict, ga4_yday: dict, channels, products, cache: SummaryCache | None = None) -> str:
     key = os.getenv("OPENAI_API_KEY", "").strip()
-    # Minimal text tables for the model:
-    ch_txt = channels.to_string(index=False)
-    pr_txt = products.to_string(index=False)
-    content = (
-        f"Today: {ga4_today}\nYesterday: {ga4_yday}\n\n"
-        f"Channels:\n{ch_txt}\n\nTop Products by Channel:\n{pr_txt}"
-    )
+    content = build_prompt(ga4_today, ga4_yday, channels, products)
 
     if not key:
         # Mock summary if no key
@@ -25,18 +148,26 @@ def summarize(ga4_today: dict, ga4_yday: dict, channels, products) -> str:
             "Actions: +10% Paid retargeting; refresh top organic landing pages; test email promo."
         )
 
-    from openai import OpenAI
-    client = OpenAI(api_key=key)
+    # Keyed by the model that actually answered; older SDKs always take the fallback path
+    cache = cache or _cache
+    for model in (MODEL, FALLBACK_MODEL):
+        text = cache.get(SummaryCache.key(model, SYSTEM, content))
+        if text is not None:
+            return text
+
+    client = get_client(key)
     try:
         resp = client.responses.create(
-            model="gpt-4.1-mini",
+            model=MODEL,
             input=content,
             instructions=SYSTEM,
         )
-        return resp.output_text
+        text, model = resp.output_text, MODEL
     except TypeError:
         chat = client.chat.completions.create(
-            model="gpt-4o-mini",
+            model=FALLBACK_MODEL,
             messages=[{"role":"system","content":SYSTEM},{"role":"user","content":content}],
         )
-        return chat.choices[0].message.content
+        text, model = chat.choices[0].message.content, FALLBACK_MODEL
+    cache.put(SummaryCache.key(model, SYSTEM, content), text)
+    return text
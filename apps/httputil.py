@@ -0,0 +1,124 @@
+"""
+HTTP helpers shared by the apps: Retry-After parsing, and the local HTTP
+server the stand-ins (stub APIs, mock LLMs, webhook stub) and the keyword
+daemon are built on.
+"""
+import datetime as dt
+import email.utils
+import json, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qsl
+
+LOOPBACK = "127.0.0.1"
+
+
+def retry_after_seconds(value: str | None, default: float | None) -> float | None:
+    """
+    Seconds to wait from a Retry-After header, which is either delta-seconds
+    ("120") or an HTTP-date ("Wed, 21 Oct 2026 07:28:00 GMT"); `default` when
+    the header is missing or unparseable.
+    """
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return default
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=dt.timezone.utc)
+    return max(0.0, (when - dt.datetime.now(dt.timezone.utc)).total_seconds())
+
+
+class LocalServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server on the loopback interface only (none of these
+    servers authenticate callers). Subclasses implement
+    respond(method, path, query, body) -> (status, body[, headers]), where
+    the request body arrives parsed from JSON and a dict reply is sent as
+    JSON (str/bytes as text/plain).
+
+    For exercising clients it can also be slow (`delay` seconds per request),
+    fail the first `fail_first` requests with 503, and answer every
+    `limit_every`-th with 429 + Retry-After. `hits`, `in_flight` and
+    `max_in_flight` count what it has seen.
+    """
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, delay: float = 0.0, fail_first: int = 0, limit_every: int = 0,
+                 retry_after: float = 1.0):
+        super().__init__((LOOPBACK, port), _Handler)
+        self.delay = delay
+        self.fail_first = fail_first
+        self.limit_every = limit_every
+        self.retry_after = retry_after
+        self.hits = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.server_address[0]}:{self.server_port}"
+
+    def start(self):
+        """Serve on a daemon thread; returns self."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def respond(self, method: str, path: str, query: dict, body) -> tuple:
+        return 404, {"error": {"message": f"unknown path {path}"}}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def _serve(self, method: str):
+        server: LocalServer = self.server
+        url = urlsplit(self.path)
+        try:
+            raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            body = json.loads(raw) if raw else None
+        except ValueError as e:
+            return self._send(400, {"error": {"message": f"invalid JSON body: {e}"}})
+        with server.lock:
+            server.hits += 1
+            failed = server.hits <= server.fail_first
+            limited = server.limit_every and server.hits % server.limit_every == 0
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            if server.delay:
+                time.sleep(server.delay)
+            if failed:
+                return self._send(503, {"error": {"message": "simulated failure"}})
+            if limited:
+                return self._send(429, {"error": {"message": "rate limited"}},
+                                  {"Retry-After": f"{server.retry_after:g}"})
+            self._send(*server.respond(method, url.path, dict(parse_qsl(url.query)), body))
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _send(self, status: int, body, headers: dict | None = None):
+        if isinstance(body, (dict, list)):
+            data, kind = json.dumps(body).encode("utf-8"), "application/json"
+        else:
+            data, kind = (body.encode("utf-8") if isinstance(body, str) else body), "text/plain"
+        self.send_response(status)
+        self.send_header("Content-Type", kind)
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._serve("GET")
+
+    def do_POST(self):
+        self._serve("POST")
+
+    def log_message(self, *args):
+        pass
@@ -0,0 +1,197 @@
+from __future__ import annotations
+import argparse, csv, glob, json, os, time, traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from apps.keyword_intel_agent.cli import run
+
+try:
+    import resource  # POSIX only
+except ImportError:  # pragma: no cover - Windows
+    resource = None
+
+
+# -----------------------------------------------------------------------------
+#  Job discovery
+# -----------------------------------------------------------------------------
+def _find_one(folder: str, prefix: str) -> str | None:
+    hits = sorted(glob.glob(os.path.join(folder, f"{prefix}*.csv")))
+    return hits[0] if hits else None
+
+def load_jobs(source: str) -> list[dict]:
+    """
+    Account jobs as dicts with account, gsc and ads paths, from either
+    - a JSON manifest: [{"account": ..., "gsc": ..., "ads": ...}, ...]
+    - a CSV manifest with account,gsc,ads columns
+    - a directory with one sub-folder per account holding gsc*.csv and ads*.csv
+    Relative paths in manifests resolve against the manifest's folder.
+    """
+    if os.path.isdir(source):
+        jobs = []
+        for name in sorted(os.listdir(source)):
+            folder = os.path.join(source, name)
+            if not os.path.isdir(folder):
+                continue
+            gsc, ads = _find_one(folder, "gsc"), _find_one(folder, "ads")
+            if gsc and ads:
+                jobs.append({"account": name, "gsc": gsc, "ads": ads})
+        return jobs
+
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, "r", encoding="utf-8") as f:
+        rows = json.load(f) if source.lower().endswith(".json") else list(csv.DictReader(f))
+    jobs = []
+    for row in rows:
+        jobs.append({
+            "account": row["account"],
+            "gsc": os.path.join(base, row["gsc"]),
+            "ads": os.path.join(base, row["ads"]),
+        })
+    return jobs
+
+def assign_out_dirs(jobs: list[dict]) -> list[dict]:
+    """Give every job its own output folder name; repeated account names get -2, -3, ... suffixes."""
+    seen: dict[str, int] = {}
+    taken = {job["account"] for job in jobs}
+    for job in jobs:
+        name = job["account"]
+        n = seen.get(name, 0) + 1
+        seen[name] = n
+        if n > 1:
+            while f"{name}-{n}" in taken:
+                n += 1
+            seen[name] = n
+            name = f"{name}-{n}"
+            taken.add(name)
+        job["out_dir"] = name
+    return jobs
+
+
+# -----------------------------------------------------------------------------
+#  Worker side
+# -----------------------------------------------------------------------------
+def _limit_memory(max_mb: int | None) -> None:
+    """Pool initializer: cap each worker's address space so one account can't starve the rest."""
+    if max_mb and resource is not None:
+        limit = max_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+def _reset_peak_rss() -> bool:
+    """Reset this process's peak-RSS counter (Linux >= 4.0); False where that isn't possible."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def _peak_rss_mb(since_reset: bool) -> float | None:
+    """
+    Peak RSS of the current job: VmHWM after _reset_peak_rss(), or the
+    process's lifetime ru_maxrss when the worker was fresh for this job.
+    """
+    if since_reset:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    if resource is None:
+        return None
+    # ru_maxrss is KiB on Linux (bytes on macOS; close enough for a summary)
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+def _run_job(job: dict, out_root: str, options: dict, fresh_worker: bool) -> dict:
+    out_dir = os.path.join(out_root, job.get("out_dir", job["account"]))
+    out_path = os.path.join(out_dir, "recommendations.md")
+    # A reused worker's ru_maxrss also covers earlier jobs, so measure from a reset peak
+    reset = _reset_peak_rss()
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    result = {"account": job["account"], "gsc": job["gsc"], "ads": job["ads"], "out": out_path}
+    try:
+        run(job["gsc"], job["ads"], out_path, **options)
+        result["status"] = "ok"
+    except MemoryError:
+        result["status"] = "error"
+        result["error"] = "MemoryError: exceeded the per-job memory limit"
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = f"{type(e).__name__}: {e}"
+        result["traceback"] = traceback.format_exc()
+    result["wall_s"] = round(time.perf_counter() - started, 3)
+    result["cpu_s"] = round(time.process_time() - cpu_started, 3)
+    result["peak_rss_mb"] = _peak_rss_mb(reset) if reset or fresh_worker else None
+    return result
+
+
+# -----------------------------------------------------------------------------
+#  Batch driver
+# -----------------------------------------------------------------------------
+def run_batch(jobs: list[dict], out_root: str, workers: int | None = None,
+              max_memory_mb: int | None = None, options: dict | None = None) -> dict:
+    """
+    Run cli.run for every job in a process pool (imports are paid once per
+    worker, not per account) and write <out_root>/summary.json.
+
+    With max_memory_mb every job runs in a fresh worker process, so the
+    address-space limit applies to that job alone rather than to whatever the
+    worker accumulated before it. peak_rss_mb is per job where the peak can
+    be reset (Linux) or the worker is fresh, and null otherwise.
+    """
+    options = options or {}
+    jobs = assign_out_dirs([dict(job) for job in jobs])
+    fresh = bool(max_memory_mb)
+    # max_tasks_per_child needs a non-fork start method; spawn is the default when it is set
+    pool_kw = {"max_tasks_per_child": 1} if fresh else {}
+    os.makedirs(out_root, exist_ok=True)
+    started = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_limit_memory, initargs=(max_memory_mb,),
+                             **pool_kw) as pool:
+        futures = {pool.submit(_run_job, job, out_root, options, fresh): job for job in jobs}
+        for fut in as_completed(futures):
+            job = futures[fut]
+            try:
+                res = fut.result()
+            except Exception as e:
+                # The worker itself died (e.g. killed by the OS)
+                res = {"account": job["account"], "gsc": job["gsc"], "ads": job["ads"],
+                       "out": os.path.join(out_root, job["out_dir"], "recommendations.md"),
+                       "status": "error", "error": f"{type(e).__name__}: {e}"}
+            results.append(res)
+            print(f"{'✅' if res['status'] == 'ok' else '❌'} {res['account']} ({res.get('wall_s', '—')}s)")
+
+    results.sort(key=lambda r: (r["account"], r.get("out", "")))
+    summary = {
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "wall_s": round(time.perf_counter() - started, 3),
+        "workers": workers or os.cpu_count(),
+        "max_memory_mb": max_memory_mb,
+        "ok": sum(r["status"] == "ok" for r in results),
+        "failed": sum(r["status"] != "ok" for r in results),
+        "accounts": results,
+    }
+    with open(os.path.join(out_root, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Run the keyword agent for many accounts in parallel.")
+    ap.add_argument("--manifest", required=True, help="JSON/CSV manifest or a directory of account folders")
+    ap.add_argument("--out", required=True, help="Output root; one folder per account plus summary.json")
+    ap.add_argument("--workers", type=int, help="Worker processes (default: CPU count)")
+    ap.add_argument("--max-memory-mb", type=int,
+                    help="Address-space limit per account job; each job then gets a fresh worker (POSIX only)")
+    ap.add_argument("--cache-dir", help="Shared parsed-input cache directory")
+    ap.add_argument("--norm-cache", help="Shared normalized-keyword cache file")
+    ap.add_argument("--incremental", action="store_true", help="Incremental mode, state kept per account folder")
+    ap.add_argument("--chunksize", type=int,
+                    help="Stream each export in row batches of this size, aggregated per keyword as read")
+    args = ap.parse_args()
+
+    summary = run_batch(
+        load_jobs(args.manifest), args.out,
+        workers=args.workers, max_memory_mb=args.max_memory_mb,
+        options={"cache_dir": args.cache_dir, "norm_cache": args.norm_cache, "incremental": args.incremental,
+                 "chunksize": args.chunksize},
+    )
+    print(f"Done: {summary['ok']} ok, {summary['failed']} failed in {summary['wall_s']}s → {args.out}/summary.json")
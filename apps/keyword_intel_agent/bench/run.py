@@ -0,0 +1,182 @@
+from __future__ import annotations
+import argparse, gc, importlib.util, json, os, platform, sys, time
+import numpy as np
+import pandas as pd
+from apps.keyword_intel_agent.bench.synth import SyntheticSpec, parse_rows, write_dataset
+from apps.keyword_intel_agent.src.loaders import load_gsc_csv, load_ads_csv
+from apps.keyword_intel_agent.src.metrics import add_kw_norm_cols, compute_overlap_segments, roi_signals
+from apps.keyword_intel_agent.src.ai import fallback_rules
+
+BENCH_DIR = os.path.dirname(__file__)
+DATA_DIR = os.path.join(os.path.dirname(BENCH_DIR), ".cache", "bench")
+BASELINES = os.path.join(BENCH_DIR, "baselines.json")
+
+STAGES = ["load", "normalize", "overlap_exact", "overlap_fuzzy", "overlap_tfidf", "roi_signals", "fallback_rules"]
+# Stages that spread work over all cores (rapidfuzz cdist workers=-1); their
+# timings only compare between machines with the same CPU count
+PARALLEL_STAGES = {"overlap_fuzzy"}
+
+
+# -----------------------------------------------------------------------------
+#  Timing
+# -----------------------------------------------------------------------------
+def _best_of(fn, repeat: int) -> tuple[float, object]:
+    """Fastest of `repeat` runs (least disturbed by other load) and the last result."""
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        gc.collect()
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def bench_size(rows: int, stages: list[str], repeat: int = 3, fuzzy_max_rows: int = 10_000,
+               data_dir: str = DATA_DIR, seed: int = 0) -> dict[str, float]:
+    """Seconds per stage for one synthetic dataset; each stage feeds the next."""
+    gsc_path, ads_path = write_dataset(SyntheticSpec(rows, seed=seed), data_dir)
+    res: dict[str, float] = {}
+
+    t, (gsc, ads) = _best_of(lambda: (load_gsc_csv(gsc_path), load_ads_csv(ads_path)), repeat)
+    if "load" in stages:
+        res["load"] = t
+
+    t, (gsc, ads) = _best_of(lambda: add_kw_norm_cols(gsc, ads), repeat)
+    if "normalize" in stages:
+        res["normalize"] = t
+
+    t, seg = _best_of(lambda: compute_overlap_segments(gsc, ads, fuzzy=False), repeat)
+    if "overlap_exact" in stages:
+        res["overlap_exact"] = t
+
+    if "overlap_fuzzy" in stages and rows <= fuzzy_max_rows:
+        res["overlap_fuzzy"], _ = _best_of(
+            lambda: compute_overlap_segments(gsc, ads, fuzzy=True, threshold=90), repeat)
+    if "overlap_tfidf" in stages and rows <= fuzzy_max_rows * 10 and importlib.util.find_spec("scipy"):
+        res["overlap_tfidf"], _ = _best_of(
+            lambda: compute_overlap_segments(gsc, ads, fuzzy=True, threshold=90, matcher="tfidf"), repeat)
+
+    t, overlap = _best_of(lambda: roi_signals(seg["overlap"]), repeat)
+    if "roi_signals" in stages:
+        res["roi_signals"] = t
+
+    if "fallback_rules" in stages:
+        res["fallback_rules"], _ = _best_of(
+            lambda: fallback_rules(overlap, seg["organic_only"], seg["paid_only"]), repeat)
+    return {k: round(v, 4) for k, v in res.items()}
+
+
+def _size_label(rows: int) -> str:
+    for unit, div in (("M", 1_000_000), ("k", 1_000)):
+        if rows >= div and rows % div == 0:
+            return f"{rows // div}{unit}"
+    return str(rows)
+
+
+def environment() -> dict:
+    return {
+        "python": platform.python_version(), "pandas": pd.__version__, "numpy": np.__version__,
+        "machine": platform.machine(), "cpus": os.cpu_count(),
+    }
+
+
+# -----------------------------------------------------------------------------
+#  Baselines
+# -----------------------------------------------------------------------------
+def baseline_cpus(data: dict, size: str) -> int | None:
+    """CPU count the baseline for `size` was recorded with."""
+    env = data.get("environments", {}).get(size) or data.get("environment", {})
+    return env.get("cpus")
+
+
+def compare(results: dict, baseline: dict, threshold: float = 0.25, min_delta: float = 0.01,
+            cpus: dict[str, int | None] | None = None) -> list[str]:
+    """
+    Regressions as readable lines: a stage is flagged when it is more than
+    `threshold` (relative) and `min_delta` seconds (absolute) slower than baseline.
+    Stages or sizes missing from the baseline are skipped, and so are
+    PARALLEL_STAGES when `cpus` (size -> baseline CPU count) differs from this
+    machine's.
+    """
+    out = []
+    for size, stages in results.items():
+        base = baseline.get(size, {})
+        same_cpus = cpus is None or cpus.get(size) == os.cpu_count()
+        for stage, secs in stages.items():
+            ref = base.get(stage)
+            if ref is None or (stage in PARALLEL_STAGES and not same_cpus):
+                continue
+            if secs > ref * (1 + threshold) and secs - ref > min_delta:
+                out.append(f"{size} {stage}: {secs:.4f}s vs baseline {ref:.4f}s (+{(secs / ref - 1) * 100:.0f}%)")
+    return out
+
+
+def load_baseline(path: str = BASELINES) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(results: dict, path: str = BASELINES) -> None:
+    data = load_baseline(path)
+    env = environment()
+    for size, stages in results.items():
+        data.setdefault("results", {}).setdefault(size, {}).update(stages)
+        data.setdefault("environments", {})[size] = env
+    data["environment"] = env
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Benchmark the keyword pipeline on synthetic data.")
+    ap.add_argument("--sizes", default="10k,100k", help="Comma-separated GSC row counts (10k, 100k, 1M, 10M)")
+    ap.add_argument("--stages", default=",".join(STAGES), help="Comma-separated subset of: " + ", ".join(STAGES))
+    ap.add_argument("--repeat", type=int, default=3, help="Runs per stage; the fastest is kept")
+    ap.add_argument("--fuzzy-max-rows", type=int, default=10_000,
+                    help="Skip fuzzy overlap above this many rows (it grows ~quadratically); TF-IDF gets 10x")
+    ap.add_argument("--data-dir", default=DATA_DIR, help="Where generated CSVs are kept between runs")
+    ap.add_argument("--out", help="Also write results JSON here")
+    ap.add_argument("--baseline", default=BASELINES)
+    ap.add_argument("--check", action="store_true", help="Exit 1 if any stage regressed past --threshold")
+    ap.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown vs baseline (0.25 = 25%%)")
+    ap.add_argument("--update-baseline", action="store_true", help="Store these results as the new baseline")
+    args = ap.parse_args()
+
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        ap.error(f"unknown stages: {', '.join(sorted(unknown))}")
+
+    results = {}
+    for size in args.sizes.split(","):
+        rows = parse_rows(size)
+        label = _size_label(rows)
+        results[label] = bench_size(rows, stages, args.repeat, args.fuzzy_max_rows, args.data_dir)
+        print(f"{label:>6}  " + "  ".join(f"{k}={v:.4f}s" for k, v in results[label].items()))
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment(), "results": results}, f, indent=2)
+    if args.update_baseline:
+        save_baseline(results, args.baseline)
+        print(f"✅ Baseline updated: {args.baseline}")
+    if args.check:
+        data = load_baseline(args.baseline)
+        baseline = data.get("results", {})
+        if not baseline:
+            print(f"⚠️ No baseline at {args.baseline}; run with --update-baseline first.")
+            sys.exit(1)
+        cpus = {size: baseline_cpus(data, size) for size in results}
+        for size, n in cpus.items():
+            if n != os.cpu_count():
+                print(f"⚠️ {size} baseline was recorded on {n} CPUs, this machine has {os.cpu_count()}; "
+                      f"skipping {', '.join(sorted(PARALLEL_STAGES))}")
+        regressions = compare(results, baseline, args.threshold, cpus=cpus)
+        for line in regressions:
+            print(f"❌ {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"✅ No regressions beyond {args.threshold:.0%}")
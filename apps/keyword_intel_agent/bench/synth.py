@@ -0,0 +1,227 @@
+from __future__ import annotations
+import argparse, os
+from typing import Iterator
+import numpy as np
+import pandas as pd
+
+# -----------------------------------------------------------------------------
+#  Keyword vocabulary
+# -----------------------------------------------------------------------------
+# Keywords are built slot by slot ("" = slot left out), e.g. "nike trail running
+# shoes for women". Words don't repeat across slots, so distinct ids give distinct keywords.
+_SLOTS = [
+    ["nike", "adidas", "asics", "brooks", "hoka", "saucony", "new balance", "puma", "reebok", "mizuno",
+     "salomon", "on cloud", "altra", "merrell", "under armour", "skechers", "vans", "converse",
+     "fila", "columbia", "patagonia", "north face", "garmin", "polar", "suunto", "lululemon",
+     "gymshark", "decathlon", "kalenji", "inov8"],
+    ["", "trail", "road", "running", "walking", "hiking", "training", "gym", "tennis", "basketball",
+     "soccer", "golf", "yoga", "crossfit", "marathon", "racing", "casual", "waterproof", "winter",
+     "summer", "lightweight", "cushioned", "wide", "vegan", "recycled", "carbon", "minimalist",
+     "zero drop", "stability", "neutral", "gore tex", "reflective", "insulated", "breathable",
+     "leather", "mesh", "knit", "slip on", "high top", "low top"],
+    ["shoes", "sneakers", "boots", "sandals", "socks", "shorts", "tights", "leggings", "jacket",
+     "vest", "hoodie", "tee", "tank", "bra", "cap", "gloves", "watch", "backpack", "hydration pack",
+     "insoles", "laces", "headband", "sunglasses", "belt", "bottle", "poles", "gaiters", "beanie",
+     "pants", "joggers", "trainers", "spikes", "clogs", "slides", "windbreaker", "parka", "fleece",
+     "thermal top", "compression sleeve", "arm warmers"],
+    ["", "for women", "for men", "for kids", "for flat feet", "for beginners", "for plantar fasciitis",
+     "for overpronation", "for high arches", "for wide feet", "for heavy runners", "for seniors",
+     "for nurses", "for travel", "for rain", "for snow", "for mud", "for treadmill", "for ultra",
+     "for 5k", "for half marathon", "for standing all day"],
+    ["", "sale", "cheap", "best", "review", "reviews", "2024", "2025", "near me", "online",
+     "discount", "clearance", "outlet", "coupon", "size guide", "vs", "price", "deals", "new",
+     "black", "white", "red", "blue", "green", "pink", "grey"],
+]
+_RADIX = [len(s) for s in _SLOTS]
+VOCAB_SIZE = int(np.prod(_RADIX))
+
+# Multiplier coprime with VOCAB_SIZE: id -> (id * M) mod size is a bijection that
+# scatters consecutive ids across brands/products instead of enumerating in order
+_SCATTER = 2_654_435_761
+
+
+def keywords(ids: np.ndarray) -> np.ndarray:
+    """Distinct keyword strings for distinct ids in [0, VOCAB_SIZE)."""
+    code = (ids.astype(np.int64) * _SCATTER) % VOCAB_SIZE
+    parts = []
+    for words, radix in zip(_SLOTS, _RADIX):
+        parts.append(np.asarray(words, dtype=object)[code % radix])
+        code //= radix
+    out = pd.Series(parts[0])
+    for p in parts[1:]:
+        out = out + " " + p
+    return out.str.replace(r"\s+", " ", regex=True).str.strip().to_numpy(dtype=object)
+
+
+# -----------------------------------------------------------------------------
+#  Near-duplicate variants (what fuzzy matching is meant to catch)
+# -----------------------------------------------------------------------------
+def _plural(s: pd.Series) -> pd.Series:
+    return s.where(s.str.endswith("s"), s + "s")
+
+def _swap(s: pd.Series) -> pd.Series:
+    # "a b c" -> "b a c"
+    return s.str.replace(r"^(\S+) (\S+)", r"\2 \1", regex=True)
+
+def _typo(s: pd.Series) -> pd.Series:
+    # Drop the 3rd character
+    return s.str.slice(0, 2) + s.str.slice(3)
+
+def _styled(s: pd.Series) -> pd.Series:
+    # Case/punctuation noise that normalization removes entirely
+    return s.str.title().str.replace(" ", "  ", n=1, regex=False) + "!"
+
+_VARIANTS = [_plural, _swap, _typo, _styled]
+
+
+def variants(kws: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    s = pd.Series(kws, dtype=object)
+    kind = rng.integers(0, len(_VARIANTS), len(s))
+    out = s.copy()
+    for i, fn in enumerate(_VARIANTS):
+        m = kind == i
+        if m.any():
+            out[m] = fn(s[m])
+    return out.to_numpy(dtype=object)
+
+
+# -----------------------------------------------------------------------------
+#  Row generators
+# -----------------------------------------------------------------------------
+_POS_CTR = np.array([0.30, 0.20, 0.15, 0.10, 0.05, 0.02])
+
+def _gsc_chunk(kw: np.ndarray, rng: np.random.Generator) -> pd.DataFrame:
+    n = len(kw)
+    position = np.round(np.clip(rng.gamma(1.6, 6.0, n) + 1, 1, 100), 1)
+    impressions = np.maximum(1, rng.lognormal(4.5, 1.6, n)).astype(np.int64)
+    bucket = np.searchsorted([1, 2, 3, 5, 10], position, side="left")
+    ctr = np.clip(_POS_CTR[bucket] * rng.lognormal(0, 0.5, n), 0, 1)
+    clicks = np.minimum(impressions, np.round(impressions * ctr)).astype(np.int64)
+    slug = pd.Series(kw, dtype=object).str.lower().str.replace(r"[^a-z0-9]+", "-", regex=True)
+    page = "https://shop.example.com/" + slug + "/" + pd.Series(rng.integers(1, 40, n)).astype(str)
+    return pd.DataFrame({
+        "page": page.to_numpy(dtype=object), "query": kw,
+        "clicks": clicks, "impressions": impressions,
+        "ctr": np.round(np.where(impressions > 0, clicks / impressions, 0), 4),
+        "position": position,
+    })
+
+def _ads_chunk(kw: np.ndarray, rng: np.random.Generator) -> pd.DataFrame:
+    n = len(kw)
+    clicks = rng.negative_binomial(2, 0.05, n).astype(np.int64)
+    cpc = np.round(rng.lognormal(0.3, 0.7, n), 2)
+    conv = rng.binomial(clicks, 0.04).astype(float)
+    campaign = "Campaign " + pd.Series(rng.integers(1, 25, n)).astype(str).str.zfill(2)
+    adgroup = pd.Series(kw, dtype=object).str.split(" ", n=1).str[0].str.title() + " | " + \
+        pd.Series(rng.integers(1, 6, n)).astype(str)
+    return pd.DataFrame({
+        "campaign": campaign.to_numpy(dtype=object), "adgroup": adgroup.to_numpy(dtype=object), "keyword": kw,
+        "clicks": clicks, "cost": np.round(clicks * cpc, 2), "cpc": cpc,
+        # Ads exports write conversions as decimals
+        "conversions": conv,
+    })
+
+
+class SyntheticSpec:
+    """
+    Shape of a synthetic GSC/Ads pair.
+      rows            GSC rows; Ads rows = rows * ads_ratio
+      rows_per_key    average rows per keyword (same query on several pages /
+                      same keyword in several ad groups)
+      overlap         share of Ads keywords that also appear in GSC
+      variant_rate    share of overlapping Ads keywords written as a near-duplicate
+    """
+
+    def __init__(self, rows: int, ads_ratio: float = 0.25, rows_per_key: float = 3.0,
+                 overlap: float = 0.6, variant_rate: float = 0.15, seed: int = 0):
+        self.rows = int(rows)
+        self.ads_rows = max(1, int(rows * ads_ratio))
+        self.rows_per_key = rows_per_key
+        self.overlap = overlap
+        self.variant_rate = variant_rate
+        self.seed = seed
+        self.gsc_keys = max(1, int(self.rows / rows_per_key))
+        self.ads_keys = max(1, int(self.ads_rows / rows_per_key))
+        if self.gsc_keys + self.ads_keys > VOCAB_SIZE:
+            raise ValueError(f"Spec needs more distinct keywords than the vocabulary has ({VOCAB_SIZE:,})")
+
+    def slug(self) -> str:
+        return (f"r{self.rows}-a{self.ads_rows}-k{self.rows_per_key:g}-o{self.overlap:g}"
+                f"-v{self.variant_rate:g}-s{self.seed}")
+
+    def _ads_key_ids(self, rng: np.random.Generator) -> tuple[np.ndarray, np.ndarray]:
+        """Ads keyword ids plus a mask of those to write as variants."""
+        shared = int(self.ads_keys * self.overlap)
+        ids = np.concatenate([
+            rng.choice(self.gsc_keys, size=min(shared, self.gsc_keys), replace=False),
+            # Ads-only keywords come from ids after the GSC range
+            self.gsc_keys + np.arange(self.ads_keys - min(shared, self.gsc_keys)),
+        ])
+        is_variant = (ids < self.gsc_keys) & (rng.random(len(ids)) < self.variant_rate)
+        return ids, is_variant
+
+    def iter_gsc(self, chunk_rows: int = 1_000_000) -> Iterator[pd.DataFrame]:
+        rng = np.random.default_rng([self.seed, 1])
+        for start in range(0, self.rows, chunk_rows):
+            n = min(chunk_rows, self.rows - start)
+            ids = rng.integers(0, self.gsc_keys, n)
+            # Every keyword appears at least once so the planned overlap exists
+            head = np.arange(start, min(start + n, self.gsc_keys))
+            ids[:len(head)] = head
+            yield _gsc_chunk(keywords(ids), rng)
+
+    def iter_ads(self, chunk_rows: int = 1_000_000) -> Iterator[pd.DataFrame]:
+        rng = np.random.default_rng([self.seed, 2])
+        key_ids, is_variant = self._ads_key_ids(rng)
+        text = keywords(key_ids)
+        text[is_variant] = variants(text[is_variant], rng)
+        for start in range(0, self.ads_rows, chunk_rows):
+            n = min(chunk_rows, self.ads_rows - start)
+            pick = rng.integers(0, len(key_ids), n)
+            head = np.arange(start, min(start + n, len(key_ids)))
+            pick[:len(head)] = head
+            yield _ads_chunk(text[pick], rng)
+
+
+def _write(chunks: Iterator[pd.DataFrame], path: str) -> None:
+    tmp = f"{path}.{os.getpid()}.tmp"
+    for i, chunk in enumerate(chunks):
+        chunk.to_csv(tmp, mode="w" if i == 0 else "a", header=i == 0, index=False)
+    os.replace(tmp, path)
+
+
+def write_dataset(spec: SyntheticSpec, out_dir: str, overwrite: bool = False) -> tuple[str, str]:
+    """Write gsc.csv and ads.csv for spec under out_dir/<spec slug>/ (reused if present)."""
+    folder = os.path.join(out_dir, spec.slug())
+    gsc_path, ads_path = os.path.join(folder, "gsc.csv"), os.path.join(folder, "ads.csv")
+    os.makedirs(folder, exist_ok=True)
+    if overwrite or not os.path.exists(gsc_path):
+        _write(spec.iter_gsc(), gsc_path)
+    if overwrite or not os.path.exists(ads_path):
+        _write(spec.iter_ads(), ads_path)
+    return gsc_path, ads_path
+
+
+def parse_rows(text: str) -> int:
+    """'10k' -> 10_000, '1M' -> 1_000_000, '2500' -> 2500."""
+    t = text.strip().lower().replace("_", "")
+    mult = {"k": 1_000, "m": 1_000_000}.get(t[-1:], 1)
+    return int(float(t[:-1] if mult > 1 else t) * mult)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Generate synthetic GSC + Ads CSVs.")
+    ap.add_argument("--rows", default="10k", help="GSC rows, e.g. 10k, 100k, 1M, 10M")
+    ap.add_argument("--out", default=os.path.join(os.path.dirname(os.path.dirname(__file__)), ".cache", "bench"))
+    ap.add_argument("--ads-ratio", type=float, default=0.25)
+    ap.add_argument("--rows-per-key", type=float, default=3.0)
+    ap.add_argument("--overlap", type=float, default=0.6)
+    ap.add_argument("--variant-rate", type=float, default=0.15)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--overwrite", action="store_true")
+    args = ap.parse_args()
+
+    spec = SyntheticSpec(parse_rows(args.rows), ads_ratio=args.ads_ratio, rows_per_key=args.rows_per_key,
+                         overlap=args.overlap, variant_rate=args.variant_rate, seed=args.seed)
+    gsc_path, ads_path = write_dataset(spec, args.out, overwrite=args.overwrite)
+    print(f"✅ Wrote {gsc_path} and {ads_path}")
@@ -1,25 +1,177 @@
 from __future__ import annotations
 import argparse, os, pandas as pd
-from apps.keyword_intel_agent.src.loaders import load_gsc_csv, load_ads_csv
+from apps.keyword_intel_agent.src.loaders import load_gsc_csv, load_ads_csv, iter_gsc_csv, iter_ads_csv
 from apps.keyword_intel_agent.src.metrics import add_kw_norm_cols, compute_overlap_segments, roi_signals
+from apps.keyword_intel_agent.src.normalize import NormalizeCache
+from apps.keyword_intel_agent.src.cache import FrameCache, MemoryFrameCache, load_normalized_inputs
+from apps.keyword_intel_agent.src.match_store import MatchStore
+from apps.keyword_intel_agent.src.matching import MatcherCache, available_matchers
+from apps.keyword_intel_agent.src.incremental import incremental_segments, change_report
 from apps.keyword_intel_agent.src.ai import fallback_rules
+from apps.keyword_intel_agent.src.llm_recs import LLMRecommender, KeywordCache, llm_recommendations
+from apps.keyword_intel_agent.src.compact import compact_inputs, expand
+from apps.keyword_intel_agent.src.aggregate import aggregate_inputs, aggregate_chunks
+from apps.keyword_intel_agent.src.profiling import PipelineProfiler
 
-def run(gsc_path: str, ads_path: str, out_path: str):
-    gsc = load_gsc_csv(gsc_path)
-    ads = load_ads_csv(ads_path)
-    gsc, ads = add_kw_norm_cols(gsc, ads)
-    seg = compute_overlap_segments(gsc, ads, fuzzy=True, threshold=90)
-    overlap = roi_signals(seg["overlap"]) if not seg["overlap"].empty else seg["overlap"]
-    md = fallback_rules(overlap, seg["organic_only"], seg["paid_only"])
-    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+def run(gsc_path: str, ads_path: str, out_path: str, norm_cache: str | None = None,
+        engine: str | None = None, cache_dir: str | None = None,
+        match_store: str | None = None, incremental: bool = False, state_dir: str | None = None,
+        top_k: int = 5, compact: bool = False, aggregate: bool = False, matcher: str = "rapidfuzz",
+        threshold: float = 90, chunksize: int | None = None, profile: bool = False, trace_malloc: bool = False,
+        cprofile_stage: str | None = None, llm: bool = False, llm_max_keywords: int = 300,
+        llm_concurrency: int = 4, llm_cache: str | None = None, frames: MemoryFrameCache | None = None,
+        matchers: MatcherCache | None = None):
+    """
+    frames/matchers are the warm in-memory caches a long-running caller
+    (daemon.py) keeps between runs; with frames, cache_dir is not used (the
+    daemon's own --cache-dir backs the memory cache). With chunksize the
+    exports are streamed in row batches and rolled up per keyword as they are
+    read (as with aggregate=True), so raw rows never sit in memory together.
+    """
+    prof = PipelineProfiler(enabled=profile, trace_malloc=trace_malloc, cprofile_stage=cprofile_stage)
+    cache = NormalizeCache(path=norm_cache) if norm_cache else None
+    if chunksize:
+        # One raw batch at a time: normalized, then folded into per-keyword partials
+        with prof.stage("load") as rec:
+            gsc = aggregate_chunks(iter_gsc_csv(gsc_path, chunksize, cache), "gsc")
+            ads = aggregate_chunks(iter_ads_csv(ads_path, chunksize, cache), "ads")
+            rec.rows_out = (gsc, ads)
+            rec.info["includes"] = "normalize, aggregate (streamed)"
+    elif frames is not None:
+        # Parsed + normalized inputs stay in memory between daemon jobs
+        with prof.stage("load") as rec:
+            gsc, ads = load_normalized_inputs(gsc_path, ads_path, frames, cache, engine=engine)
+            rec.rows_out = (gsc, ads)
+            rec.info["includes"] = "normalize (memory cache)"
+    elif cache_dir:
+        # Unchanged inputs come straight from the columnar cache, skipping parsing
+        with prof.stage("load") as rec:
+            gsc, ads = load_normalized_inputs(gsc_path, ads_path, FrameCache(cache_dir), cache, engine=engine)
+            rec.rows_out = (gsc, ads)
+            rec.info["includes"] = "normalize (frame cache)"
+    else:
+        with prof.stage("load") as rec:
+            gsc = load_gsc_csv(gsc_path, engine=engine)
+            ads = load_ads_csv(ads_path, engine=engine)
+            rec.rows_out = (gsc, ads)
+        with prof.stage("normalize", rows_in=(gsc, ads)) as rec:
+            gsc, ads = add_kw_norm_cols(gsc, ads, cache=cache)
+            rec.rows_out = (gsc, ads)
+    if cache is not None:
+        cache.save()
+    if compact:
+        # Categorical text + shared kw_norm codes; strings only reappear on export
+        with prof.stage("compact", rows_in=(gsc, ads)) as rec:
+            gsc, ads = compact_inputs(gsc, ads)
+            rec.rows_out = (gsc, ads)
+    if aggregate and not chunksize:
+        # One row per kw_norm per side: the join and every later stage shrink accordingly
+        with prof.stage("aggregate", rows_in=(gsc, ads)) as rec:
+            gsc, ads = aggregate_inputs(gsc, ads)
+            rec.rows_out = (gsc, ads)
+    out_dir = os.path.dirname(out_path) or "."
+    os.makedirs(out_dir, exist_ok=True)
+    if incremental:
+        state_dir = state_dir or os.path.join(out_dir, ".keyword_state")
+        # The snapshot keeps its own match store so the fuzzy map is a delta too
+        with prof.stage("overlap", rows_in=(gsc, ads)) as rec:
+            with MatchStore(match_store or os.path.join(state_dir, "matches.sqlite")) as store:
+                seg, previous, stats = incremental_segments(
+                    gsc, ads, state_dir, fuzzy=True, threshold=threshold, match_store=store, matcher=matcher
+                )
+            rec.rows_out = seg
+            rec.info.update({"includes": "signals (incremental)", "mode": stats["mode"]})
+        overlap = seg["overlap"]
+        with prof.stage("export", rows_in=seg):
+            for name, df in seg.items():
+                expand(df).to_csv(os.path.join(out_dir, f"{name}.csv"), index=False)
+            changes_path = os.path.splitext(out_path)[0] + "_changes.md"
+            with open(changes_path, "w", encoding="utf-8") as f:
+                f.write(change_report(previous, seg, stats))
+        print(f"✅ Wrote segments and change report to {changes_path}")
+    else:
+        with prof.stage("overlap", rows_in=(gsc, ads)) as rec:
+            if match_store:
+                with MatchStore(match_store) as store:
+                    seg = compute_overlap_segments(gsc, ads, fuzzy=True, threshold=threshold,
+                                                   match_store=store, matcher=matcher)
+            else:
+                seg = compute_overlap_segments(gsc, ads, fuzzy=True, threshold=threshold, matcher=matcher,
+                                               matchers=matchers)
+            rec.rows_out = seg
+        with prof.stage("signals", rows_in=seg["overlap"]) as rec:
+            overlap = roi_signals(seg["overlap"]) if not seg["overlap"].empty else seg["overlap"]
+            rec.rows_out = overlap
+    with prof.stage("recommendations", rows_in=(overlap, seg["organic_only"], seg["paid_only"])) as rec:
+        if llm:
+            # Token-budgeted keyword batches, sent concurrently; keywords answered before come from the cache
+            llm_cache_store = KeywordCache(llm_cache or os.path.join(out_dir, ".llm_cache.sqlite"))
+            recommender = LLMRecommender(concurrency=llm_concurrency, cache=llm_cache_store)
+            md, table = llm_recommendations(overlap, seg["organic_only"], seg["paid_only"], recommender,
+                                            max_keywords=llm_max_keywords, k=top_k)
+            llm_cache_store.close()
+            table.to_csv(os.path.splitext(out_path)[0] + "_llm.csv", index=False)
+            rec.info.update(recommender.stats)
+        else:
+            md = fallback_rules(overlap, seg["organic_only"], seg["paid_only"], k=top_k)
+        rec.info["top_k"] = top_k
     with open(out_path, "w", encoding="utf-8") as f:
         f.write(md)
     print(f"✅ Wrote recommendations to {out_path}")
+    if profile:
+        trace_path = prof.write(gsc=str(gsc_path), ads=str(ads_path), out=out_path)
+        print(f"⏱️ Wrote profile to {trace_path}")
 
-if __name__ == "__main__":
+def build_parser() -> argparse.ArgumentParser:
     ap = argparse.ArgumentParser()
     ap.add_argument("--gsc", required=True)
     ap.add_argument("--ads", required=True)
     ap.add_argument("--out", required=True)
-    args = ap.parse_args()
-    run(args.gsc, args.ads, args.out)
+    ap.add_argument("--norm-cache", help="JSON file caching normalized keywords across runs")
+    ap.add_argument("--engine", choices=["c", "python", "pyarrow"], help="pandas CSV parser engine")
+    ap.add_argument("--cache-dir", help="Directory caching parsed + normalized inputs by content hash")
+    ap.add_argument("--match-store", help="SQLite file persisting fuzzy matches for incremental re-runs")
+    ap.add_argument("--incremental", action="store_true",
+                    help="Only rebuild keywords changed since the last run; writes segment CSVs and a change report")
+    ap.add_argument("--state-dir", help="Snapshot directory for --incremental (default: <out dir>/.keyword_state)")
+    ap.add_argument("--top-k", type=int, default=5, help="Rows per recommendation list")
+    ap.add_argument("--compact", action="store_true",
+                    help="Hold keywords as shared categorical codes and downcast counts (lower memory, int joins)")
+    ap.add_argument("--matcher", choices=sorted(available_matchers()), default="rapidfuzz",
+                    help="Fuzzy backend: rapidfuzz token_sort_ratio or char n-gram TF-IDF cosine (needs scipy)")
+    ap.add_argument("--threshold", type=float, default=90, help="Minimum match score, 0-100")
+    ap.add_argument("--aggregate", action="store_true",
+                    help="Roll GSC and Ads up to one row per normalized keyword before joining")
+    ap.add_argument("--chunksize", type=int,
+                    help="Stream both exports in row batches of this size, rolling them up per normalized "
+                         "keyword as they are read (implies --aggregate; bounds peak memory by keyword count)")
+    ap.add_argument("--profile", action="store_true",
+                    help="Record per-stage time, memory and row counts to logs/keyword-profile-<ts>-<id>.json")
+    ap.add_argument("--trace-malloc", action="store_true",
+                    help="With --profile, also record tracemalloc peaks per stage (slower)")
+    ap.add_argument("--cprofile-stage",
+                    choices=["load", "normalize", "compact", "aggregate", "overlap", "signals", "export",
+                             "recommendations"],
+                    help="With --profile, run this stage under cProfile and dump a .prof next to the trace")
+    ap.add_argument("--llm", action="store_true",
+                    help="Per-keyword recommendations from an OpenAI-compatible endpoint (OPENAI_API_KEY, "
+                         "OPENAI_BASE_URL); also writes <out>_llm.csv")
+    ap.add_argument("--llm-max-keywords", type=int, default=300, help="With --llm, top keywords sent per segment")
+    ap.add_argument("--llm-concurrency", type=int, default=4, help="With --llm, requests in flight")
+    ap.add_argument("--llm-cache",
+                    help="With --llm, SQLite per-keyword answer cache (default: <out dir>/.llm_cache.sqlite)")
+    return ap
+
+def run_kwargs(args: argparse.Namespace) -> dict:
+    """Keyword arguments for run() from parsed command-line flags."""
+    return dict(gsc_path=args.gsc, ads_path=args.ads, out_path=args.out, norm_cache=args.norm_cache,
+                engine=args.engine, cache_dir=args.cache_dir,
+                match_store=args.match_store, incremental=args.incremental, state_dir=args.state_dir,
+                top_k=args.top_k, compact=args.compact, aggregate=args.aggregate,
+                matcher=args.matcher, threshold=args.threshold, chunksize=args.chunksize, profile=args.profile,
+                trace_malloc=args.trace_malloc, cprofile_stage=args.cprofile_stage, llm=args.llm,
+                llm_max_keywords=args.llm_max_keywords, llm_concurrency=args.llm_concurrency,
+                llm_cache=args.llm_cache)
+
+if __name__ == "__main__":
+    run(**run_kwargs(build_parser().parse_args()))
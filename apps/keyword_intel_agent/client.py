@@ -0,0 +1,61 @@
+"""
+Thin client for daemon.py: forwards cli.py flags to a running daemon and
+prints its output. Standard library only, so a call costs interpreter
+startup and one local HTTP request.
+
+    python -m apps.keyword_intel_agent.client --gsc gsc.csv --ads ads.csv --out out/recommendations.md --aggregate
+    python -m apps.keyword_intel_agent.client --health
+"""
+from __future__ import annotations
+import argparse, json, os, sys
+import urllib.error, urllib.request
+
+DEFAULT_URL = os.getenv("KW_DAEMON_URL", "http://127.0.0.1:8770")
+
+
+def call(url: str, path: str, body: dict | None = None, timeout: float = 3600) -> tuple[int, dict]:
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    req = urllib.request.Request(url.rstrip("/") + path, data=data, method="POST" if data is not None else "GET",
+                                 headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return resp.status, json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b"{}")
+
+
+def submit(argv: list[str], url: str = DEFAULT_URL, timeout: float = 3600) -> dict:
+    """Run one job with cli.py flags; relative paths resolve against this process's cwd."""
+    return call(url, "/run", {"argv": argv, "cwd": os.getcwd()}, timeout)[1]
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Send a keyword analysis job to a running daemon.",
+                                 epilog="Any other flags are passed through as cli.py flags.")
+    ap.add_argument("--daemon", default=DEFAULT_URL, help="Daemon URL (default: $KW_DAEMON_URL or %(default)s)")
+    ap.add_argument("--timeout", type=float, default=3600, help="Seconds to wait for the job")
+    ap.add_argument("--health", action="store_true", help="Print the daemon's status and exit")
+    ap.add_argument("--stop", action="store_true", help="Ask the daemon to shut down")
+    ap.add_argument("--local-fallback", action="store_true",
+                    help="Run in this process if the daemon is not reachable")
+    args, rest = ap.parse_known_args()
+
+    try:
+        if args.health or args.stop:
+            _, body = call(args.daemon, "/health" if args.health else "/shutdown", None if args.health else {},
+                           timeout=10)
+            print(json.dumps(body, indent=2))
+            sys.exit(0)
+        result = submit(rest, args.daemon, args.timeout)
+    except (urllib.error.URLError, ConnectionError) as e:
+        if not args.local_fallback or args.health or args.stop:
+            print(f"❌ Keyword daemon not reachable at {args.daemon}: {e}", file=sys.stderr)
+            sys.exit(2)
+        from apps.keyword_intel_agent.cli import build_parser, run, run_kwargs
+        run(**run_kwargs(build_parser().parse_args(rest)))
+        sys.exit(0)
+
+    sys.stdout.write(result.get("log", ""))
+    if result.get("status") != "ok":
+        print(f"❌ {result.get('error', 'job failed')}", file=sys.stderr)
+        sys.exit(1)
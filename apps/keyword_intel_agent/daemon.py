@@ -0,0 +1,150 @@
+"""
+Warm keyword analysis daemon: one long-running process that keeps pandas,
+rapidfuzz, parsed inputs and the Ads keyword match indexes in memory and runs
+cli.run jobs sent over local HTTP.
+
+    python -m apps.keyword_intel_agent.daemon --port 8770 --cache-dir .cache/frames
+    python -m apps.keyword_intel_agent.client --gsc gsc.csv --ads ads.csv --out out/recommendations.md
+
+POST /run     {"argv": [cli flags...], "cwd": "..."}  or  {"options": {run() keyword args}, "cwd": "..."}
+GET  /health  uptime, job counts, cache sizes and hit rates
+POST /shutdown
+
+Jobs run one at a time (run() prints progress and profiles with process-wide
+state); the HTTP side stays responsive while a job is running. The daemon has
+no authentication, so it only ever listens on the loopback interface.
+"""
+from __future__ import annotations
+import argparse, contextlib, inspect, io, os, threading, time, traceback
+from apps.httputil import LocalServer
+from apps.keyword_intel_agent.cli import build_parser, run, run_kwargs
+from apps.keyword_intel_agent.src.cache import FrameCache, MemoryFrameCache
+from apps.keyword_intel_agent.src.matching import MatcherCache
+
+DEFAULT_PORT = 8770
+
+# run() arguments a job may set; the warm caches belong to the daemon
+_OPTIONS = [p for p in inspect.signature(run).parameters if p not in ("frames", "matchers")]
+_REQUIRED = ["gsc_path", "ads_path", "out_path"]
+_PATH_OPTIONS = ["gsc_path", "ads_path", "out_path", "norm_cache", "cache_dir", "match_store", "state_dir",
+                 "llm_cache"]
+
+
+class JobError(ValueError):
+    """A job request that cannot be run as given (HTTP 400)."""
+
+
+# -----------------------------------------------------------------------------
+#  Job options
+# -----------------------------------------------------------------------------
+def _parse_argv(argv: list[str]) -> dict:
+    parser = build_parser()
+
+    def error(message):
+        raise JobError(message)
+
+    parser.error = error
+    try:
+        return run_kwargs(parser.parse_args(argv))
+    except SystemExit:
+        # --help and friends
+        raise JobError(parser.format_help()) from None
+
+
+def job_options(body: dict) -> dict:
+    """run() keyword arguments from a /run request body; relative paths resolve against body["cwd"]."""
+    if "argv" in body:
+        opts = _parse_argv([str(a) for a in body["argv"]])
+    else:
+        opts = dict(body.get("options") or {})
+        unknown = sorted(set(opts) - set(_OPTIONS))
+        if unknown:
+            raise JobError(f"unknown options: {', '.join(unknown)}")
+        missing = [k for k in _REQUIRED if not opts.get(k)]
+        if missing:
+            raise JobError(f"missing options: {', '.join(missing)}")
+    cwd = body.get("cwd")
+    if cwd:
+        for k in _PATH_OPTIONS:
+            if opts.get(k):
+                opts[k] = os.path.join(cwd, opts[k])
+    return opts
+
+
+# -----------------------------------------------------------------------------
+#  Daemon
+# -----------------------------------------------------------------------------
+class KeywordDaemon(LocalServer):
+    def __init__(self, port: int = DEFAULT_PORT, cache_dir: str | None = None, max_frames: int = 16,
+                 max_indexes: int = 8, workers: int = -1):
+        super().__init__(port)
+        self.frames = MemoryFrameCache(max_frames, FrameCache(cache_dir) if cache_dir else None)
+        self.matchers = MatcherCache(max_indexes, workers=workers)
+        self.started = time.time()
+        self.counts = {"ok": 0, "error": 0}
+        self.busy = False
+        self._job_lock = threading.Lock()
+
+    def run_job(self, opts: dict) -> dict:
+        out = io.StringIO()
+        started = time.perf_counter()
+        with self._job_lock:
+            self.busy = True
+            try:
+                with contextlib.redirect_stdout(out):
+                    run(**opts, frames=self.frames, matchers=self.matchers)
+                result = {"status": "ok"}
+            except Exception as e:
+                result = {"status": "error", "error": f"{type(e).__name__}: {e}",
+                          "traceback": traceback.format_exc()}
+            finally:
+                self.busy = False
+            self.counts[result["status"]] += 1
+        result.update({"out": opts["out_path"], "wall_s": round(time.perf_counter() - started, 3),
+                       "log": out.getvalue()})
+        return result
+
+    def health(self) -> dict:
+        return {
+            "status": "ok", "pid": os.getpid(), "uptime_s": round(time.time() - self.started, 1),
+            "busy": self.busy, "jobs": dict(self.counts),
+            "frames": {"entries": len(self.frames), **self.frames.stats},
+            "matchers": {"entries": len(self.matchers), **self.matchers.stats},
+        }
+
+    def respond(self, method, path, query, body):
+        if method == "GET" and path == "/health":
+            return 200, self.health()
+        if method == "POST" and path == "/shutdown":
+            threading.Thread(target=self.shutdown, daemon=True).start()
+            return 200, {"status": "ok"}
+        if method != "POST" or path != "/run":
+            return 404, {"status": "error", "error": f"unknown path {path}"}
+        try:
+            opts = job_options(body or {})
+        except (ValueError, TypeError) as e:
+            return 400, {"status": "error", "error": str(e)}
+        result = self.run_job(opts)
+        return (200 if result["status"] == "ok" else 500), result
+
+
+def serve_in_thread(port: int = 0, **kw) -> KeywordDaemon:
+    """Start a daemon on a daemon thread; its URL is server.url."""
+    return KeywordDaemon(port, **kw).start()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Serve keyword analysis jobs from a warm process.")
+    ap.add_argument("--port", type=int, default=DEFAULT_PORT)
+    ap.add_argument("--cache-dir", help="On-disk frame cache behind the in-memory one (survives restarts)")
+    ap.add_argument("--max-frames", type=int, default=16, help="Parsed input frames kept in memory")
+    ap.add_argument("--max-indexes", type=int, default=8, help="Ads keyword match indexes kept in memory")
+    ap.add_argument("--workers", type=int, default=-1, help="Threads per fuzzy match (-1: all cores)")
+    args = ap.parse_args()
+    server = KeywordDaemon(args.port, cache_dir=args.cache_dir, max_frames=args.max_frames,
+                           max_indexes=args.max_indexes, workers=args.workers)
+    print(f"Keyword daemon on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
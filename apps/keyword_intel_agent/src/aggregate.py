@@ -0,0 +1,251 @@
+from __future__ import annotations
+from typing import Iterable
+import numpy as np
+import pandas as pd
+
+# Per side: summed count columns, the weight used for averages / picking the
+# representative row, and the text columns taken from that row
+_SPECS = {
+    "gsc": {"sums": ["clicks", "impressions"], "weight": "impressions", "text": ["page", "query"],
+            "distinct": ("pages", ["page"]), "rows": "gsc_rows"},
+    "ads": {"sums": ["clicks", "cost", "conversions"], "weight": "clicks",
+            "text": ["campaign", "adgroup", "keyword"],
+            "distinct": ("adgroups", ["campaign", "adgroup"]), "rows": "ads_rows"},
+}
+
+
+def _group_codes(df: pd.DataFrame, key: str):
+    # NaN keys form their own group instead of being dropped
+    codes, uniques = pd.factorize(df[key], use_na_sentinel=False)
+    return codes.astype(np.int64), uniques
+
+
+def _col(df: pd.DataFrame, col: str) -> np.ndarray:
+    return df[col].to_numpy(dtype=float, na_value=np.nan)
+
+
+def _sum(codes: np.ndarray, values: np.ndarray, n: int) -> np.ndarray:
+    return np.bincount(codes, weights=np.nan_to_num(values), minlength=n)
+
+
+def _weighted_mean(codes: np.ndarray, values: np.ndarray, weights: np.ndarray, n: int) -> np.ndarray:
+    """Per-group mean of values weighted by weights; plain mean where the weights sum to 0."""
+    valid = ~np.isnan(values)
+    v = np.where(valid, values, 0.0)
+    w = np.where(valid, np.nan_to_num(weights), 0.0)
+    num, den = np.bincount(codes, v * w, n), np.bincount(codes, w, n)
+    cnt = np.bincount(codes, valid.astype(float), n)
+    plain = np.divide(np.bincount(codes, v, n), cnt, out=np.full(n, np.nan), where=cnt > 0)
+    return np.divide(num, den, out=plain, where=den > 0)
+
+
+def _distinct(df: pd.DataFrame, codes: np.ndarray, cols: list[str], n: int) -> np.ndarray:
+    cols = [c for c in cols if c in df.columns]
+    if not cols:
+        return np.bincount(codes, minlength=n)
+    pairs = pd.DataFrame({"_g": codes, **{c: df[c].to_numpy() for c in cols}}).drop_duplicates()
+    return np.bincount(pairs["_g"].to_numpy(), minlength=n)
+
+
+class DrillDown:
+    """
+    kw_norm -> detail rows lookup for an aggregated frame. Detail rows are
+    kept in one frame plus a group-sorted position array, so the index costs
+    one int64 per row rather than a dict of per-keyword arrays.
+    """
+
+    def __init__(self, detail: pd.DataFrame, codes: np.ndarray, uniques):
+        self.detail = detail
+        self._order = np.argsort(codes, kind="stable")
+        self._starts = np.searchsorted(codes[self._order], np.arange(len(uniques) + 1))
+        self._pos = pd.Index(uniques)
+
+    def __len__(self) -> int:
+        return len(self._pos)
+
+    def positions(self, keyword) -> np.ndarray:
+        g = self._pos.get_indexer([keyword])[0]
+        if g < 0:
+            return np.empty(0, dtype=np.int64)
+        return self._order[self._starts[g]:self._starts[g + 1]]
+
+    def rows(self, keyword) -> pd.DataFrame:
+        """Detail rows behind one aggregated keyword, in input order."""
+        return self.detail.iloc[self.positions(keyword)]
+
+
+def aggregate_keywords(df: pd.DataFrame, kind: str, key: str = "kw_norm",
+                       drilldown: bool = False):
+    """
+    Roll a GSC ("gsc") or Ads ("ads") frame up to one row per key:
+      - counts (clicks, impressions / cost, conversions) are summed;
+      - GSC ctr and position are impression-weighted, Ads cpc is click-weighted;
+      - page/query (campaign/adgroup/keyword) come from the row with the most
+        impressions (clicks), so downstream code sees the usual schema;
+      - pages/adgroups count distinct values, gsc_rows/ads_rows count rows.
+    With drilldown=True returns (aggregated, DrillDown) instead.
+    """
+    spec = _SPECS[kind]
+    codes, uniques = _group_codes(df, key)
+    n = len(uniques)
+
+    weight = _col(df, spec["weight"]) if spec["weight"] in df.columns else np.ones(len(df))
+    # Representative row: heaviest per group, earliest on ties
+    order = np.lexsort((-np.nan_to_num(weight), codes))
+    sorted_codes = codes[order]
+    first = order[np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])] if n else order
+    rep = np.empty(n, dtype=np.int64)
+    rep[codes[first]] = first
+
+    out = {}
+    for col in spec["text"]:
+        if col in df.columns:
+            out[col] = df[col].iloc[rep].reset_index(drop=True)
+    for col in spec["sums"]:
+        if col in df.columns:
+            total = _sum(codes, _col(df, col), n)
+            out[col] = np.round(total, 2) if col == "cost" else total.astype(np.int64)
+    # Averages keep the precision the exports use
+    if kind == "gsc":
+        for col, digits in (("ctr", 4), ("position", 2)):
+            if col in df.columns:
+                out[col] = np.round(_weighted_mean(codes, _col(df, col), weight, n), digits)
+    elif "cpc" in df.columns:
+        out["cpc"] = np.round(_weighted_mean(codes, _col(df, "cpc"), weight, n), 2)
+    out[key] = uniques
+
+    name, cols = spec["distinct"]
+    out[name] = _distinct(df, codes, cols, n)
+    out[spec["rows"]] = np.bincount(codes, minlength=n)
+
+    # Same column order as the detail frame, extras last
+    agg = pd.DataFrame(out)
+    first_cols = [c for c in df.columns if c in agg.columns]
+    agg = agg[first_cols + [c for c in agg.columns if c not in first_cols]]
+    if drilldown:
+        return agg, DrillDown(df, codes, uniques)
+    return agg
+
+
+def aggregate_inputs(gsc: pd.DataFrame, ads: pd.DataFrame, drilldown: bool = False):
+    """(gsc_agg, ads_agg), or (gsc_agg, ads_agg, {"gsc": DrillDown, "ads": DrillDown})."""
+    if not drilldown:
+        return aggregate_keywords(gsc, "gsc"), aggregate_keywords(ads, "ads")
+    g, g_dd = aggregate_keywords(gsc, "gsc", drilldown=True)
+    a, a_dd = aggregate_keywords(ads, "ads", drilldown=True)
+    return g, a, {"gsc": g_dd, "ads": a_dd}
+
+
+# -----------------------------------------------------------------------------
+#  Streaming roll-up
+# -----------------------------------------------------------------------------
+_MEANS = {"gsc": [("ctr", 4), ("position", 2)], "ads": [("cpc", 2)]}
+
+
+class KeywordAggregator:
+    """
+    aggregate_keywords over a stream of row batches (e.g. loaders.iter_*_csv):
+    each batch is folded into running per-key partials (sums, weighted-mean
+    numerators and denominators, the heaviest row so far), so memory tracks
+    distinct keys rather than rows. Distinct pages/adgroups are counted from
+    the (key, page) pairs seen, which are held too. result() matches
+    aggregate_keywords on the concatenated batches, up to float summation
+    order.
+    """
+
+    def __init__(self, kind: str, key: str = "kw_norm"):
+        self.kind, self.key = kind, key
+        self._spec = _SPECS[kind]
+        self._columns: list[str] | None = None
+        self._state: pd.DataFrame | None = None
+        self._pairs: pd.DataFrame | None = None
+
+    def _fold(self, parts: pd.DataFrame) -> pd.DataFrame:
+        """One row per key of a partials frame; rows of earlier batches come first and win weight ties."""
+        codes, uniques = _group_codes(parts, self.key)
+        n = len(uniques)
+        order = np.lexsort((-parts["_w"].to_numpy(), codes))
+        sorted_codes = codes[order]
+        first = order[np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])] if n else order
+        rep = np.empty(n, dtype=np.int64)
+        rep[codes[first]] = first
+        out = {self.key: uniques}
+        for col in parts.columns:
+            if col == self.key:
+                continue
+            if col in self._spec["text"] or col == "_w":
+                out[col] = parts[col].iloc[rep].reset_index(drop=True)
+            else:
+                out[col] = np.bincount(codes, weights=parts[col].to_numpy(dtype=float), minlength=n)
+        return pd.DataFrame(out)
+
+    def add(self, chunk: pd.DataFrame) -> None:
+        spec = self._spec
+        if self._columns is None:
+            self._columns = list(chunk.columns)
+        weight = np.nan_to_num(_col(chunk, spec["weight"])) if spec["weight"] in chunk.columns \
+            else np.ones(len(chunk))
+        rows = {self.key: chunk[self.key].to_numpy(), "_w": weight, "_rows": np.ones(len(chunk))}
+        for col in spec["text"]:
+            if col in chunk.columns:
+                rows[col] = chunk[col].to_numpy()
+        for col in spec["sums"]:
+            if col in chunk.columns:
+                rows[col] = np.nan_to_num(_col(chunk, col))
+        for col, _ in _MEANS[self.kind]:
+            if col in chunk.columns:
+                v = _col(chunk, col)
+                valid = ~np.isnan(v)
+                v, w = np.where(valid, v, 0.0), np.where(valid, weight, 0.0)
+                rows.update({f"_{col}_num": v * w, f"_{col}_den": w, f"_{col}_sum": v,
+                             f"_{col}_cnt": valid.astype(float)})
+        part = self._fold(pd.DataFrame(rows))
+        self._state = part if self._state is None else self._fold(
+            pd.concat([self._state, part], ignore_index=True))
+
+        cols = [self.key] + [c for c in spec["distinct"][1] if c in chunk.columns]
+        if len(cols) > 1:
+            pairs = chunk[cols].drop_duplicates()
+            self._pairs = pairs if self._pairs is None else \
+                pd.concat([self._pairs, pairs], ignore_index=True).drop_duplicates()
+
+    def result(self) -> pd.DataFrame:
+        if self._state is None:
+            raise ValueError("no batches were added")
+        spec, st = self._spec, self._state
+        n = len(st)
+        out = {}
+        for col in spec["text"]:
+            if col in st.columns:
+                out[col] = st[col]
+        for col in spec["sums"]:
+            if col in st.columns:
+                total = st[col].to_numpy()
+                out[col] = np.round(total, 2) if col == "cost" else total.astype(np.int64)
+        for col, digits in _MEANS[self.kind]:
+            if f"_{col}_num" in st.columns:
+                num, den = st[f"_{col}_num"].to_numpy(), st[f"_{col}_den"].to_numpy()
+                cnt = st[f"_{col}_cnt"].to_numpy()
+                plain = np.divide(st[f"_{col}_sum"].to_numpy(), cnt, out=np.full(n, np.nan), where=cnt > 0)
+                out[col] = np.round(np.divide(num, den, out=plain, where=den > 0), digits)
+        out[self.key] = st[self.key]
+
+        name, _ = spec["distinct"]
+        if self._pairs is None:
+            out[name] = st["_rows"].to_numpy().astype(np.int64)
+        else:
+            counts = self._pairs[self.key].value_counts(dropna=False)
+            out[name] = counts.reindex(pd.Index(st[self.key])).to_numpy().astype(np.int64)
+        out[spec["rows"]] = st["_rows"].to_numpy().astype(np.int64)
+
+        agg = pd.DataFrame(out)
+        first_cols = [c for c in self._columns if c in agg.columns]
+        return agg[first_cols + [c for c in agg.columns if c not in first_cols]]
+
+
+def aggregate_chunks(chunks: Iterable[pd.DataFrame], kind: str, key: str = "kw_norm") -> pd.DataFrame:
+    """aggregate_keywords over row batches, holding one batch at a time (see KeywordAggregator)."""
+    agg = KeywordAggregator(kind, key)
+    for chunk in chunks:
+        agg.add(chunk)
+    return agg.result()
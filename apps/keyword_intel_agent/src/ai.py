@@ -1,117 +1,136 @@
 ﻿from __future__ import annotations
+from typing import Iterable
+import numpy as np
 import pandas as pd
 
-def _first_existing(df: pd.DataFrame, candidates: list[str], default_name: str, fill=pd.NA) -> str:
+# Column candidates per role, in preference order (schema differs by merge path)
+_OVR_QUERY = ["query", "query_gsc", "kw_norm_gsc", "kw_norm"]
+_OVR_KW    = ["keyword", "keyword_ads", "kw_norm_ads", "kw_norm"]
+_OVR_POT   = ["organic_potential", "ovr_pot"]
+_OVR_CPC   = ["cpc", "cpc_ads", "ovr_cpc"]
+_OVR_POS   = ["position", "position_gsc", "ovr_pos"]
+_ORG_QUERY = ["query", "query_gsc", "kw_norm_gsc", "kw_norm"]
+_ORG_IMPR  = ["impressions", "impressions_gsc"]
+
+def _resolve(df: pd.DataFrame, candidates: list[str]) -> str | None:
     """
-    Return the first existing column name from candidates. If none exist,
-    create default_name with `fill` and return default_name.
+    Return the first existing column name from candidates, or None. Nothing is
+    added to the frame, so callers' frames are never copied or mutated.
     """
     for c in candidates:
         if c in df.columns:
             return c
-    df[default_name] = fill
-    return default_name
+    return None
 
-def _coerce_bool_to_int_if_needed(df: pd.DataFrame, col: str) -> None:
+def _sort_key(df: pd.DataFrame, col: str | None, fill: float) -> list[np.ndarray]:
     """
-    If df[col] is boolean dtype, coerce to int so True > False when sorting desc.
-    Safe no-op if column not in df.
+    Ascending lexsort keys equivalent to sorting `col` descending with NaN last:
+    a missing-flag key followed by the negated values.
     """
-    if col in df.columns:
-        try:
-            if pd.api.types.is_bool_dtype(df[col].dtype):
-                df[col] = df[col].astype(int)
-        except Exception:
-            # Be permissive; if coercion fails we leave the column as-is.
-            pass
+    if col is None:
+        vals = np.full(len(df), fill, dtype=float)
+    else:
+        vals = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    missing = np.isnan(vals)
+    return [missing.astype(np.int8), np.where(missing, 0.0, -vals)]
 
-def fallback_rules(
-    overlap_df: pd.DataFrame | None,
-    organic_only_df: pd.DataFrame | None,
-    paid_only_df: pd.DataFrame | None
-) -> str:
+def top_k_positions(keys: list[np.ndarray], k: int) -> np.ndarray:
     """
-    Build a lightweight Markdown recommendation summary when LLM/API mode
-    is disabled. Uses safe column resolution so schema changes won't crash.
+    Positions of the first k rows of a stable ascending lexicographic sort on
+    `keys` (most significant first), in sorted order. Each key only narrows the
+    rows tied at the k-th boundary (argpartition-style), so the final sort
+    touches at most ~k rows instead of the whole frame.
     """
-
-    # ---- Choose columns safely for each table
-    # Overlap
-    if overlap_df is None:
-        overlap_df = pd.DataFrame()
-    ovr = overlap_df.copy()
-
-    ovr_query = _first_existing(ovr, ["query", "query_gsc", "kw_norm_gsc", "kw_norm"], "query")
-    ovr_kw    = _first_existing(ovr, ["keyword", "keyword_ads", "kw_norm_ads", "kw_norm"], "keyword")
-    ovr_pot   = _first_existing(ovr, ["organic_potential", "ovr_pot"], "organic_potential", fill=0)
-    ovr_cpc   = _first_existing(ovr, ["cpc", "cpc_ads", "ovr_cpc"], "cpc", fill=0)
-    ovr_pos   = _first_existing(ovr, ["position", "position_gsc", "ovr_pos"], "position", fill=pd.NA)
-
-    # Organic-only
-    if organic_only_df is None:
-        organic_only_df = pd.DataFrame()
-    org = organic_only_df.copy()
-    org_query = _first_existing(org, ["query", "query_gsc", "kw_norm_gsc", "kw_norm"], "query")
-    org_impr  = _first_existing(org, ["impressions", "impressions_gsc"], "impressions", fill=0)
-
-    # Paid-only (optional for future use)
-    if paid_only_df is None:
-        paid_only_df = pd.DataFrame()
-    paid = paid_only_df.copy()
-    paid_kw = _first_existing(paid, ["keyword", "keyword_ads", "kw_norm_ads", "kw_norm"], "keyword")
-
-    # ---- Build lists
+    n = len(keys[0]) if keys else 0
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.int64)
+    picked: list[np.ndarray] = []
+    cand = np.arange(n)
+    need = k
+    if n > k:
+        for key in keys:
+            vals = key[cand]
+            kth = np.partition(vals, need - 1)[need - 1]
+            below = cand[vals < kth]
+            picked.append(below)
+            need -= len(below)
+            cand = cand[vals == kth]
+            if len(cand) <= need:
+                break
+    # Remaining ties resolve by position (stable sort)
+    picked.append(cand[:need])
+    sel = np.concatenate(picked)
+    order = np.lexsort([sel] + [key[sel] for key in reversed(keys)])
+    return sel[order]
+
+# -----------------------------------------------------------------------------
+#  Ranking specs
+# -----------------------------------------------------------------------------
+def _wasted_keys(ovr: pd.DataFrame) -> list[np.ndarray]:
     # Wasted spend: overlap with high CPC or high organic potential; prefer reduce_bid_flag if present
-    rb = "reduce_bid_flag" if "reduce_bid_flag" in ovr.columns else ovr_pot
-    _coerce_bool_to_int_if_needed(ovr, "reduce_bid_flag")
-
-    # Assemble sort columns defensively (all are strings with column names)
-    sort_cols: list[str] = [rb]
-    for c in (ovr_cpc, ovr_pot):
-        if isinstance(c, str) and c in ovr.columns:
-            sort_cols.append(c)
-
-    if not ovr.empty:
-        wasted = (
-            ovr.sort_values(
-                sort_cols,
-                ascending=[False] * len(sort_cols),
-                na_position="last"
-            )
-            .head(5)
-        )
-    else:
-        wasted = ovr  # empty
+    pot = _resolve(ovr, _OVR_POT)
+    rb = "reduce_bid_flag" if "reduce_bid_flag" in ovr.columns else pot
+    return _sort_key(ovr, rb, 0) + _sort_key(ovr, _resolve(ovr, _OVR_CPC), 0) + _sort_key(ovr, pot, 0)
 
+def _gap_keys(org: pd.DataFrame) -> list[np.ndarray]:
     # Gaps to bid: organic-only with biggest impressions
-    if not org.empty:
-        gaps = org.sort_values(org_impr, ascending=False, na_position="last").head(5)
-    else:
-        gaps = org  # empty
+    return _sort_key(org, _resolve(org, _ORG_IMPR), 0)
 
-    # ---- Markdown
+def _top_rows(df: pd.DataFrame | None, keys_fn, k: int) -> pd.DataFrame:
+    if df is None or df.empty:
+        return pd.DataFrame()
+    return df.iloc[top_k_positions(keys_fn(df), k)]
+
+class RunningTopK:
+    """
+    Top-k accumulator over a stream of DataFrame chunks: keeps only the current
+    best k rows, so peak memory is one chunk plus k rows. Ties keep earlier rows.
+    """
+
+    def __init__(self, keys_fn, k: int):
+        self.keys_fn = keys_fn
+        self.k = k
+        self.best = pd.DataFrame()
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        if chunk is None or chunk.empty:
+            return
+        top = _top_rows(chunk, self.keys_fn, self.k)
+        pool = top if self.best.empty else pd.concat([self.best, top])
+        self.best = _top_rows(pool, self.keys_fn, self.k)
+
+# -----------------------------------------------------------------------------
+#  Markdown
+# -----------------------------------------------------------------------------
+def _get(r: dict, col: str | None, default=None):
+    return r.get(col, default) if col is not None else default
+
+def _render(wasted: pd.DataFrame, gaps: pd.DataFrame, k: int) -> str:
     lines: list[str] = []
 
     # Wasted
-    lines.append("**Top 5 wasted spend**")
+    lines.append(f"**Top {k} wasted spend**")
     if wasted.empty:
         lines.append("- No clear wasted spend detected this run.")
     else:
-        for _, r in wasted.iterrows():
-            q = r.get(ovr_query) or r.get(ovr_kw) or "n/a"
-            cpc = r.get(ovr_cpc, 0)
-            pot = r.get(ovr_pot, 0)
-            pos = r.get(ovr_pos, "—")
+        q_col, kw_col = _resolve(wasted, _OVR_QUERY), _resolve(wasted, _OVR_KW)
+        cpc_col, pot_col, pos_col = _resolve(wasted, _OVR_CPC), _resolve(wasted, _OVR_POT), _resolve(wasted, _OVR_POS)
+        for r in wasted.to_dict("records"):
+            q = _get(r, q_col) or _get(r, kw_col) or "n/a"
+            cpc = _get(r, cpc_col, 0)
+            pot = _get(r, pot_col, 0)
+            pos = _get(r, pos_col, "—")
             lines.append(f"- `{q}` — CPC ~{cpc}; organic potential {pot}; pos {pos}. Consider bid down/pause.")
 
     # Gaps
-    lines.append("\n**Top 5 gaps to bid on**")
+    lines.append(f"\n**Top {k} gaps to bid on**")
     if gaps.empty:
         lines.append("- No organic-only gaps detected this run.")
     else:
-        for _, r in gaps.iterrows():
-            q = r.get(org_query) or "n/a"
-            imp = r.get(org_impr, 0)
+        q_col, imp_col = _resolve(gaps, _ORG_QUERY), _resolve(gaps, _ORG_IMPR)
+        for r in gaps.to_dict("records"):
+            q = _get(r, q_col) or "n/a"
+            imp = _get(r, imp_col, 0)
             lines.append(f"- `{q}` — ~{imp} impressions and no paid coverage. Test exact/phrase.")
 
     # Actions
@@ -120,4 +139,39 @@ def fallback_rules(
     lines.append("- Launch ads for top organic-only queries (≥300 weekly impressions).")
     lines.append("- Track CTR vs expected CTR; fix ≥5-point deficits with titles/meta & sitelinks.")
 
-    return "\n".join(lines)
\ No newline at end of file
+    return "\n".join(lines)
+
+def fallback_rules(
+    overlap_df: pd.DataFrame | None,
+    organic_only_df: pd.DataFrame | None,
+    paid_only_df: pd.DataFrame | None,
+    k: int = 5,
+) -> str:
+    """
+    Build a lightweight Markdown recommendation summary when LLM/API mode
+    is disabled. Uses safe column resolution so schema changes won't crash,
+    and partial top-k selection so inputs are neither copied nor fully sorted.
+    """
+    wasted = _top_rows(overlap_df, _wasted_keys, k)
+    gaps = _top_rows(organic_only_df, _gap_keys, k)
+    return _render(wasted, gaps, k)
+
+def fallback_rules_stream(
+    overlap_chunks: Iterable[pd.DataFrame],
+    organic_only_chunks: Iterable[pd.DataFrame],
+    paid_only_chunks: Iterable[pd.DataFrame] | None = None,
+    k: int = 5,
+) -> str:
+    """
+    Same output as fallback_rules, but segments arrive as chunk iterables and
+    only running top-k accumulators are held in memory. Library entry point for
+    callers that produce segments in pieces; cli/ui always hold the joined
+    segments (cli --chunksize streams the inputs into per-keyword aggregates
+    before the join) and use fallback_rules.
+    """
+    wasted, gaps = RunningTopK(_wasted_keys, k), RunningTopK(_gap_keys, k)
+    for chunk in overlap_chunks:
+        wasted.update(chunk)
+    for chunk in organic_only_chunks:
+        gaps.update(chunk)
+    return _render(wasted.best, gaps.best, k)
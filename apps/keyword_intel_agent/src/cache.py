@@ -0,0 +1,170 @@
+from __future__ import annotations
+import hashlib, os, threading
+from collections import OrderedDict
+import pandas as pd
+from .loaders import LOADER_VERSION, load_gsc_csv, load_ads_csv
+from .normalize import NORMALIZE_VERSION, NormalizeCache, normalize_series
+
+
+# -----------------------------------------------------------------------------
+#  Content hashing
+# -----------------------------------------------------------------------------
+def content_hash(path_or_buffer, block_size: int = 1 << 20) -> str:
+    """sha256 of a file path or a seekable buffer (e.g. a Streamlit upload)."""
+    h = hashlib.sha256()
+    if isinstance(path_or_buffer, (str, os.PathLike)):
+        with open(path_or_buffer, "rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                h.update(block)
+    else:
+        pos = path_or_buffer.tell()
+        for block in iter(lambda: path_or_buffer.read(block_size), b""):
+            h.update(block if isinstance(block, bytes) else block.encode("utf-8"))
+        path_or_buffer.seek(pos)
+    return h.hexdigest()
+
+
+# -----------------------------------------------------------------------------
+#  Columnar frame cache
+# -----------------------------------------------------------------------------
+class FrameCache:
+    """
+    Directory of uncompressed Feather files keyed by input content hash plus
+    loader/normalizer versions. Reads are memory-mapped; the least recently
+    used entries are evicted once the directory exceeds `max_bytes`.
+    """
+
+    def __init__(self, root: str, max_bytes: int = 2 << 30):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+
+    def key(self, path_or_buffer, kind: str) -> str:
+        return f"{kind}-v{LOADER_VERSION}.{NORMALIZE_VERSION}-{content_hash(path_or_buffer)}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.feather")
+
+    def get(self, key: str) -> pd.DataFrame | None:
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        import pyarrow.feather as feather
+        try:
+            df = feather.read_table(path, memory_map=True).to_pandas()
+        except Exception:
+            # Truncated or foreign file: treat as a miss and let put() replace it
+            return None
+        os.utime(path)  # mark as recently used for eviction
+        return df
+
+    def put(self, key: str, df: pd.DataFrame) -> None:
+        import pyarrow.feather as feather
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        feather.write_feather(df.reset_index(drop=True), tmp, compression="uncompressed")
+        os.replace(tmp, path)
+        self._evict()
+
+    def _evict(self) -> None:
+        entries = []
+        for name in os.listdir(self.root):
+            if name.endswith(".feather"):
+                st = os.stat(os.path.join(self.root, name))
+                entries.append((st.st_mtime, st.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.root, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+class MemoryFrameCache:
+    """
+    In-process LRU of normalized frames with the FrameCache interface, for a
+    long-running process (see daemon.py). Content hashes are remembered per
+    (path, size, mtime) in an LRU of the same size, so an unchanged file is
+    not even re-read; misses fall through to an optional on-disk FrameCache.
+    Returned frames are shared between callers and must be treated as
+    read-only.
+    """
+
+    def __init__(self, max_entries: int = 16, backing: FrameCache | None = None):
+        self.max_entries = max_entries
+        self.backing = backing
+        self._frames: OrderedDict[str, pd.DataFrame] = OrderedDict()
+        self._hashes: OrderedDict[tuple, str] = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def key(self, path_or_buffer, kind: str) -> str:
+        if isinstance(path_or_buffer, (str, os.PathLike)):
+            st = os.stat(path_or_buffer)
+            sig = (os.path.abspath(path_or_buffer), st.st_size, st.st_mtime_ns)
+            with self._lock:
+                digest = self._hashes.get(sig)
+                if digest is not None:
+                    self._hashes.move_to_end(sig)
+            if digest is None:
+                digest = content_hash(path_or_buffer)
+                with self._lock:
+                    self._hashes[sig] = digest
+                    while len(self._hashes) > self.max_entries:
+                        self._hashes.popitem(last=False)
+        else:
+            digest = content_hash(path_or_buffer)
+        return f"{kind}-v{LOADER_VERSION}.{NORMALIZE_VERSION}-{digest}"
+
+    def get(self, key: str) -> pd.DataFrame | None:
+        with self._lock:
+            df = self._frames.get(key)
+            if df is not None:
+                self._frames.move_to_end(key)
+                self.stats["hits"] += 1
+                return df
+            self.stats["misses"] += 1
+        df = self.backing.get(key) if self.backing is not None else None
+        if df is not None:
+            self._remember(key, df)
+        return df
+
+    def put(self, key: str, df: pd.DataFrame) -> None:
+        if self.backing is not None:
+            self.backing.put(key, df)
+        self._remember(key, df)
+
+    def _remember(self, key: str, df: pd.DataFrame) -> None:
+        with self._lock:
+            self._frames[key] = df
+            self._frames.move_to_end(key)
+            while len(self._frames) > self.max_entries:
+                self._frames.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+
+def load_normalized_inputs(gsc_src, ads_src, cache: FrameCache | None = None,
+                           norm_cache: NormalizeCache | None = None, engine: str | None = None):
+    """
+    Return (gsc, ads) frames with `kw_norm`, reusing cached frames when the
+    input bytes and loader/normalizer versions are unchanged.
+    """
+    out = []
+    for src, kind, loader, text_col in (
+        (gsc_src, "gsc", load_gsc_csv, "query"),
+        (ads_src, "ads", load_ads_csv, "keyword"),
+    ):
+        key = cache.key(src, kind) if cache is not None else None
+        df = cache.get(key) if cache is not None else None
+        if df is None:
+            df = loader(src, engine=engine)
+            df["kw_norm"] = normalize_series(df[text_col], norm_cache)
+            if cache is not None:
+                cache.put(key, df)
+        out.append(df)
+    return out[0], out[1]
@@ -0,0 +1,83 @@
+from __future__ import annotations
+import numpy as np
+import pandas as pd
+
+# Repeated text columns per input; everything else numeric gets downcast
+TEXT_COLUMNS = {
+    "gsc": ["page", "query"],
+    "ads": ["campaign", "adgroup", "keyword"],
+}
+
+
+def keyword_dtype(*frames: pd.DataFrame, col: str = "kw_norm") -> pd.CategoricalDtype:
+    """
+    One keyword dictionary shared by all frames. Frames carrying the same
+    categorical dtype join on their int codes instead of hashing strings;
+    categories are sorted so code order matches string sort order.
+    """
+    values = [f[col].to_numpy(dtype=object) for f in frames if col in f.columns]
+    vocab = pd.unique(np.concatenate(values)) if values else np.empty(0, dtype=object)
+    vocab = vocab[pd.notna(vocab)]
+    return pd.CategoricalDtype(pd.Index(vocab, dtype=object).sort_values())
+
+
+def _downcast_ints(df: pd.DataFrame) -> None:
+    for col in df.select_dtypes(include="integer").columns:
+        df[col] = pd.to_numeric(df[col], downcast="integer")
+
+
+def compact_frame(df: pd.DataFrame, kind: str, kw_dtype: pd.CategoricalDtype | None = None) -> pd.DataFrame:
+    """
+    Copy of df with repeated text interned as categoricals, kw_norm coded
+    against kw_dtype when given, and integer counts in the smallest int type.
+    Floats stay float64 so CTR/position/cost maths is unchanged.
+    """
+    out = df.copy(deep=False)
+    for col in TEXT_COLUMNS[kind]:
+        if col in out.columns and not isinstance(out[col].dtype, pd.CategoricalDtype):
+            out[col] = out[col].astype("category")
+    if "kw_norm" in out.columns:
+        out["kw_norm"] = out["kw_norm"].astype(kw_dtype or "category")
+    _downcast_ints(out)
+    return out
+
+
+def compact_inputs(gsc: pd.DataFrame, ads: pd.DataFrame):
+    """(gsc, ads) in compact form, sharing one kw_norm dictionary."""
+    kw_dtype = keyword_dtype(gsc, ads)
+    return compact_frame(gsc, "gsc", kw_dtype), compact_frame(ads, "ads", kw_dtype)
+
+
+def is_compact(df: pd.DataFrame, col: str = "kw_norm") -> bool:
+    return col in df.columns and isinstance(df[col].dtype, pd.CategoricalDtype)
+
+
+def expand(df: pd.DataFrame) -> pd.DataFrame:
+    """Decode categorical columns back to plain strings (for consumers that need object dtype)."""
+    cats = [c for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)]
+    if not cats:
+        return df
+    out = df.copy(deep=False)
+    for c in cats:
+        out[c] = out[c].astype(object)
+    return out
+
+
+def union_categories(frames: list[pd.DataFrame]) -> list[pd.DataFrame]:
+    """
+    Recode columns that are categorical in every frame onto one sorted union
+    dictionary, so pd.concat keeps them categorical instead of falling back to
+    object dtype when the dictionaries differ.
+    """
+    if len(frames) < 2:
+        return frames
+    shared = [c for c in frames[0].columns if all(c in f.columns for f in frames[1:])]
+    recode = {}
+    for c in shared:
+        dtypes = [f[c].dtype for f in frames]
+        if all(isinstance(d, pd.CategoricalDtype) for d in dtypes) and any(d != dtypes[0] for d in dtypes[1:]):
+            cats = pd.Index(np.concatenate([d.categories.to_numpy(dtype=object) for d in dtypes])).unique()
+            recode[c] = pd.CategoricalDtype(cats.sort_values())
+    if not recode:
+        return frames
+    return [f.astype(recode) for f in frames]
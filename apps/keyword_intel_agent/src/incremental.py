@@ -0,0 +1,221 @@
+from __future__ import annotations
+import json, os
+import pandas as pd
+from .compact import union_categories
+from .match_store import MatchStore
+from .metrics import compute_overlap_segments, fuzzy_keyword_map, recompute_priority, roi_signals
+
+SEGMENTS = ("overlap", "organic_only", "paid_only")
+
+# Bump when the snapshot layout or segment semantics change; forces a full run
+STATE_VERSION = 2
+
+
+# -----------------------------------------------------------------------------
+#  Input fingerprints
+# -----------------------------------------------------------------------------
+def key_fingerprints(df: pd.DataFrame) -> pd.DataFrame:
+    """One row per kw_norm with an order-insensitive hash of its input rows."""
+    if df.empty:
+        return pd.DataFrame({"kw_norm": pd.Series(dtype=object), "fp": pd.Series(dtype="uint64"),
+                             "n": pd.Series(dtype="int64")})
+    row_hash = pd.util.hash_pandas_object(df, index=False)
+    grouped = row_hash.groupby(df["kw_norm"].to_numpy(), sort=False)
+    # uint64 sums wrap around, which is fine for a fingerprint
+    out = pd.DataFrame({"fp": grouped.sum(), "n": grouped.size()})
+    out.index.name = "kw_norm"
+    return out.reset_index()
+
+
+def _changed_keys(prev: pd.DataFrame, cur: pd.DataFrame) -> set[str]:
+    both = prev.merge(cur, on="kw_norm", how="outer", suffixes=("_prev", "_cur"), indicator=True)
+    diff = (both["_merge"] != "both") | (both["fp_prev"] != both["fp_cur"]) | (both["n_prev"] != both["n_cur"])
+    return set(both.loc[diff, "kw_norm"])
+
+
+# -----------------------------------------------------------------------------
+#  Run snapshot
+# -----------------------------------------------------------------------------
+class RunState:
+    """Previous run's fingerprints, keyword map and segments, stored as Feather."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, f"{name}.feather")
+
+    def load(self, meta: dict) -> dict | None:
+        """Snapshot tables, or None when missing or produced with other settings."""
+        meta_path = os.path.join(self.root, "meta.json")
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, "r", encoding="utf-8") as f:
+            if json.load(f) != meta:
+                return None
+        names = ("gsc_fp", "ads_fp", "keyword_map") + SEGMENTS
+        if not all(os.path.exists(self._path(n)) for n in names):
+            return None
+        return {n: pd.read_feather(self._path(n)) for n in names}
+
+    def save(self, meta: dict, tables: dict[str, pd.DataFrame]) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        for name, df in tables.items():
+            df.reset_index(drop=True).to_feather(self._path(name))
+        # meta last: a partially written snapshot never looks valid
+        with open(os.path.join(self.root, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+
+# -----------------------------------------------------------------------------
+#  Incremental segmentation
+# -----------------------------------------------------------------------------
+def _row_keys(df: pd.DataFrame, side: str) -> pd.Series:
+    col = f"kw_norm_{side}"
+    return df[col] if col in df.columns else df["kw_norm"]
+
+
+def _map_scores(keyword_map: pd.DataFrame) -> dict:
+    if "match_score" not in keyword_map.columns:
+        return {}
+    return dict(zip(keyword_map["kw_norm_gsc"], keyword_map["match_score"]))
+
+
+def _affected_keys(prev: dict, gsc_fp, ads_fp, keyword_map) -> tuple[set[str], set[str]]:
+    """
+    GSC and Ads keys whose segment rows may differ from the snapshot: changed
+    inputs, remapped GSC keys, and everything joined to an affected Ads key.
+    """
+    changed_gsc = _changed_keys(prev["gsc_fp"], gsc_fp)
+    changed_ads = _changed_keys(prev["ads_fp"], ads_fp)
+    old_map = dict(zip(prev["keyword_map"]["kw_norm_gsc"], prev["keyword_map"]["kw_norm_ads"]))
+    new_map = dict(zip(keyword_map["kw_norm_gsc"], keyword_map["kw_norm_ads"]))
+    # A changed score alone also stales the row (TF-IDF scores move with the Ads keyword set)
+    old_score, new_score = _map_scores(prev["keyword_map"]), _map_scores(keyword_map)
+
+    aff_gsc = changed_gsc | {
+        g for g in old_map.keys() | new_map.keys()
+        if old_map.get(g) != new_map.get(g) or old_score.get(g) != new_score.get(g)
+    }
+    aff_ads = set(changed_ads)
+    for g in aff_gsc:
+        for m in (old_map, new_map):
+            if g in m:
+                aff_ads.add(m[g])
+    # Overlap rows of any key joined to an affected Ads key are rebuilt too
+    aff_gsc |= {g for g, a in new_map.items() if a in aff_ads}
+    return aff_gsc, aff_ads
+
+
+def _sort_by_join_key(df: pd.DataFrame, fuzzy: bool) -> pd.DataFrame:
+    key = "kw_norm_ads" if fuzzy and "kw_norm_ads" in df.columns else "kw_norm"
+    return df.sort_values(key, kind="stable", na_position="last").reset_index(drop=True)
+
+
+def incremental_segments(gsc: pd.DataFrame, ads: pd.DataFrame, state_dir: str, fuzzy: bool = False,
+                         threshold=90, workers=-1, match_store: MatchStore | None = None,
+                         matcher: str = "rapidfuzz"):
+    """
+    Segments (with ROI signals on overlap) for the current inputs, rebuilding
+    only rows of keys that changed since the snapshot in state_dir.
+
+    Returns (segments, previous_segments, stats); previous_segments is None on
+    a full run (no usable snapshot). The snapshot is updated afterwards.
+    """
+    state = RunState(state_dir)
+    meta = {"version": STATE_VERSION, "fuzzy": bool(fuzzy), "threshold": float(threshold) if fuzzy else None,
+            "matcher": matcher if fuzzy else None}
+    prev = state.load(meta)
+
+    gsc_fp, ads_fp = key_fingerprints(gsc), key_fingerprints(ads)
+    if fuzzy:
+        keyword_map = fuzzy_keyword_map(gsc, ads, threshold, workers, match_store, matcher)
+    else:
+        common = pd.Index(gsc["kw_norm"].unique()).intersection(pd.Index(ads["kw_norm"].unique()))
+        keyword_map = pd.DataFrame({"kw_norm_gsc": common, "kw_norm_ads": common})
+
+    if prev is None:
+        seg = compute_overlap_segments(gsc, ads, fuzzy=fuzzy, threshold=threshold, fuzzy_map=keyword_map)
+        if not seg["overlap"].empty:
+            seg["overlap"] = roi_signals(seg["overlap"])
+        # Same row order (and therefore priority tie-breaks) as incremental runs
+        seg = {name: _sort_by_join_key(df, fuzzy) for name, df in seg.items()}
+        if not seg["overlap"].empty:
+            recompute_priority(seg["overlap"])
+        stats = {"mode": "full", "gsc_keys": len(gsc_fp), "ads_keys": len(ads_fp)}
+    else:
+        aff_gsc, aff_ads = _affected_keys(prev, gsc_fp, ads_fp, keyword_map)
+        sub = compute_overlap_segments(
+            gsc[gsc["kw_norm"].isin(aff_gsc)], ads[ads["kw_norm"].isin(aff_ads)],
+            fuzzy=fuzzy, threshold=threshold,
+            fuzzy_map=keyword_map[keyword_map["kw_norm_gsc"].isin(aff_gsc)],
+        )
+        if not sub["overlap"].empty:
+            sub["overlap"] = roi_signals(sub["overlap"])
+
+        seg = {}
+        for name in SEGMENTS:
+            old = prev[name]
+            stale = _row_keys(old, "gsc").isin(aff_gsc) | _row_keys(old, "ads").isin(aff_ads)
+            parts = [df for df in (old[~stale], sub[name]) if not df.empty]
+            if parts:
+                # Snapshot and rebuilt rows of compact runs carry different keyword dictionaries
+                seg[name] = _sort_by_join_key(pd.concat(union_categories(parts), ignore_index=True), fuzzy)
+            else:
+                seg[name] = sub[name]
+        if not seg["overlap"].empty:
+            # Priority is a rank across all overlap rows
+            recompute_priority(seg["overlap"])
+        stats = {"mode": "incremental", "gsc_keys": len(gsc_fp), "ads_keys": len(ads_fp),
+                 "affected_gsc_keys": len(aff_gsc), "affected_ads_keys": len(aff_ads)}
+
+    state.save(meta, {"gsc_fp": gsc_fp, "ads_fp": ads_fp, "keyword_map": keyword_map, **seg})
+    return seg, (None if prev is None else {n: prev[n] for n in SEGMENTS}), stats
+
+
+# -----------------------------------------------------------------------------
+#  Change report
+# -----------------------------------------------------------------------------
+def _keys(df: pd.DataFrame) -> set[str]:
+    return set(df["kw_norm"].dropna()) if "kw_norm" in df.columns else set()
+
+
+def _sample(keys: set[str], limit: int) -> str:
+    shown = ", ".join(f"`{k}`" for k in sorted(keys)[:limit])
+    more = len(keys) - limit
+    return shown + (f" … (+{more} more)" if more > 0 else "")
+
+
+def change_report(previous: dict | None, current: dict, stats: dict | None = None, limit: int = 10) -> str:
+    """Markdown summary of keyword moves between segments and organic potential shifts."""
+    lines = ["**What changed since last run**"]
+    if stats:
+        lines.append("- Run: " + ", ".join(f"{k.replace('_', ' ')} {v}" for k, v in stats.items()))
+    if previous is None:
+        lines.append("- No previous snapshot; this run is the new baseline.")
+        return "\n".join(lines)
+
+    for name in SEGMENTS:
+        before, after = _keys(previous[name]), _keys(current[name])
+        added, removed = after - before, before - after
+        label = name.replace("_", "-").title()
+        if not added and not removed:
+            lines.append(f"- {label}: unchanged ({len(after)} keywords).")
+            continue
+        lines.append(f"- {label}: +{len(added)} / -{len(removed)} keywords (now {len(after)}).")
+        if added:
+            lines.append(f"  - New: {_sample(added, limit)}")
+        if removed:
+            lines.append(f"  - Gone: {_sample(removed, limit)}")
+
+    prev_ov, cur_ov = previous["overlap"], current["overlap"]
+    if "organic_potential" in prev_ov.columns and "organic_potential" in cur_ov.columns:
+        before = prev_ov.groupby("kw_norm", observed=True)["organic_potential"].sum()
+        after = cur_ov.groupby("kw_norm", observed=True)["organic_potential"].sum()
+        delta = (after - before).dropna()
+        delta = delta[delta != 0]
+        if not delta.empty:
+            lines.append("\n**Biggest organic potential shifts (overlap)**")
+            for kw in delta.abs().nlargest(limit).index:
+                lines.append(f"- `{kw}` — {before[kw]:.2f} → {after[kw]:.2f} ({delta[kw]:+.2f})")
+    return "\n".join(lines)
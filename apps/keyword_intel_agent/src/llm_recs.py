@@ -0,0 +1,278 @@
+from __future__ import annotations
+import asyncio, hashlib, json, os, sqlite3, threading, time
+import numpy as np
+import pandas as pd
+from .ai import _resolve, _sort_key, top_k_positions, _OVR_QUERY, _OVR_POT, _OVR_CPC, _OVR_POS, _ORG_QUERY, \
+    _ORG_IMPR
+
+INSTRUCTIONS = """You are a senior SEO/SEM analyst. Each input line is one keyword:
+segment|keyword|metrics. Segments: overlap (ranks organically and is bought in Ads),
+organic (organic only, no ads), paid (ads only, no organic presence).
+Return JSON {"recommendations": [{"keyword": ..., "action": ..., "reason": ...}]}
+with exactly one entry per input keyword, keyword copied verbatim.
+action is one of: bid_down, pause, keep, launch_ads, improve_content, test_match_types.
+reason: at most 15 words, citing the metrics."""
+
+ACTIONS = ["bid_down", "pause", "keep", "launch_ads", "improve_content", "test_match_types"]
+
+
+# -----------------------------------------------------------------------------
+#  Keyword lines
+# -----------------------------------------------------------------------------
+_PAID_KW = ["keyword", "keyword_ads", "kw_norm_ads", "kw_norm"]
+
+# segment -> (keyword candidates, ranking candidates, [(label, column candidates), ...])
+_SEGMENTS = {
+    "overlap": (_OVR_QUERY, _OVR_POT + ["priority"], [
+        ("cpc", _OVR_CPC), ("pos", _OVR_POS), ("pot", _OVR_POT),
+        ("cost", ["cost", "cost_ads"]), ("conv", ["conversions", "conversions_ads"]),
+    ]),
+    "organic": (_ORG_QUERY, _ORG_IMPR, [
+        ("impr", _ORG_IMPR), ("pos", ["position", "position_gsc"]), ("ctr", ["ctr", "ctr_gsc"]),
+        ("clicks", ["clicks", "clicks_gsc"]),
+    ]),
+    "paid": (_PAID_KW, ["cost", "cost_ads"], [
+        ("cost", ["cost", "cost_ads"]), ("cpc", ["cpc", "cpc_ads"]),
+        ("conv", ["conversions", "conversions_ads"]), ("clicks", ["clicks", "clicks_ads"]),
+    ]),
+}
+
+
+def _fmt(v) -> str:
+    if v is None or (isinstance(v, float) and np.isnan(v)):
+        return "-"
+    if isinstance(v, (float, np.floating)):
+        return f"{v:.4g}"
+    return str(v)
+
+
+def keyword_lines(df: pd.DataFrame | None, segment: str, limit: int) -> list[tuple[str, str]]:
+    """
+    (keyword, "segment|keyword|k=v,...") for the top `limit` distinct keywords
+    of one segment, ranked like the rule-based lists (biggest first).
+    """
+    if df is None or df.empty:
+        return []
+    kw_cands, rank_cands, fields = _SEGMENTS[segment]
+    kw_col = _resolve(df, kw_cands)
+    if kw_col is None:
+        return []
+    pos = top_k_positions(_sort_key(df, _resolve(df, rank_cands), 0), len(df))
+    ranked = df.iloc[pos]
+    ranked = ranked[ranked[kw_col].notna()].drop_duplicates(subset=[kw_col]).head(limit)
+    cols = [(label, _resolve(ranked, c)) for label, c in fields]
+    cols = [(label, c) for label, c in cols if c is not None]
+    out = []
+    for r in ranked.to_dict("records"):
+        kw = str(r[kw_col]).replace("|", " ")
+        metrics = ",".join(f"{label}={_fmt(r[c])}" for label, c in cols)
+        out.append((kw, f"{segment}|{kw}|{metrics}"))
+    return out
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+def make_batches(lines: list[tuple[str, str]], batch_tokens: int) -> list[list[tuple[str, str]]]:
+    """Greedy packing of keyword lines into batches of at most ~batch_tokens input tokens."""
+    batches, cur, used = [], [], 0
+    for item in lines:
+        t = estimate_tokens(item[1])
+        if cur and used + t > batch_tokens:
+            batches.append(cur)
+            cur, used = [], 0
+        cur.append(item)
+        used += t
+    if cur:
+        batches.append(cur)
+    return batches
+
+
+# -----------------------------------------------------------------------------
+#  Cache, rate limiting, client
+# -----------------------------------------------------------------------------
+class KeywordCache:
+    """
+    SQLite map of sha256(model, instructions, keyword line) -> that keyword's
+    recommendation. Keyed per line rather than per batch, so a keyword
+    answered once is reused however the batches are packed next time.
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS keyword_recs (key TEXT PRIMARY KEY, rec TEXT NOT NULL, "
+                           "created REAL NOT NULL)")
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(model: str, instructions: str, line: str) -> str:
+        return hashlib.sha256("\x00".join([model, instructions, line]).encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: list[str]) -> dict[str, dict]:
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                rows = self._conn.execute(f"SELECT key, rec FROM keyword_recs WHERE key IN "
+                                          f"({', '.join('?' * len(chunk))})", chunk).fetchall()
+                found.update((k, json.loads(v)) for k, v in rows)
+        return found
+
+    def put_many(self, recs: dict[str, dict]) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO keyword_recs VALUES (?, ?, ?)",
+                                   [(k, json.dumps(r), now) for k, r in recs.items()])
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class RateLimiter:
+    """Async limiter on requests and estimated tokens per minute (sliding 60s window)."""
+
+    def __init__(self, rpm: int = 60, tpm: int = 150_000):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._events: list[tuple[float, int]] = []
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: int) -> None:
+        while True:
+            async with self._lock:
+                now = time.monotonic()
+                self._events = [(t, n) for t, n in self._events if now - t < 60]
+                used = sum(n for _, n in self._events)
+                if len(self._events) < self.rpm and (not self._events or used + tokens <= self.tpm):
+                    self._events.append((now, tokens))
+                    return
+                wait = 60 - (now - self._events[0][0])
+            await asyncio.sleep(max(wait, 0.01))
+
+
+class LLMRecommender:
+    """
+    Sends keyword batches through the openai SDK's Chat Completions
+    (OPENAI_BASE_URL, default api.openai.com) with up to `concurrency` calls
+    in flight under a RateLimiter; the SDK retries 429/5xx and honours
+    Retry-After. Keywords already answered for the same model + instructions
+    + line come from the KeywordCache and are not sent again; keywords the
+    model skips are not cached, so the next run asks again.
+    """
+
+    def __init__(self, model: str | None = None, api_key: str | None = None, base_url: str | None = None,
+                 concurrency: int = 4, batch_tokens: int = 1500, rpm: int = 60, tpm: int = 150_000,
+                 cache: KeywordCache | None = None, timeout: float = 60.0, retries: int = 3):
+        self.model = model or os.getenv("KW_LLM_MODEL", "gpt-4o-mini")
+        self.api_key = api_key if api_key is not None else os.getenv("OPENAI_API_KEY", "")
+        self.base_url = base_url or os.getenv("OPENAI_BASE_URL") or None
+        self.concurrency = concurrency
+        self.batch_tokens = batch_tokens
+        self.rpm, self.tpm = rpm, tpm
+        self.cache = cache
+        self.timeout = timeout
+        self.retries = retries
+        self.stats = {"keywords": 0, "cached": 0, "batches": 0, "failed": 0}
+
+    async def _call(self, client, limiter: RateLimiter, text: str) -> list[dict]:
+        tokens = estimate_tokens(INSTRUCTIONS) + estimate_tokens(text) * 2  # prompt + a similar-sized reply
+        await limiter.acquire(tokens)
+        resp = await client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "system", "content": INSTRUCTIONS}, {"role": "user", "content": text}],
+            response_format={"type": "json_object"},
+            temperature=0,
+        )
+        return json.loads(resp.choices[0].message.content or "{}").get("recommendations", [])
+
+    async def _run_batch(self, client, limiter, sem, batch) -> list[dict]:
+        async with sem:
+            try:
+                recs = await self._call(client, limiter, "\n".join(line for _, line in batch))
+            except Exception:
+                self.stats["failed"] += 1
+                return []
+        return [r for r in recs if isinstance(r, dict)]
+
+    async def recommend_async(self, batches: list[list[tuple[str, str]]]) -> list[list[dict]]:
+        from openai import AsyncOpenAI
+        self.stats["batches"] += len(batches)
+        limiter, sem = RateLimiter(self.rpm, self.tpm), asyncio.Semaphore(self.concurrency)
+        async with AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, timeout=self.timeout,
+                               max_retries=self.retries) as client:
+            return await asyncio.gather(*(self._run_batch(client, limiter, sem, b) for b in batches))
+
+    def recommend(self, lines: list[tuple[str, str]]) -> dict[str, dict]:
+        """
+        line -> {"keyword", "action", "reason"} for every (keyword, line)
+        answered with a valid action. Cached lines are not sent; the rest are
+        packed into batches of ~batch_tokens and their answers cached per line.
+        """
+        keys = {line: KeywordCache.key(self.model, INSTRUCTIONS, line) for _, line in lines}
+        cached = self.cache.get_many(list(keys.values())) if self.cache is not None else {}
+        out = {line: cached[k] for line, k in keys.items() if k in cached}
+        self.stats["keywords"] += len(lines)
+        self.stats["cached"] += len(out)
+        todo = [(kw, line) for kw, line in lines if line not in out]
+        batches = make_batches(todo, self.batch_tokens)
+        fresh = {}
+        for batch, recs in zip(batches, asyncio.run(self.recommend_async(batches)) if batches else []):
+            by_kw = {r.get("keyword"): r for r in recs}
+            for kw, line in batch:
+                r = by_kw.get(kw)
+                if r is not None and r.get("action") in ACTIONS:
+                    fresh[line] = {"keyword": kw, "action": r["action"], "reason": str(r.get("reason", ""))}
+        if self.cache is not None and fresh:
+            self.cache.put_many({keys[line]: r for line, r in fresh.items()})
+        out.update(fresh)
+        return out
+
+
+# -----------------------------------------------------------------------------
+#  Entry point
+# -----------------------------------------------------------------------------
+def llm_recommendations(overlap_df: pd.DataFrame | None, organic_only_df: pd.DataFrame | None,
+                        paid_only_df: pd.DataFrame | None, recommender: LLMRecommender | None = None,
+                        max_keywords: int = 300, k: int = 5) -> tuple[str, pd.DataFrame]:
+    """
+    Per-keyword LLM recommendations for the top `max_keywords` keywords of
+    each segment. Returns (markdown with the first k per segment,
+    DataFrame[segment, keyword, action, reason]); keywords the model
+    skipped (or whose batch failed) get action "unreviewed".
+    """
+    rec = recommender or LLMRecommender()
+    frames = {"overlap": overlap_df, "organic": organic_only_df, "paid": paid_only_df}
+    lines = {seg: keyword_lines(df, seg, max_keywords) for seg, df in frames.items()}
+    answers = rec.recommend([item for ls in lines.values() for item in ls])
+
+    rows = []
+    for seg, ls in lines.items():
+        for kw, line in ls:
+            r = answers.get(line, {})
+            rows.append({"segment": seg, "keyword": kw, "action": r.get("action", "unreviewed"),
+                         "reason": r.get("reason", "")})
+    table = pd.DataFrame(rows, columns=["segment", "keyword", "action", "reason"])
+    return _render(table, rec.stats, k), table
+
+
+_TITLES = {"overlap": "Overlap (organic + paid)", "organic": "Organic-only gaps", "paid": "Paid-only keywords"}
+
+
+def _render(table: pd.DataFrame, stats: dict, k: int) -> str:
+    lines = []
+    for seg, title in _TITLES.items():
+        part = table[table["segment"] == seg]
+        lines.append(f"**{title}: top {k} of {len(part)}**")
+        if part.empty:
+            lines.append("- No keywords in this segment.")
+        for r in part.head(k).to_dict("records"):
+            lines.append(f"- `{r['keyword']}` — **{r['action']}**. {r['reason']}".rstrip())
+        counts = part["action"].value_counts()
+        if len(counts):
+            lines.append("- Actions: " + ", ".join(f"{a} {n}" for a, n in counts.items()))
+        lines.append("")
+    lines.append(f"_LLM: {stats['keywords']} keywords ({stats['cached']} cached), {stats['batches']} batches "
+                 f"sent, {stats['failed']} failed._")
+    return "\n".join(lines)
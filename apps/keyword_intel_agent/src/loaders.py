@@ -1,18 +1,83 @@
 ﻿from __future__ import annotations
+from typing import Iterator
 import pandas as pd
+from .normalize import NormalizeCache, normalize_series
 
-def load_gsc_csv(path_or_buffer) -> pd.DataFrame:
-    df = pd.read_csv(path_or_buffer)
-    df = df.copy()
-    df["ctr"] = df["ctr"].astype(float)
-    df["position"] = df["position"].astype(float)
-    return df
+# Bump when parsing or schemas change; part of the input cache key
+LOADER_VERSION = 2
+
+# Declared export schemas: these columns are parsed straight into their dtypes,
+# any other column in the export is kept with pandas' inferred dtype.
+# Count columns are parsed as float, since exports leave blank cells, and
+# become int64 below once blanks are filled with 0. Ads exports also write
+# conversions as decimals ("1.00"), which are truncated as the loader always has.
+GSC_SCHEMA = {
+    "page": "object", "query": "object",
+    "clicks": "float64", "impressions": "float64",
+    "ctr": "float64", "position": "float64",
+}
+ADS_SCHEMA = {
+    "campaign": "object", "adgroup": "object", "keyword": "object",
+    "clicks": "float64", "cost": "float64", "cpc": "float64",
+    "conversions": "float64",
+}
+_INT_AFTER_PARSE = {"gsc": ["clicks", "impressions"], "ads": ["clicks", "conversions"]}
+
+def _header(path_or_buffer) -> list[str]:
+    cols = list(pd.read_csv(path_or_buffer, nrows=0).columns)
+    if hasattr(path_or_buffer, "seek"):
+        path_or_buffer.seek(0)
+    return cols
 
-def load_ads_csv(path_or_buffer) -> pd.DataFrame:
-    df = pd.read_csv(path_or_buffer)
-    df = df.copy()
-    for col in ["clicks","conversions"]:
-        if col in df.columns: df[col] = df[col].astype(int)
-    for col in ["cost","cpc"]:
-        if col in df.columns: df[col] = df[col].astype(float)
+def _read_kwargs(path_or_buffer, schema: dict[str, str], usecols: list[str] | None) -> dict:
+    header = _header(path_or_buffer)
+    present = header if usecols is None else [c for c in header if c in usecols]
+    kw = {"dtype": {c: schema[c] for c in present if c in schema}}
+    if usecols is not None:
+        kw["usecols"] = present
+    return kw
+
+def _finish(df: pd.DataFrame, kind: str) -> pd.DataFrame:
+    for col in _INT_AFTER_PARSE.get(kind, []):
+        if col in df.columns: df[col] = df[col].fillna(0).astype("int64")
     return df
+
+def load_gsc_csv(path_or_buffer, engine: str | None = None, usecols: list[str] | None = None) -> pd.DataFrame:
+    """
+    Read a GSC export with declared dtypes; `usecols` limits parsing to those
+    columns. engine="pyarrow" enables the multithreaded parser.
+    """
+    kw = _read_kwargs(path_or_buffer, GSC_SCHEMA, usecols)
+    return _finish(pd.read_csv(path_or_buffer, engine=engine, **kw), "gsc")
+
+def load_ads_csv(path_or_buffer, engine: str | None = None, usecols: list[str] | None = None) -> pd.DataFrame:
+    """
+    Read an Ads export with declared dtypes; `usecols` limits parsing to those
+    columns. engine="pyarrow" enables the multithreaded parser.
+    """
+    kw = _read_kwargs(path_or_buffer, ADS_SCHEMA, usecols)
+    return _finish(pd.read_csv(path_or_buffer, engine=engine, **kw), "ads")
+
+# -----------------------------------------------------------------------------
+#  Row batches
+# -----------------------------------------------------------------------------
+#  For callers that consume one batch at a time (cli --chunksize folds them
+#  into aggregate.KeywordAggregator); holding every batch would peak above a
+#  single full read, so there is deliberately no "collect all" helper.
+def _iter_csv(path_or_buffer, kind: str, schema: dict[str, str], text_col: str,
+              chunksize: int, cache: NormalizeCache | None) -> Iterator[pd.DataFrame]:
+    kw = _read_kwargs(path_or_buffer, schema, None)
+    # The pyarrow engine has no chunked reader, so streaming always uses the C parser
+    with pd.read_csv(path_or_buffer, chunksize=chunksize, **kw) as reader:
+        for chunk in reader:
+            chunk = _finish(chunk, kind)
+            chunk["kw_norm"] = normalize_series(chunk[text_col], cache)
+            yield chunk
+
+def iter_gsc_csv(path_or_buffer, chunksize: int = 250_000, cache: NormalizeCache | None = None) -> Iterator[pd.DataFrame]:
+    """Yield GSC row batches that already carry `kw_norm`."""
+    return _iter_csv(path_or_buffer, "gsc", GSC_SCHEMA, "query", chunksize, cache)
+
+def iter_ads_csv(path_or_buffer, chunksize: int = 250_000, cache: NormalizeCache | None = None) -> Iterator[pd.DataFrame]:
+    """Yield Ads row batches that already carry `kw_norm`."""
+    return _iter_csv(path_or_buffer, "ads", ADS_SCHEMA, "keyword", chunksize, cache)
@@ -0,0 +1,116 @@
+from __future__ import annotations
+import os, sqlite3
+import pandas as pd
+from .matching import FuzzyMatcher
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ads_keywords (
+    context TEXT NOT NULL,
+    kw      TEXT NOT NULL,
+    PRIMARY KEY (context, kw)
+);
+CREATE TABLE IF NOT EXISTS matches (
+    context   TEXT NOT NULL,
+    gsc_kw    TEXT NOT NULL,
+    ads_kw    TEXT,
+    score     REAL,
+    scorer    TEXT NOT NULL,
+    threshold REAL NOT NULL,
+    PRIMARY KEY (context, gsc_kw)
+);
+"""
+
+# Below this many queries a brute-force cdist beats building the blocking index
+_BRUTE_FORCE_MAX = 64
+
+
+def _matcher(choices: list[str], n_queries: int, workers: int) -> FuzzyMatcher:
+    return FuzzyMatcher(choices, workers=workers, blocking=n_queries >= _BRUTE_FORCE_MAX)
+
+
+class MatchStore:
+    """
+    SQLite store of best fuzzy matches (gsc_kw -> ads_kw, score) per scorer and
+    threshold, plus the Ads keyword set they were computed against.
+
+    match() only scores what changed since the previous run:
+      - new GSC keywords, and those whose stored match left the Ads set,
+        are scored against every Ads keyword;
+      - every other stored keyword is scored against the newly added Ads
+        keywords only, and keeps its stored match unless one of them wins.
+    GSC keywords absent from the current run are dropped, since their entries
+    would not be kept in sync with later Ads changes. Ties go to the smallest
+    Ads keyword, as in FuzzyMatcher, so the Ads row order never matters; only
+    changed matches and Ads keywords are written back.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @staticmethod
+    def _context(scorer: str, threshold: float) -> str:
+        return f"{scorer}@{float(threshold):g}"
+
+    def match(self, queries: list[str], choices: list[str], threshold: float = 90,
+              workers: int = -1) -> pd.DataFrame:
+        """Same result as FuzzyMatcher(choices).match(queries, threshold), computed as a delta."""
+        queries, choices = list(queries), sorted(set(choices))
+        scorer = FuzzyMatcher.scorer_name
+        ctx = self._context(scorer, threshold)
+        cur = self._conn.cursor()
+
+        prev_ads = {r[0] for r in cur.execute("SELECT kw FROM ads_keywords WHERE context = ?", (ctx,))}
+        stored = {
+            g: (a, s) for g, a, s in
+            cur.execute("SELECT gsc_kw, ads_kw, score FROM matches WHERE context = ?", (ctx,))
+        }
+        added = [kw for kw in choices if kw not in prev_ads]
+        removed = prev_ads.difference(choices)
+
+        full, delta = [], []
+        for kw in queries:
+            hit = stored.get(kw)
+            if hit is None or hit[0] in removed:
+                full.append(kw)
+            else:
+                delta.append(kw)
+
+        best: dict[str, tuple[str | None, float | None]] = {kw: stored[kw] for kw in delta}
+        if full:
+            res = _matcher(choices, len(full), workers).match(full, threshold)
+            best.update({kw: (None, None) for kw in full})
+            best.update({q: (c, s) for q, c, s in zip(res["query"], res["choice"], res["score"])})
+        if delta and added:
+            res = _matcher(added, len(delta), workers).match(delta, threshold)
+            for q, c, s in zip(res["query"], res["choice"], res["score"]):
+                old_kw, old_score = best[q]
+                # Same tie-break as a full scan: higher score, then smaller Ads keyword
+                if old_kw is None or s > old_score or (s == old_score and c < old_kw):
+                    best[q] = (c, s)
+
+        changed = [(ctx, kw, a, s, scorer, float(threshold)) for kw, (a, s) in best.items()
+                   if stored.get(kw) != (a, s)]
+        vanished = [(ctx, kw) for kw in stored.keys() - best.keys()]
+        with self._conn:
+            cur.executemany("DELETE FROM matches WHERE context = ? AND gsc_kw = ?", vanished)
+            cur.executemany(
+                "INSERT OR REPLACE INTO matches (context, gsc_kw, ads_kw, score, scorer, threshold) "
+                "VALUES (?, ?, ?, ?, ?, ?)", changed,
+            )
+            cur.executemany("DELETE FROM ads_keywords WHERE context = ? AND kw = ?", ((ctx, kw) for kw in removed))
+            cur.executemany("INSERT INTO ads_keywords (context, kw) VALUES (?, ?)", ((ctx, kw) for kw in added))
+
+        rows = [(kw, *best[kw]) for kw in queries if best[kw][0] is not None]
+        return pd.DataFrame(rows, columns=["query", "choice", "score"])
@@ -0,0 +1,356 @@
+from __future__ import annotations
+import hashlib, importlib.util, threading
+from collections import Counter, OrderedDict, defaultdict
+import numpy as np
+import pandas as pd
+from rapidfuzz import process, fuzz
+
+
+# -----------------------------------------------------------------------------
+#  Candidate blocking
+# -----------------------------------------------------------------------------
+#  token_sort_ratio compares the whitespace-sorted token strings with the Indel
+#  ratio 100 * (1 - d / (len1 + len2)). For a score >= threshold the Indel
+#  distance d is bounded, and every edit destroys at most q padded q-grams, so
+#  two keys that can reach the threshold must share at least
+#      max(len1, len2) + q - 1 - q * d_max
+#  q-grams. Whenever that bound is >= 1 we only score keys sharing a q-gram;
+#  otherwise (very short keys / low thresholds) every key in the length band is
+#  scored. Blocking therefore never drops a pair the full scan would accept.
+_PAD = "\x00"
+
+
+def _sort_key(s: str) -> str:
+    return " ".join(sorted(s.split()))
+
+
+def _qgrams(key: str, q: int) -> Counter:
+    padded = _PAD * (q - 1) + key + _PAD * (q - 1)
+    return Counter(padded[i:i + q] for i in range(len(padded) - q + 1))
+
+
+class FuzzyMatcher:
+    """
+    Best-match index over a fixed list of choices (the Ads keywords).
+
+    Equivalent to calling process.extractOne(kw, sorted(choices),
+    scorer=token_sort_ratio) per query and keeping matches >= threshold, but
+    queries are narrowed with a q-gram blocking index and scored in batches
+    with process.cdist on all cores. Choices are kept sorted so ties go to the
+    lexicographically smallest one, whatever order the Ads export lists them in.
+    """
+
+    scorer_name = "token_sort_ratio"
+
+    def __init__(self, choices: list[str], q: int = 3, workers: int = -1,
+                 batch_size: int = 256, max_cells: int = 8_000_000, blocking: bool = True):
+        self.choices = sorted(set(choices))
+        self.q = q
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_cells = max_cells
+        self.blocking = blocking
+        if not blocking:
+            # Building the index costs more than brute force for a handful of queries
+            return
+
+        keys = [_sort_key(c) for c in self.choices]
+        self._lens = np.fromiter((len(k) for k in keys), dtype=np.int64, count=len(keys))
+        self._len_values = np.unique(self._lens)
+        self._by_len = [np.flatnonzero(self._lens == n) for n in self._len_values]
+        postings: dict[str, list[int]] = defaultdict(list)
+        counts: dict[str, list[int]] = defaultdict(list)
+        for i, k in enumerate(keys):
+            for g, c in _qgrams(k, q).items():
+                postings[g].append(i)
+                counts[g].append(c)
+        self._postings = {g: np.asarray(ids, dtype=np.int64) for g, ids in postings.items()}
+        self._counts = {g: np.asarray(counts[g], dtype=np.int64) for g in postings}
+
+    # ---- blocking
+    def candidates(self, query: str, threshold: float) -> np.ndarray:
+        """Sorted choice indices that can reach `threshold` against `query`."""
+        if not self.blocking:
+            return np.arange(len(self.choices))
+        key = _sort_key(query)
+        n1, q = len(key), self.q
+        slack = (100.0 - threshold) / 100.0
+
+        n2 = self._len_values
+        d_max = np.floor(slack * (n1 + n2) + 1e-9).astype(np.int64)
+        band = np.abs(n1 - n2) <= d_max
+        safe = band & (np.maximum(n1, n2) + q - 1 - q * d_max >= 1)
+        parts = [self._by_len[i] for i in np.flatnonzero(band & ~safe)]
+
+        if safe.any():
+            grams = _qgrams(key, q)
+            hits = [g for g in grams if g in self._postings]
+            if hits:
+                hit_ids = np.concatenate([self._postings[g] for g in hits])
+                hit_cnt = np.concatenate([np.minimum(self._counts[g], grams[g]) for g in hits])
+                uniq, inv = np.unique(hit_ids, return_inverse=True)
+                shared = np.bincount(inv, weights=hit_cnt)
+
+                safe_len = np.zeros(n2[-1] + 1, dtype=bool)
+                safe_len[n2[safe]] = True
+                m2 = self._lens[uniq]
+                need = np.maximum(n1, m2) + q - 1 - q * np.floor(slack * (n1 + m2) + 1e-9)
+                parts.append(uniq[safe_len[m2] & (shared >= need)])
+
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(parts))
+
+    # ---- scoring
+    def _best(self, queries: list[str], cand: np.ndarray, threshold: float):
+        """Row-wise best (index, score) of queries against choices[cand]."""
+        best_idx = np.full(len(queries), -1, dtype=np.int64)
+        best_score = np.full(len(queries), -1.0, dtype=np.float64)
+        if len(cand) == 0:
+            return best_idx, best_score
+        step = max(1, self.max_cells // max(1, len(queries)))
+        for start in range(0, len(cand), step):
+            cols = cand[start:start + step]
+            scores = process.cdist(
+                queries, [self.choices[i] for i in cols],
+                scorer=fuzz.token_sort_ratio, score_cutoff=threshold,
+                workers=self.workers, dtype=np.float32,
+            )
+            arg = scores.argmax(axis=1)
+            top = scores[np.arange(len(queries)), arg]
+            # Strictly greater keeps the earliest (smallest) choice on ties, like extractOne
+            better = top > best_score
+            best_idx[better] = cols[arg[better]]
+            best_score[better] = top[better]
+        return best_idx, best_score
+
+    def match(self, queries: list[str], threshold: float = 90) -> pd.DataFrame:
+        """
+        Return DataFrame[query, choice, score] with the best choice per query
+        scoring >= threshold. Queries without such a match are omitted.
+        """
+        queries = list(queries)
+        rows_q, rows_c, rows_s = [], [], []
+        if queries and self.choices:
+            # Group similar queries so their candidate sets overlap in a batch
+            order = sorted(range(len(queries)), key=lambda i: _sort_key(queries[i]))
+            for start in range(0, len(order), self.batch_size):
+                batch = [queries[i] for i in order[start:start + self.batch_size]]
+                if self.blocking:
+                    cand = np.unique(np.concatenate(
+                        [self.candidates(kw, threshold) for kw in batch]
+                    ))
+                else:
+                    cand = np.arange(len(self.choices))
+                idx, score = self._best(batch, cand, threshold)
+                for kw, i, s in zip(batch, idx, score):
+                    if i >= 0 and s >= threshold:
+                        rows_q.append(kw)
+                        rows_c.append(self.choices[i])
+                        rows_s.append(float(fuzz.token_sort_ratio(kw, self.choices[i])))
+        out = pd.DataFrame({"query": rows_q, "choice": rows_c, "score": rows_s})
+        # Keep the caller's query order
+        pos = {kw: i for i, kw in enumerate(queries)}
+        return out.iloc[np.argsort(out["query"].map(pos).to_numpy(), kind="stable")].reset_index(drop=True)
+
+
+# -----------------------------------------------------------------------------
+#  Character n-gram TF-IDF backend
+# -----------------------------------------------------------------------------
+def _char_ngrams(s: str, n: int) -> list[str]:
+    padded = f" {s} "
+    return [padded[i:i + n] for i in range(max(1, len(padded) - n + 1))]
+
+
+class TfidfMatcher:
+    """
+    Best-match index scoring cosine similarity of character n-gram TF-IDF
+    vectors (x100, so thresholds share the 0-100 scale of token_sort_ratio).
+
+    The vocabulary, smoothed IDF (as in sklearn's TfidfVectorizer) and the
+    L2-normalised choice matrix are fit once on the choices; queries are only
+    projected onto them, so the index is read-only after construction and a
+    query's scores do not depend on which other queries are scored with it.
+    N-grams the choices never use still count towards a query's norm, with
+    the IDF of a term seen in no choice. Scoring runs as chunked sparse
+    products, so cost tracks shared n-grams rather than len(queries) x
+    len(choices) edit distances. As in FuzzyMatcher, choices are kept sorted
+    so ties go to the smallest one. Requires scipy.
+    """
+
+    scorer_name = "tfidf_cosine"
+    requires = ("scipy",)
+
+    def __init__(self, choices: list[str], n: int = 3, workers: int = -1, max_cells: int = 20_000_000):
+        try:
+            import scipy.sparse  # noqa: F401
+        except ImportError as e:  # pragma: no cover - optional dependency
+            raise ImportError("The tfidf matcher needs scipy (pip install scipy)") from e
+        self.choices = sorted(choices)
+        self.n = n
+        self.max_cells = max_cells
+        self._vocab: dict[str, int] = {}
+        counts, _ = self._counts(self.choices, grow=True)
+        df = np.bincount(counts.indices, minlength=len(self._vocab))
+        self._idf = (np.log((1 + len(self.choices)) / (1 + df)) + 1).astype(np.float32)
+        self._unseen_idf = np.float32(np.log(1 + len(self.choices)) + 1)
+        self._choices_T = self._tfidf(counts, np.zeros(len(self.choices), dtype=np.float32)).T.tocsr()
+
+    def _counts(self, texts: list[str], grow: bool):
+        """
+        (raw n-gram count matrix (CSR), per-row sum of squared counts of n-grams
+        outside the vocabulary). New n-grams join the vocabulary only when grow=True.
+        """
+        import scipy.sparse as sp
+        vocab = self._vocab
+        indptr, indices = [0], []
+        unseen = np.zeros(len(texts), dtype=np.float32)
+        for r, t in enumerate(texts):
+            missing = Counter()
+            for g in _char_ngrams(t, self.n):
+                j = vocab.get(g)
+                if j is None:
+                    if not grow:
+                        missing[g] += 1
+                        continue
+                    j = vocab[g] = len(vocab)
+                indices.append(j)
+            indptr.append(len(indices))
+            if missing:
+                unseen[r] = sum(c * c for c in missing.values())
+        data = np.ones(len(indices), dtype=np.float32)
+        m = sp.csr_matrix((data, np.asarray(indices, dtype=np.int64), np.asarray(indptr, dtype=np.int64)),
+                          shape=(len(texts), len(vocab)))
+        m.sum_duplicates()
+        return m, unseen
+
+    def _tfidf(self, counts, unseen_sq: np.ndarray):
+        """Rows weighted by the fitted IDF and L2-normalised, out-of-vocabulary n-grams included in the norm."""
+        import scipy.sparse as sp
+        m = counts.multiply(self._idf).tocsr().astype(np.float32)
+        sq = np.asarray(m.multiply(m).sum(axis=1)).ravel() + unseen_sq * self._unseen_idf ** 2
+        norms = np.sqrt(sq)
+        norms[norms == 0] = 1.0
+        return sp.csr_matrix(sp.diags(1.0 / norms) @ m, dtype=np.float32)
+
+    def top_n(self, queries: list[str], n: int = 1, threshold: float = 90) -> pd.DataFrame:
+        """
+        DataFrame[query, choice, score, rank]: up to n choices per query with
+        score >= threshold, best first (ties -> smaller choice), in query order.
+        """
+        queries = list(queries)
+        if not queries or not self.choices:
+            return pd.DataFrame({"query": [], "choice": [], "score": [], "rank": []})
+        q_counts, unseen = self._counts(queries, grow=False)
+        Q, C_T = self._tfidf(q_counts, unseen), self._choices_T
+
+        cut = threshold / 100.0 - 1e-6
+        step = max(1, self.max_cells // max(1, len(self.choices)))
+        rows_q, rows_c, rows_s, rows_r = [], [], [], []
+        for start in range(0, len(queries), step):
+            S = (Q[start:start + step] @ C_T).tocsr()
+            S.data[S.data < cut] = 0
+            S.eliminate_zeros()
+            if S.nnz == 0:
+                continue
+            row = np.repeat(np.arange(S.shape[0]), np.diff(S.indptr))
+            order = np.lexsort((S.indices, -S.data, row))
+            row, col, score = row[order], S.indices[order], S.data[order]
+            rank = np.arange(len(row)) - S.indptr[row]
+            keep = rank < n
+            rows_q.append(row[keep] + start)
+            rows_c.append(col[keep])
+            rows_s.append(score[keep])
+            rows_r.append(rank[keep] + 1)
+        if not rows_q:
+            return pd.DataFrame({"query": [], "choice": [], "score": [], "rank": []})
+        qi, ci = np.concatenate(rows_q), np.concatenate(rows_c)
+        return pd.DataFrame({
+            "query": [queries[i] for i in qi],
+            "choice": [self.choices[i] for i in ci],
+            "score": np.round(np.minimum(np.concatenate(rows_s).astype(np.float64) * 100, 100.0), 2),
+            "rank": np.concatenate(rows_r),
+        })
+
+    def match(self, queries: list[str], threshold: float = 90) -> pd.DataFrame:
+        """Same contract as FuzzyMatcher.match: best choice per query scoring >= threshold."""
+        return self.top_n(queries, 1, threshold).drop(columns="rank")
+
+
+# -----------------------------------------------------------------------------
+#  Backend registry
+# -----------------------------------------------------------------------------
+# A matcher takes (choices, workers=...) and provides match(queries, threshold)
+# -> DataFrame[query, choice, score] with scores on a 0-100 scale.
+MATCHERS: dict[str, type] = {
+    "rapidfuzz": FuzzyMatcher,
+    "tfidf": TfidfMatcher,
+}
+
+
+def register_matcher(name: str, cls: type) -> None:
+    MATCHERS[name] = cls
+
+
+def available_matchers() -> list[str]:
+    """Registered backends whose optional dependencies (a class's `requires`) are importable."""
+    return [name for name, cls in MATCHERS.items()
+            if all(importlib.util.find_spec(mod) is not None for mod in getattr(cls, "requires", ()))]
+
+
+def make_matcher(name: str, choices: list[str], workers: int = -1):
+    try:
+        cls = MATCHERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown matcher {name!r}; choose from {', '.join(MATCHERS)}") from None
+    return cls(choices, workers=workers)
+
+
+# -----------------------------------------------------------------------------
+#  Warm matcher indexes
+# -----------------------------------------------------------------------------
+class MatcherCache:
+    """
+    LRU of built matchers keyed by backend name + a digest of the choices, so
+    a long-running process (see daemon.py) builds the Ads keyword index once
+    and reuses it while the Ads keyword set is unchanged. Built indexes are
+    read-only while scoring, so concurrent matches share one without locking.
+    """
+
+    def __init__(self, max_entries: int = 8, workers: int = -1):
+        self.max_entries = max_entries
+        self.workers = workers
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "builds": 0}
+
+    @staticmethod
+    def key(name: str, choices: list[str]) -> str:
+        h = hashlib.sha256(name.encode("utf-8"))
+        for c in choices:
+            h.update(c.encode("utf-8"))
+            h.update(b"\x00")
+        return h.hexdigest()
+
+    def get(self, name: str, choices: list[str]):
+        """The matcher for these choices, building the index on a miss."""
+        key = self.key(name, choices)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry
+        entry = make_matcher(name, choices, workers=self.workers)
+        with self._lock:
+            self._entries[key] = entry
+            self.stats["builds"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def match(self, name: str, choices: list[str], queries: list[str], threshold: float = 90) -> pd.DataFrame:
+        return self.get(name, choices).match(queries, threshold)
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -1,37 +1,120 @@
 ﻿from __future__ import annotations
+import json
+import numpy as np
 import pandas as pd
-from rapidfuzz import process, fuzz
-from .normalize import normalize_kw
+from .normalize import NormalizeCache, normalize_series
+from rapidfuzz import fuzz
+from .matching import MatcherCache, make_matcher
+from .match_store import MatchStore
+from .aggregate import aggregate_inputs
 
 
 # -----------------------------------------------------------------------------
-#  Expected CTR curve (for estimating organic potential)
+#  Expected CTR curves (for estimating organic potential)
 # -----------------------------------------------------------------------------
+class CtrCurve:
+    """
+    Step CTR curve: positions <= breakpoints[i] get ctrs[i]; positions beyond
+    the last breakpoint (or missing) get ctrs[-1].
+    """
+
+    def __init__(self, breakpoints, ctrs):
+        self.breakpoints = np.asarray(breakpoints, dtype=float)
+        self.ctrs = np.asarray(ctrs, dtype=float)
+        if len(self.ctrs) != len(self.breakpoints) + 1:
+            raise ValueError("CtrCurve needs exactly one more ctr than breakpoints")
+        if np.any(np.diff(self.breakpoints) <= 0):
+            raise ValueError("CtrCurve breakpoints must be strictly increasing")
+
+    def lookup(self, positions) -> np.ndarray:
+        # NaN sorts past every breakpoint, so missing positions fall in the last bucket
+        return self.ctrs[np.searchsorted(self.breakpoints, positions, side="left")]
+
+
+CTR_CURVES: dict[str, CtrCurve] = {
+    "default": CtrCurve([1, 2, 3, 5, 10], [0.30, 0.20, 0.15, 0.10, 0.05, 0.02]),
+}
+
+
+def register_ctr_curve(name: str, curve: CtrCurve) -> None:
+    """Make a curve (e.g. per vertical or device) selectable by name in roi_signals."""
+    CTR_CURVES[name] = curve
+
+
+def load_ctr_curves(path: str) -> dict[str, CtrCurve]:
+    """
+    Register curves from a JSON file shaped like
+    {"mobile": {"breakpoints": [1, 2, 3], "ctrs": [0.25, 0.15, 0.1, 0.03]}}.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        spec = json.load(f)
+    curves = {name: CtrCurve(c["breakpoints"], c["ctrs"]) for name, c in spec.items()}
+    CTR_CURVES.update(curves)
+    return curves
+
+
 def expected_ctr(position: float) -> float:
-    if position <= 1: return 0.30
-    if position <= 2: return 0.20
-    if position <= 3: return 0.15
-    if position <= 5: return 0.10
-    if position <= 10: return 0.05
-    return 0.02
+    return float(CTR_CURVES["default"].lookup(position))
 
 
 # -----------------------------------------------------------------------------
 #  Utility to add normalized keyword columns
 # -----------------------------------------------------------------------------
-def add_kw_norm_cols(gsc: pd.DataFrame, ads: pd.DataFrame):
+def add_kw_norm_cols(gsc: pd.DataFrame, ads: pd.DataFrame, cache: NormalizeCache | None = None):
     gsc = gsc.copy()
     ads = ads.copy()
-    gsc["kw_norm"] = gsc["query"].map(normalize_kw)
-    ads["kw_norm"] = ads["keyword"].map(normalize_kw)
+    gsc["kw_norm"] = normalize_series(gsc["query"], cache)
+    ads["kw_norm"] = normalize_series(ads["keyword"], cache)
     return gsc, ads
 
 
 # -----------------------------------------------------------------------------
 #  Compute overlaps (exact or fuzzy)
 # -----------------------------------------------------------------------------
-def compute_overlap_segments(gsc: pd.DataFrame, ads: pd.DataFrame, fuzzy=False, threshold=90):
-    """Return dict with overlap, organic_only, paid_only DataFrames."""
+def fuzzy_keyword_map(gsc: pd.DataFrame, ads: pd.DataFrame, threshold=90, workers=-1,
+                      match_store: MatchStore | None = None, matcher: str = "rapidfuzz",
+                      matchers: MatcherCache | None = None) -> pd.DataFrame:
+    """
+    Best Ads kw_norm per GSC kw_norm: DataFrame[kw_norm_gsc, kw_norm_ads,
+    match_score, token_sort_ratio]. match_score is the backend's own 0-100
+    score (see matching.MATCHERS); token_sort_ratio is always reported so
+    backends can be compared. The match store only applies to "rapidfuzz";
+    other backends rescore in full. A MatcherCache reuses an index already
+    built over the same Ads keywords.
+    """
+    left = gsc["kw_norm"].drop_duplicates().tolist()
+    right = ads["kw_norm"].drop_duplicates().tolist()
+    if match_store is not None and matcher == "rapidfuzz":
+        matches = match_store.match(left, right, threshold, workers=workers)
+    elif matchers is not None:
+        matches = matchers.match(matcher, right, left, threshold)
+    else:
+        matches = make_matcher(matcher, right, workers=workers).match(left, threshold)
+    if matcher == "rapidfuzz":
+        ratio = matches["score"]
+    else:
+        ratio = [fuzz.token_sort_ratio(q, c) for q, c in zip(matches["query"], matches["choice"])]
+    return pd.DataFrame({"kw_norm_gsc": matches["query"], "kw_norm_ads": matches["choice"],
+                         "match_score": matches["score"], "token_sort_ratio": ratio})
+
+
+def compute_overlap_segments(gsc: pd.DataFrame, ads: pd.DataFrame, fuzzy=False, threshold=90, workers=-1,
+                             match_store: MatchStore | None = None, fuzzy_map: pd.DataFrame | None = None,
+                             aggregate: bool = False, matcher: str = "rapidfuzz",
+                             matchers: MatcherCache | None = None):
+    """
+    Return dict with overlap, organic_only, paid_only DataFrames. With a
+    match_store, the fuzzy map is updated incrementally from the previous run;
+    a precomputed fuzzy_map (see fuzzy_keyword_map) skips matching entirely.
+    Compact inputs (see compact.compact_inputs) are joined on kw_norm codes.
+    With aggregate=True both sides are first rolled up to one row per kw_norm
+    (see aggregate.aggregate_keywords), so the join is one-to-one instead of
+    a per-keyword cross product of pages x ad groups. `matcher` picks the
+    fuzzy backend; overlap rows carry its match_score and token_sort_ratio.
+    `matchers` keeps built indexes warm across calls (see matching.MatcherCache).
+    """
+    if aggregate:
+        gsc, ads = aggregate_inputs(gsc, ads)
     if not fuzzy:
         merged = pd.merge(
             gsc, ads,
@@ -40,20 +123,19 @@ def compute_overlap_segments(gsc: pd.DataFrame, ads: pd.DataFrame, fuzzy=False,
             indicator=True
         )
     else:
+        # Fuzzy map
+        map_df = fuzzy_map
+        if map_df is None:
+            map_df = fuzzy_keyword_map(gsc, ads, threshold, workers, match_store, matcher, matchers)
+        if isinstance(gsc["kw_norm"].dtype, pd.CategoricalDtype) and gsc["kw_norm"].dtype == ads["kw_norm"].dtype:
+            # Compact inputs: code the map with the shared dictionary so both joins run on ints
+            kw_dtype = gsc["kw_norm"].dtype
+            map_df = map_df.astype({"kw_norm_gsc": kw_dtype, "kw_norm_ads": kw_dtype})
+
         # Safe suffixing avoids duplicate columns
         g = gsc.copy().add_suffix("_gsc")
         a = ads.copy().add_suffix("_ads")
 
-        # Fuzzy map
-        left = g["kw_norm_gsc"].drop_duplicates().tolist()
-        right = a["kw_norm_ads"].drop_duplicates().tolist()
-        pairs = []
-        for kw in left:
-            match = process.extractOne(kw, right, scorer=fuzz.token_sort_ratio)
-            if match and match[1] >= threshold:
-                pairs.append((kw, match[0]))
-        map_df = pd.DataFrame(pairs, columns=["kw_norm_gsc", "kw_norm_ads"])
-
         merged = g.merge(map_df, on="kw_norm_gsc", how="left")
         merged = merged.merge(a, on="kw_norm_ads", how="outer", indicator=True)
         merged["kw_norm"] = merged["kw_norm_gsc"].fillna(merged["kw_norm_ads"])
@@ -67,8 +149,56 @@ def compute_overlap_segments(gsc: pd.DataFrame, ads: pd.DataFrame, fuzzy=False,
 # -----------------------------------------------------------------------------
 #  Compute ROI signals, CTR gaps, and priority scores
 # -----------------------------------------------------------------------------
-def roi_signals(overlap: pd.DataFrame) -> pd.DataFrame:
-    df = overlap.copy()
+_DISPLAY_ORDER = [
+    "page","query","keyword","kw_norm",
+    "clicks_gsc","impressions","ctr","position",
+    "clicks_ads","cost","cpc","conversions",
+    "expected_ctr","ctr_gap","organic_potential",
+    "high_cpc_flag","reduce_bid_flag","priority"
+]
+
+
+def _float_values(df: pd.DataFrame, col: str) -> np.ndarray:
+    """Column as a float ndarray (missing -> NaN), cast exactly once."""
+    if col not in df.columns:
+        return np.zeros(len(df))
+    return df[col].to_numpy(dtype=float, na_value=np.nan)
+
+
+def _descending_rank(values: np.ndarray) -> np.ndarray:
+    """Equivalent of Series.rank(ascending=False, method="first").fillna(0)."""
+    ranks = np.zeros(len(values))
+    valid = np.flatnonzero(~np.isnan(values))
+    order = valid[np.argsort(-values[valid], kind="stable")]
+    ranks[order] = np.arange(1, len(order) + 1)
+    return ranks
+
+
+def _priority(potential: np.ndarray, high_cpc: np.ndarray, reduce_bid: np.ndarray) -> np.ndarray:
+    return _descending_rank(potential) + high_cpc * 2 + reduce_bid * 1
+
+
+def recompute_priority(signals: pd.DataFrame) -> pd.DataFrame:
+    """
+    Refresh `priority` in place on a roi_signals frame. Priority ranks rows
+    against each other, so it must be recomputed after combining signal frames.
+    """
+    signals["priority"] = _priority(
+        _float_values(signals, "organic_potential"),
+        signals["high_cpc_flag"].to_numpy(),
+        signals["reduce_bid_flag"].to_numpy(),
+    )
+    return signals
+
+
+def roi_signals(overlap: pd.DataFrame, ctr_curve: str | CtrCurve = "default", inplace: bool = False) -> pd.DataFrame:
+    """
+    Add expected CTR, CTR gap, organic potential, bid flags and priority to the
+    overlap table. Columns are computed on ndarrays; with inplace=True the
+    input frame itself is extended, otherwise only a shallow copy is made.
+    """
+    df = overlap if inplace else overlap.copy(deep=False)
+    curve = CTR_CURVES[ctr_curve] if isinstance(ctr_curve, str) else ctr_curve
 
     # Canonicalize columns regardless of merge path
     alias_map = [
@@ -94,33 +224,35 @@ def roi_signals(overlap: pd.DataFrame) -> pd.DataFrame:
         if col not in df.columns:
             df[col] = pd.NA
 
+    position = _float_values(df, "position")
+    ctr = _float_values(df, "ctr")
+    impressions = _float_values(df, "impressions")
+    cpc = _float_values(df, "cpc")
+
     # Expected CTR & gaps
-    df["expected_ctr"] = df["position"].astype(float).map(expected_ctr)
-    df["ctr_gap"] = (df["expected_ctr"] - df["ctr"].astype(float)).round(4)
+    exp_ctr = curve.lookup(position)
+    ctr_gap = np.round(exp_ctr - ctr, 4)
 
     # Organic potential
-    df["organic_potential"] = (df["impressions"].astype(float) * df["ctr_gap"].clip(lower=0)).round(2)
+    potential = np.round(impressions * np.clip(ctr_gap, 0, None), 2)
 
     # Wasted spend flags
-    df["high_cpc_flag"] = ((df.get("cpc", 0).astype(float) > 2.5) & (df["organic_potential"] > 20)).astype(int)
-    df["reduce_bid_flag"] = ((df["position"].astype(float) <= 3.0) & (df.get("cpc", 0).astype(float) > 0)).astype(int)
+    high_cpc = ((cpc > 2.5) & (potential > 20)).astype(np.int64)
+    reduce_bid = ((position <= 3.0) & (cpc > 0)).astype(np.int64)
+
+    df["expected_ctr"] = exp_ctr
+    df["ctr_gap"] = ctr_gap
+    df["organic_potential"] = potential
+    df["high_cpc_flag"] = high_cpc
+    df["reduce_bid_flag"] = reduce_bid
 
     # Priority score
-    df["priority"] = (
-        df["organic_potential"].rank(ascending=False, method="first").fillna(0) +
-        (df["high_cpc_flag"] * 2) +
-        (df["reduce_bid_flag"] * 1)
-    ).astype(float)
-
-    # Preferred display order
-    preferred = [
-        "page","query","keyword","kw_norm",
-        "clicks_gsc","impressions","ctr","position",
-        "clicks_ads","cost","cpc","conversions",
-        "expected_ctr","ctr_gap","organic_potential",
-        "high_cpc_flag","reduce_bid_flag","priority"
-    ]
-    existing = [c for c in preferred if c in df.columns]
-    df = df[existing + [c for c in df.columns if c not in existing]]
+    df["priority"] = _priority(potential, high_cpc, reduce_bid)
+
+    # Preferred display order (moving columns avoids a full-frame reindex copy)
+    existing = [c for c in _DISPLAY_ORDER if c in df.columns]
+    for i, c in enumerate(existing):
+        if df.columns[i] != c:
+            df.insert(i, c, df.pop(c))
 
     return df
@@ -0,0 +1,83 @@
+"""
+Local OpenAI-compatible Chat Completions stand-in for llm_recs: answers each
+"segment|keyword|metrics" line with a rule-based recommendation in the JSON
+shape the real prompt asks for.
+
+    python -m apps.keyword_intel_agent.src.mock_llm --port 8768 --delay 0.5
+    OPENAI_API_KEY=mock OPENAI_BASE_URL=http://127.0.0.1:8768/v1 python -m apps.keyword_intel_agent.cli ... --llm
+"""
+from __future__ import annotations
+import argparse, json, time
+from apps.httputil import LocalServer
+
+
+def _metrics(s: str) -> dict:
+    out = {}
+    for part in s.split(","):
+        k, _, v = part.partition("=")
+        try:
+            out[k] = float(v)
+        except ValueError:
+            pass
+    return out
+
+
+def answer(line: str) -> dict | None:
+    seg, _, rest = line.partition("|")
+    kw, _, metrics = rest.rpartition("|")
+    if not kw:
+        return None
+    m = _metrics(metrics)
+    if seg == "overlap":
+        if m.get("pos", 99) <= 3 and m.get("cpc", 0) > 0:
+            action, reason = "bid_down", f"ranks {m['pos']:g} organically; CPC {m['cpc']:g} is avoidable"
+        else:
+            action, reason = "keep", "organic rank too weak to cut paid"
+    elif seg == "organic":
+        action, reason = "launch_ads", f"{m.get('impr', 0):g} impressions with no paid coverage"
+    else:
+        if m.get("conv", 0) == 0 and m.get("cost", 0) > 0:
+            action, reason = "pause", f"spent {m['cost']:g} with no conversions"
+        else:
+            action, reason = "improve_content", "converts in Ads but has no organic page"
+    return {"keyword": kw, "action": action, "reason": reason}
+
+
+class MockLLMServer(LocalServer):
+    def __init__(self, port: int = 0, retry_after: float = 0.2, **kw):
+        super().__init__(port, retry_after=retry_after, **kw)
+
+    @property
+    def calls(self) -> int:
+        return self.hits
+
+    def respond(self, method, path, query, body):
+        if not path.endswith("/chat/completions"):
+            return 404, {"error": {"message": f"mock: unknown path {path}"}}
+        body = body or {}
+        user = next((m["content"] for m in body.get("messages", []) if m.get("role") == "user"), "")
+        recs = [r for r in map(answer, user.splitlines()) if r]
+        content = json.dumps({"recommendations": recs})
+        return 200, {
+            "id": "chatcmpl-mock", "object": "chat.completion", "created": int(time.time()),
+            "model": body.get("model"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": len(user) // 4, "completion_tokens": len(content) // 4},
+        }
+
+
+def serve_in_thread(port: int = 0, **kw) -> MockLLMServer:
+    """Start the mock on a daemon thread; base URL is server.url + "/v1"."""
+    return MockLLMServer(port, **kw).start()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Mock Chat Completions endpoint for LLM recommendations")
+    ap.add_argument("--port", type=int, default=8768)
+    ap.add_argument("--delay", type=float, default=0.0, help="seconds to wait before each reply")
+    ap.add_argument("--limit-every", type=int, default=0, help="answer every Nth call with 429")
+    args = ap.parse_args()
+    server = MockLLMServer(args.port, delay=args.delay, limit_every=args.limit_every)
+    print(f"Mock LLM on {server.url}/v1")
+    server.serve_forever()
@@ -1,10 +1,102 @@
 ﻿from __future__ import annotations
-import re
+import json, os, re
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+_WS_RE = re.compile(r"\s+")
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9\s]")
+
+# Bump when normalization rules change; part of the input cache key
+NORMALIZE_VERSION = 1
 
 def normalize_kw(s: str) -> str:
     if not s:
         return ""
     s = s.lower().strip()
-    s = re.sub(r"\s+", " ", s)
-    s = re.sub(r"[^a-z0-9\s]", "", s)
+    s = _WS_RE.sub(" ", s)
+    s = _NON_ALNUM_RE.sub("", s)
     return s.strip()
+
+
+class NormalizeCache:
+    """
+    Bounded LRU of raw -> normalized keywords. With `path`, entries are loaded
+    from and saved to a JSON file so repeated queries are shared across runs.
+    """
+
+    def __init__(self, maxsize: int = 500_000, path: str | None = None):
+        self.maxsize = maxsize
+        self.path = path
+        self._data: OrderedDict[str, str] = OrderedDict()
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self._data.update(json.load(f))
+            except (OSError, ValueError):
+                # A corrupt cache is just a cold cache
+                self._data.clear()
+            self._evict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def lookup(self, raw: list[str]) -> list[str | None]:
+        out = []
+        for r in raw:
+            v = self._data.get(r)
+            if v is not None:
+                self._data.move_to_end(r)
+            out.append(v)
+        return out
+
+    def update(self, pairs) -> None:
+        self._data.update(pairs)
+        self._evict()
+
+    def _evict(self) -> None:
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, self.path)
+
+
+def _normalize_unique(raw: pd.Series) -> pd.Series:
+    """Vectorized normalize_kw over already-unique string values."""
+    return (
+        raw.str.lower()
+        .str.strip()
+        .str.replace(_WS_RE, " ", regex=True)
+        .str.replace(_NON_ALNUM_RE, "", regex=True)
+        .str.strip()
+    )
+
+
+def normalize_series(values: pd.Series, cache: NormalizeCache | None = None) -> pd.Series:
+    """
+    Bulk normalize_kw: normalize each distinct value once and broadcast the
+    results back through factorized codes. Missing values normalize to "".
+    """
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    raw = pd.Series(uniques, dtype=object).astype(str)
+
+    if cache is None:
+        normed = _normalize_unique(raw).to_numpy(dtype=object)
+    else:
+        normed = np.asarray(cache.lookup(raw.tolist()), dtype=object)
+        miss = np.flatnonzero(pd.isna(normed))
+        if len(miss):
+            fresh = _normalize_unique(raw.iloc[miss]).to_numpy(dtype=object)
+            normed[miss] = fresh
+            cache.update(zip(raw.iloc[miss].tolist(), fresh.tolist()))
+
+    # Code -1 (missing) picks the trailing ""
+    normed = np.append(normed, "")
+    return pd.Series(normed[codes], index=values.index, name=values.name, dtype=object)
@@ -0,0 +1,136 @@
+from __future__ import annotations
+import json, os, time, uuid
+from contextlib import contextmanager
+
+try:
+    import resource  # POSIX only
+except ImportError:  # pragma: no cover - Windows
+    resource = None
+
+# <repo root>/logs, next to the agent traces
+LOGS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", "logs"))
+
+
+def _peak_rss_mb() -> float | None:
+    if resource is None:
+        return None
+    # ru_maxrss is KiB on Linux (bytes on macOS)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _rows(obj) -> int | None:
+    """Row count of a frame, a dict of frames (summed) or a (gsc, ads) tuple."""
+    if obj is None:
+        return None
+    if isinstance(obj, dict):
+        obj = list(obj.values())
+    if isinstance(obj, (list, tuple)):
+        counts = [_rows(o) for o in obj]
+        return sum(c for c in counts if c is not None)
+    return len(obj) if hasattr(obj, "__len__") else None
+
+
+class StageRecord:
+    """Handle yielded by PipelineProfiler.stage: set rows_out, add extra fields to info."""
+    __slots__ = ("rows_out", "info")
+
+    def __init__(self):
+        self.rows_out = None
+        self.info: dict = {}
+
+
+class PipelineProfiler:
+    """
+    Per-stage wall time, CPU time, memory and row counts for one pipeline run.
+
+        prof = PipelineProfiler()
+        with prof.stage("overlap", rows_in=(gsc, ads)) as rec:
+            seg = compute_overlap_segments(gsc, ads)
+            rec.rows_out = seg
+
+    Memory is the growth of the process peak RSS during the stage (0 when an
+    earlier stage already peaked higher). With trace_malloc=True the peak of
+    Python-tracked allocations inside the stage is recorded too; that catches
+    per-stage peaks RSS can't, but slows string-heavy stages noticeably.
+    cprofile_stage names one stage to run under cProfile; its stats are
+    dumped next to the JSON trace.
+    """
+
+    def __init__(self, enabled: bool = True, trace_malloc: bool = False, cprofile_stage: str | None = None):
+        self.enabled = enabled
+        self.trace_malloc = trace_malloc and enabled
+        self.cprofile_stage = cprofile_stage if enabled else None
+        self.stages: list[dict] = []
+        self.started = time.strftime("%Y-%m-%dT%H:%M:%S")
+        self._profiles: dict[str, object] = {}
+        if self.trace_malloc:
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name: str, rows_in=None):
+        rec = StageRecord()
+        if not self.enabled:
+            yield rec
+            return
+        if self.trace_malloc:
+            import tracemalloc
+            tracemalloc.reset_peak()
+            malloc_base = tracemalloc.get_traced_memory()[0]
+        prof = None
+        if name == self.cprofile_stage:
+            import cProfile
+            prof = cProfile.Profile()
+        rss0 = _peak_rss_mb()
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        if prof is not None:
+            prof.enable()
+        try:
+            yield rec
+        finally:
+            if prof is not None:
+                prof.disable()
+                self._profiles[name] = prof
+            entry = {
+                "stage": name,
+                "wall_s": round(time.perf_counter() - wall0, 4),
+                "cpu_s": round(time.process_time() - cpu0, 4),
+                "rows_in": _rows(rows_in),
+                "rows_out": _rows(rec.rows_out),
+            }
+            rss1 = _peak_rss_mb()
+            if rss1 is not None:
+                entry["peak_rss_mb"] = round(rss1, 1)
+                entry["rss_growth_mb"] = round(rss1 - rss0, 1)
+            if self.trace_malloc:
+                entry["py_alloc_peak_mb"] = round((tracemalloc.get_traced_memory()[1] - malloc_base) / 2**20, 1)
+            entry.update(rec.info)
+            self.stages.append(entry)
+
+    # ---- output
+    def to_dict(self, **meta) -> dict:
+        return {
+            "kind": "keyword-profile",
+            "start": self.started,
+            "end": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            **meta,
+            "total_wall_s": round(sum(s["wall_s"] for s in self.stages), 4),
+            "total_cpu_s": round(sum(s["cpu_s"] for s in self.stages), 4),
+            "stages": self.stages,
+        }
+
+    def write(self, logs_dir: str = LOGS_DIR, **meta) -> str:
+        """Write logs/keyword-profile-<ts>-<id>.json (plus a .prof per cProfiled stage); returns the JSON path."""
+        os.makedirs(logs_dir, exist_ok=True)
+        # The suffix keeps runs finishing in the same second (daemon jobs, parallel CLIs) apart
+        ts = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        base = os.path.join(logs_dir, f"keyword-profile-{ts}")
+        trace = self.to_dict(**meta)
+        for name, prof in self._profiles.items():
+            prof_path = f"{base}-{name}.prof"
+            prof.dump_stats(prof_path)
+            trace.setdefault("cprofile", {})[name] = prof_path
+        with open(f"{base}.json", "w", encoding="utf-8") as f:
+            json.dump(trace, f, indent=2)
+        return f"{base}.json"
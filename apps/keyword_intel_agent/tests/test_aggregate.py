@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+import pytest
+from apps.keyword_intel_agent.src.aggregate import aggregate_chunks, aggregate_keywords
+
+
+def _gsc(n: int = 400) -> pd.DataFrame:
+    rnd = np.random.default_rng(0)
+    return pd.DataFrame({
+        "page": rnd.choice(["/a", "/b", "/c", None], n), "query": [f"q{i}" for i in range(n)],
+        "clicks": rnd.integers(0, 5, n), "impressions": rnd.choice([0, 10, 10, 20], n),
+        "ctr": np.where(rnd.random(n) < 0.2, np.nan, rnd.random(n)),
+        "position": np.where(rnd.random(n) < 0.2, np.nan, rnd.random(n) * 20),
+        "kw_norm": rnd.choice(["x", "y", "z", "w", None], n),
+    })
+
+
+def _ads(n: int = 400) -> pd.DataFrame:
+    rnd = np.random.default_rng(1)
+    return pd.DataFrame({
+        "campaign": rnd.choice(["c1", "c2"], n), "adgroup": rnd.choice(["g1", "g2", "g3"], n),
+        "keyword": [f"k{i}" for i in range(n)], "clicks": rnd.choice([0, 1, 1, 3], n),
+        "cost": rnd.random(n) * 10, "cpc": np.where(rnd.random(n) < 0.2, np.nan, rnd.random(n)),
+        "conversions": rnd.integers(0, 2, n), "kw_norm": rnd.choice(["x", "y", "v", None], n),
+    })
+
+
+@pytest.mark.parametrize("kind, df", [("gsc", _gsc()), ("ads", _ads())])
+@pytest.mark.parametrize("size", [1, 37, 1000])
+def test_chunks_match_full_aggregate(kind, df, size):
+    # Weight ties, NaN keys and blank cells must resolve as in one full pass
+    chunks = (df.iloc[i:i + size] for i in range(0, len(df), size))
+    pd.testing.assert_frame_equal(aggregate_chunks(chunks, kind), aggregate_keywords(df, kind),
+                                  check_exact=False, atol=1e-9)
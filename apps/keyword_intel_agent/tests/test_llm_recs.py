@@ -0,0 +1,85 @@
+import pandas as pd
+import pytest
+from apps.keyword_intel_agent.src import mock_llm
+from apps.keyword_intel_agent.src.llm_recs import KeywordCache, LLMRecommender, llm_recommendations
+
+
+def _organic(n: int, start: int = 0) -> pd.DataFrame:
+    return pd.DataFrame({"query": [f"kw {i}" for i in range(start, start + n)],
+                         "impressions": [1000 - i for i in range(start, start + n)]})
+
+
+def _paid(n: int) -> pd.DataFrame:
+    return pd.DataFrame({"keyword": [f"ad {i}" for i in range(n)], "cost": [10.0 * (i + 1) for i in range(n)],
+                         "conversions": [0] * n})
+
+
+@pytest.fixture
+def server():
+    srv = mock_llm.serve_in_thread()
+    yield srv
+    srv.shutdown()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    c = KeywordCache(str(tmp_path / "llm.sqlite"))
+    yield c
+    c.close()
+
+
+def _recommender(server, cache, **kw) -> LLMRecommender:
+    return LLMRecommender(model="mock", api_key="mock", base_url=f"{server.url}/v1", cache=cache,
+                          batch_tokens=40, **kw)
+
+
+def test_recommendations_from_mock(server, cache):
+    md, table = llm_recommendations(None, _organic(6), _paid(3), _recommender(server, cache))
+    assert len(table) == 9
+    assert set(table[table.segment == "organic"].action) == {"launch_ads"}
+    assert set(table[table.segment == "paid"].action) == {"pause"}
+    assert "9 keywords (0 cached)" in md
+
+
+def test_second_run_is_served_from_cache(server, cache):
+    llm_recommendations(None, _organic(6), _paid(3), _recommender(server, cache))
+    calls = server.calls
+    md, table = llm_recommendations(None, _organic(6), _paid(3), _recommender(server, cache))
+    assert server.calls == calls
+    assert "unreviewed" not in set(table.action)
+    assert "9 keywords (9 cached), 0 batches" in md
+
+
+def test_shifted_keywords_reuse_cached_lines(server, cache):
+    llm_recommendations(None, _organic(6), None, _recommender(server, cache))
+    # One new keyword at the front shifts every batch boundary; only it is sent
+    rec = _recommender(server, cache)
+    _, table = llm_recommendations(None, pd.concat([_organic(1, start=99), _organic(6)]), None, rec)
+    assert rec.stats["cached"] == 6
+    assert rec.stats["batches"] == 1
+    assert set(table.action) == {"launch_ads"}
+
+
+def test_unanswered_keywords_are_not_cached(server, cache, monkeypatch):
+    real = mock_llm.answer
+    monkeypatch.setattr(mock_llm, "answer", lambda line: None if "kw 2" in line else real(line))
+    _, table = llm_recommendations(None, _organic(4), None, _recommender(server, cache))
+    assert table.set_index("keyword").loc["kw 2", "action"] == "unreviewed"
+
+    monkeypatch.setattr(mock_llm, "answer", real)
+    rec = _recommender(server, cache)
+    _, table = llm_recommendations(None, _organic(4), None, rec)
+    assert rec.stats["cached"] == 3
+    assert table.set_index("keyword").loc["kw 2", "action"] == "launch_ads"
+
+
+def test_rate_limited_calls_are_retried(cache):
+    srv = mock_llm.serve_in_thread(limit_every=2, retry_after=0.05)
+    try:
+        rec = _recommender(srv, cache, concurrency=1)
+        _, table = llm_recommendations(None, _organic(20), None, rec)
+    finally:
+        srv.shutdown()
+    assert rec.stats["batches"] > 1 and rec.stats["failed"] == 0
+    assert srv.calls > rec.stats["batches"]
+    assert "unreviewed" not in set(table.action)
@@ -2,10 +2,15 @@
 import pandas as pd
 import streamlit as st
 
-from apps.keyword_intel_agent.src.loaders import load_gsc_csv, load_ads_csv
-from apps.keyword_intel_agent.src.metrics import add_kw_norm_cols, compute_overlap_segments, roi_signals
+from apps.keyword_intel_agent.src.cache import FrameCache, content_hash, load_normalized_inputs
+from apps.keyword_intel_agent.src.metrics import compute_overlap_segments, roi_signals
 from apps.keyword_intel_agent.src.joiner import tidy_columns_for_display
 from apps.keyword_intel_agent.src.ai import fallback_rules
+from apps.keyword_intel_agent.src.llm_recs import LLMRecommender, KeywordCache, llm_recommendations
+from apps.keyword_intel_agent.src.compact import compact_inputs, expand
+from apps.keyword_intel_agent.src.aggregate import aggregate_inputs
+from apps.keyword_intel_agent.src.profiling import PipelineProfiler
+from apps.keyword_intel_agent.src.matching import available_matchers
 
 # ---------- Page + state ----------
 st.set_page_config(page_title="SEO ↔ SEM Keyword Intelligence", page_icon="🔎", layout="wide")
@@ -13,26 +18,79 @@ if "fuzzy" not in st.session_state: st.session_state.fuzzy = False
 if "threshold" not in st.session_state: st.session_state.threshold = 90
 if "api_mode" not in st.session_state: st.session_state.api_mode = False
 if "use_samples" not in st.session_state: st.session_state.use_samples = True
+if "compact" not in st.session_state: st.session_state.compact = False
+if "aggregate" not in st.session_state: st.session_state.aggregate = False
+if "matcher" not in st.session_state: st.session_state.matcher = "rapidfuzz"
 
 # ---------- Helpers ----------
-def read_samples():
-    base = os.path.dirname(os.path.dirname(__file__))  # ui/ -> keyword_intel_agent/
-    data_dir = os.path.join(base, "data")
-    return (
-        load_gsc_csv(os.path.join(data_dir, "sample_gsc.csv")),
-        load_ads_csv(os.path.join(data_dir, "sample_ads.csv")),
-    )
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))  # ui/ -> keyword_intel_agent/
+FRAME_CACHE = FrameCache(os.getenv("KW_CACHE_DIR", os.path.join(BASE_DIR, ".cache", "frames")))
+CACHE_TTL = int(os.getenv("KW_UI_CACHE_TTL", "3600"))
+LLM_CACHE = os.getenv("KW_LLM_CACHE", os.path.join(BASE_DIR, ".cache", "llm.sqlite"))
 
 def resolve_inputs(gf, af, use_samples: bool):
+    """Return (gsc_key, ads_key, gsc_src, ads_src); keys are content hashes of the inputs."""
     if use_samples or (gf is None and af is None):
-        return read_samples()
-    if gf is None or af is None:
+        data_dir = os.path.join(BASE_DIR, "data")
+        gf, af = os.path.join(data_dir, "sample_gsc.csv"), os.path.join(data_dir, "sample_ads.csv")
+    elif gf is None or af is None:
         st.warning("Upload **both** GSC and Ads CSVs, or toggle **Use sample data**.")
         st.stop()
-    return load_gsc_csv(gf), load_ads_csv(af)
+    return content_hash(gf), content_hash(af), gf, af
+
+# ---------- Cached pipeline ----------
+# Stages are keyed by input content hashes + matching settings. cache_resource
+# hands every session the same objects instead of per-session copies, so the
+# cached frames are treated as read-only below.
+@st.cache_resource(max_entries=8, ttl=CACHE_TTL, show_spinner="Loading inputs…")
+def cached_inputs(gsc_key: str, ads_key: str, _gsc_src, _ads_src):
+    return load_normalized_inputs(_gsc_src, _ads_src, FRAME_CACHE)
+
+@st.cache_resource(max_entries=8, ttl=CACHE_TTL, show_spinner="Preparing keyword tables…")
+def cached_prepared(gsc_key: str, ads_key: str, compact: bool, aggregate: bool, _gsc, _ads):
+    """(gsc, ads, drilldown) after the optional compact and per-keyword aggregation steps."""
+    if compact:
+        _gsc, _ads = compact_inputs(_gsc, _ads)
+    if aggregate:
+        return aggregate_inputs(_gsc, _ads, drilldown=True)
+    return _gsc, _ads, None
+
+@st.cache_resource(max_entries=16, ttl=CACHE_TTL, show_spinner="Matching keywords…")
+def cached_segments(gsc_key: str, ads_key: str, fuzzy: bool, threshold: int, compact: bool, aggregate: bool,
+                    matcher: str, _gsc, _ads):
+    return compute_overlap_segments(_gsc, _ads, fuzzy=fuzzy, threshold=threshold, matcher=matcher)
+
+@st.cache_resource(max_entries=16, ttl=CACHE_TTL, show_spinner="Scoring overlap…")
+def cached_signals(gsc_key: str, ads_key: str, fuzzy: bool, threshold: int, compact: bool, aggregate: bool,
+                   matcher: str, _overlap):
+    return roi_signals(_overlap) if not _overlap.empty else _overlap
+
+@st.cache_resource(max_entries=16, ttl=CACHE_TTL)
+def cached_recommendations(gsc_key: str, ads_key: str, fuzzy: bool, threshold: int, compact: bool,
+                           aggregate: bool, matcher: str, _overlap, _organic_only, _paid_only) -> str:
+    return fallback_rules(_overlap, _organic_only, _paid_only)
 
-def df_bytes(df: pd.DataFrame) -> bytes:
-    return df.to_csv(index=False).encode("utf-8")
+@st.cache_resource(show_spinner=False)
+def llm_keyword_cache() -> KeywordCache:
+    return KeywordCache(LLM_CACHE)
+
+@st.cache_resource(max_entries=16, ttl=CACHE_TTL, show_spinner="Asking the LLM…")
+def cached_llm_recommendations(gsc_key: str, ads_key: str, fuzzy: bool, threshold: int, compact: bool,
+                               aggregate: bool, matcher: str, _overlap, _organic_only, _paid_only):
+    """(markdown, table); keywords answered in earlier sessions come from the SQLite keyword cache."""
+    return llm_recommendations(_overlap, _organic_only, _paid_only, LLMRecommender(cache=llm_keyword_cache()))
+
+@st.cache_data(max_entries=32, ttl=CACHE_TTL, show_spinner="Preparing download…")
+def cached_csv(run_key: tuple, name: str, _df: pd.DataFrame) -> bytes:
+    return _df.to_csv(index=False).encode("utf-8")
+
+@st.fragment
+def lazy_download(label: str, file_name: str, mime: str, make_bytes):
+    """Build the file only when asked for; reruns stay inside this fragment."""
+    flag = f"dl-{file_name}"
+    if st.session_state.get(flag) or st.button(f"Prepare {file_name}", key=f"prep-{file_name}", width="stretch"):
+        st.session_state[flag] = True
+        st.download_button(label, make_bytes(), file_name, mime, width="stretch", on_click="ignore")
 
 def kpis(overlap, organic_only, paid_only):
     c1, c2, c3 = st.columns(3)
@@ -54,23 +112,62 @@ with st.sidebar:
     st.divider()
     st.header("Matching")
     st.session_state.fuzzy = st.checkbox("Enable fuzzy matching", value=st.session_state.fuzzy)
+    # Backends whose optional dependencies are missing are not offered
+    backends = sorted(available_matchers())
+    if st.session_state.matcher not in backends: st.session_state.matcher = "rapidfuzz"
+    st.session_state.matcher = st.selectbox(
+        "Fuzzy backend", backends, index=backends.index(st.session_state.matcher),
+        help="rapidfuzz: token_sort_ratio edit distance. tfidf: character n-gram TF-IDF cosine "
+             "(needs scipy; much faster on large keyword sets). Both score 0-100."
+    )
     st.session_state.threshold = st.slider("Fuzzy threshold", 70, 100, st.session_state.threshold, 1)
     st.caption("Tip: Start exact, then try fuzzy ~90 for variant mapping.")
+    st.session_state.compact = st.checkbox(
+        "Compact memory mode", value=st.session_state.compact,
+        help="Keep keywords as shared categorical codes and downcast counts; same results, less memory."
+    )
+    st.session_state.aggregate = st.checkbox(
+        "Aggregate per keyword", value=st.session_state.aggregate,
+        help="One row per normalized keyword on each side (summed clicks/impressions/cost, weighted "
+             "position/CTR/CPC) before joining. Drill into the detail rows from the Overlap tab."
+    )
 
     st.divider()
-    st.header("API mode (placeholder)")
+    st.header("LLM recommendations")
     st.session_state.api_mode = st.checkbox(
-        "Use API mode (GA4/Ads connectors)",
+        "Use API mode (LLM per-keyword recommendations)",
         value=st.session_state.api_mode,
-        help="Not wired yet — placeholder for future ingestion."
+        help="Sends the top keywords of each segment in batches to an OpenAI-compatible endpoint "
+             "(OPENAI_API_KEY, OPENAI_BASE_URL, KW_LLM_MODEL). Answered keywords are cached under .cache/."
     )
 
     run = st.button("Run analysis", type="primary", width="stretch")
 
 # ---------- Pipeline ----------
 if run:
-    # Load
-    gsc_df, ads_df = resolve_inputs(gsc_file, ads_file, st.session_state.use_samples)
+    gsc_key, ads_key, gsc_src, ads_src = resolve_inputs(gsc_file, ads_file, st.session_state.use_samples)
+    # Results stay on screen across reruns (tab switches, downloads) until the next run
+    st.session_state.analysis = {
+        "gsc_key": gsc_key, "ads_key": ads_key, "gsc_src": gsc_src, "ads_src": ads_src,
+        "fuzzy": st.session_state.fuzzy, "threshold": st.session_state.threshold,
+        "compact": st.session_state.compact, "aggregate": st.session_state.aggregate,
+        "matcher": st.session_state.matcher, "api_mode": st.session_state.api_mode,
+    }
+    for k in [k for k in st.session_state if str(k).startswith("dl-")]:
+        del st.session_state[k]
+
+if "analysis" in st.session_state:
+    a = st.session_state.analysis
+    run_key = (a["gsc_key"], a["ads_key"], a["fuzzy"], a["threshold"], a["compact"], a["aggregate"],
+               a["matcher"])
+
+    # Per-stage timings for this rerun; cache hits show up as near-zero stages
+    prof = PipelineProfiler()
+
+    # Load (kw_norm included)
+    with prof.stage("load") as rec:
+        gsc_df, ads_df = cached_inputs(a["gsc_key"], a["ads_key"], a["gsc_src"], a["ads_src"])
+        rec.rows_out = (gsc_df, ads_df)
 
     # Soft schema checks
     gsc_must = {"page","query","clicks","impressions","ctr","position"}
@@ -80,18 +177,19 @@ if run:
     if miss_gsc: st.warning(f"GSC CSV missing: {', '.join(miss_gsc)}")
     if miss_ads: st.warning(f"Ads CSV missing: {', '.join(miss_ads)}")
 
-    # Normalize + join
-    gsc_df, ads_df = add_kw_norm_cols(gsc_df, ads_df)
-    seg = compute_overlap_segments(
-        gsc_df, ads_df,
-        fuzzy=st.session_state.fuzzy,
-        threshold=st.session_state.threshold
-    )
-    overlap = seg["overlap"]
+    # Join + signals
+    with prof.stage("prepare", rows_in=(gsc_df, ads_df)) as rec:
+        gsc_df, ads_df, drill = cached_prepared(a["gsc_key"], a["ads_key"], a["compact"], a["aggregate"],
+                                                gsc_df, ads_df)
+        rec.rows_out = (gsc_df, ads_df)
+    with prof.stage("overlap", rows_in=(gsc_df, ads_df)) as rec:
+        seg = cached_segments(*run_key, gsc_df, ads_df)
+        rec.rows_out = seg
+    with prof.stage("signals", rows_in=seg["overlap"]) as rec:
+        overlap = cached_signals(*run_key, seg["overlap"])
+        rec.rows_out = overlap
     organic_only = seg["organic_only"]
     paid_only = seg["paid_only"]
-    if not overlap.empty:
-        overlap = roi_signals(overlap)
 
     st.success("Done!")
     kpis(overlap, organic_only, paid_only)
@@ -104,57 +202,68 @@ if run:
         if overlap.empty:
             st.info("No overlap found. Try fuzzy matching or adjust threshold.")
         else:
-            tidy = tidy_columns_for_display(overlap)
+            tidy = tidy_columns_for_display(expand(overlap))
             st.dataframe(tidy, width="stretch", height=420)
-            st.download_button(
-                "Download Overlap CSV",
-                df_bytes(tidy),
-                "overlap.csv",
-                "text/csv",
-                width="stretch"
-            )
+            lazy_download("Download Overlap CSV", "overlap.csv", "text/csv",
+                          lambda: cached_csv(run_key, "overlap", tidy))
+            if drill is not None:
+                with st.expander("Drill down to detail rows"):
+                    # Aggregated overlap has one row per (GSC) keyword, highest priority first
+                    ranked = overlap.sort_values("priority", ascending=False, kind="stable")
+                    rows = dict(zip(ranked["kw_norm"].astype(str), range(len(ranked))))
+                    r = ranked.iloc[rows[st.selectbox("Keyword", list(rows))]]
+                    st.caption("GSC pages")
+                    st.dataframe(drill["gsc"].rows(r.get("kw_norm_gsc", r["kw_norm"])), width="stretch")
+                    st.caption("Ads rows")
+                    st.dataframe(drill["ads"].rows(r.get("kw_norm_ads", r["kw_norm"])), width="stretch")
 
     with tab2:
         st.subheader("Organic-Only (opportunities to test in Ads)")
-        tidy = tidy_columns_for_display(organic_only)
-        st.dataframe(tidy, width="stretch", height=420)
-        st.download_button(
-            "Download Organic-Only CSV",
-            df_bytes(tidy),
-            "organic_only.csv",
-            "text/csv",
-            width="stretch"
-        )
+        tidy_org = tidy_columns_for_display(expand(organic_only))
+        st.dataframe(tidy_org, width="stretch", height=420)
+        lazy_download("Download Organic-Only CSV", "organic_only.csv", "text/csv",
+                      lambda: cached_csv(run_key, "organic_only", tidy_org))
 
     with tab3:
         st.subheader("Paid-Only (ads without organic presence)")
-        tidy = tidy_columns_for_display(paid_only)
-        st.dataframe(tidy, width="stretch", height=420)
-        st.download_button(
-            "Download Paid-Only CSV",
-            df_bytes(tidy),
-            "paid_only.csv",
-            "text/csv",
-            width="stretch"
-        )
+        tidy_paid = tidy_columns_for_display(expand(paid_only))
+        st.dataframe(tidy_paid, width="stretch", height=420)
+        lazy_download("Download Paid-Only CSV", "paid_only.csv", "text/csv",
+                      lambda: cached_csv(run_key, "paid_only", tidy_paid))
 
     with tab4:
         st.subheader("Recommendations")
-        md = fallback_rules(overlap, organic_only, paid_only)
+        with prof.stage("recommendations", rows_in=(overlap, organic_only, paid_only)):
+            if a.get("api_mode"):
+                md, llm_table = cached_llm_recommendations(*run_key, overlap, organic_only, paid_only)
+            else:
+                md, llm_table = cached_recommendations(*run_key, overlap, organic_only, paid_only), None
         st.markdown(md)
+        if llm_table is not None:
+            st.dataframe(llm_table, width="stretch", height=420)
+            lazy_download("Download LLM recommendations CSV", "recommendations_llm.csv", "text/csv",
+                          lambda: cached_csv(run_key, "recommendations_llm", llm_table))
         st.download_button(
             "Download recommendations.md",
             md.encode("utf-8"),
             "recommendations.md",
             "text/markdown",
-            width="stretch"
+            width="stretch",
+            on_click="ignore"
         )
 
+    with st.expander("Performance"):
+        perf = pd.DataFrame(prof.stages).set_index("stage")
+        st.dataframe(perf, width="stretch")
+        st.caption(f"Total {perf['wall_s'].sum():.3f}s wall / {perf['cpu_s'].sum():.3f}s CPU this rerun. "
+                   "Cached stages only pay the lookup; use `cli.py --profile` for a JSON trace.")
+
 # ---------- Help ----------
 with st.expander("What’s happening under the hood"):
     st.markdown("""
-- **pandas** loads CSVs, normalizes keywords → `kw_norm`
-- **Join** on `kw_norm` (exact) or via **RapidFuzz** mapping (fuzzy)
+- **pandas** loads CSVs, normalizes keywords → `kw_norm` (cached by file content under `.cache/`)
+- **Join** on `kw_norm` (exact) or via **RapidFuzz** mapping (fuzzy); optionally after rolling each side up to one row per keyword
 - **Signals** on Overlap: expected CTR → CTR gap → `organic_potential`; flags for CPC/rank
-- **Output**: 3 tables + actionable Markdown summary
+- **Output**: 3 tables + actionable Markdown summary; stages are cached per input/settings and CSVs are built on demand
+- **API mode**: per-keyword actions from an LLM, sent as token-budgeted batches with a few calls in flight; answered keywords are cached
 """)
\ No newline at end of file
@@ -1,4 +1,4 @@
-import os, sys, json, datetime as dt
+import os, sys
 from pathlib import Path
 import streamlit as st
 
@@ -20,10 +20,12 @@ LOGS_DIR = REPO_ROOT / "logs"
 if str(AGENT_DEMO_DIR) not in sys.path:
     sys.path.append(str(AGENT_DEMO_DIR))
 
-# Try to import the (mock) agent
+# Try to import the (mock) agent and its executor
 run_agent = None
 try:
     from agent import run_agent as _run_agent
+    from executor import AgentExecutor, QueueFull
+    from trace_store import TraceStore
     run_agent = _run_agent
 except Exception as e:
     # we won't crash the UI; we'll show a message in the logs tab
@@ -31,6 +33,41 @@ except Exception as e:
 else:
     _agent_import_error = None
 
+
+@st.cache_resource
+def get_store():
+    store = TraceStore(LOGS_DIR / "traces.sqlite3")
+    store.import_json_logs(LOGS_DIR)  # older one-file-per-run traces
+    return store
+
+
+def save_trace(job) -> None:
+    """Index a finished run (failed ones too) in the trace store."""
+    result = job.result or {
+        "final_text": None,
+        "trace": {"start": job.started, "end": job.finished, "mode": None,
+                  "steps": [{k: v for k, v in ev.items() if k not in ("seq", "at")} for ev in job.events]},
+    }
+    get_store().put(f"mock-agent-{job.id}", result, status=job.outcome, prompt=job.prompt)
+    job.trace_file = f"mock-agent-{job.id}"
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def load_steps(run_id: str) -> list[dict]:
+    """A run's steps, decompressed once per run rather than on every Step change."""
+    rec = get_store().load(run_id)
+    if rec is None:
+        # Raised rather than returned, so a run that isn't readable yet is not cached as empty
+        raise LookupError(run_id)
+    return rec["trace"].get("steps", [])
+
+
+@st.cache_resource
+def get_executor():
+    # One pool for the whole server: runs survive reruns and are shared across sessions
+    return AgentExecutor(max_workers=4, on_done=save_trace)
+
+
 # -----------------------------
 # Sidebar (global controls)
 # -----------------------------
@@ -61,7 +98,7 @@ with tabs[0]:
 
     st.write(
         """
-        **Phase 1C:** Click **Run Agent** to execute the mock agent and write a JSON trace to `logs/`.
+        **Phase 1C:** Click **Run Agent** to execute the mock agent and record its trace in `logs/traces.sqlite3`.
         Then open **Agent Logs** to view the latest run details.
         """
     )
@@ -81,54 +118,91 @@ with tabs[1]:
         with run_col:
             if st.button("▶️ Run Agent (mock)"):
                 try:
-                    res = run_agent(prompt)
-                    # Save a JSON trace, just like main.py does
-                    LOGS_DIR.mkdir(parents=True, exist_ok=True)
-                    ts = dt.datetime.now().strftime("%Y%m%d-%H%M%S")
-                    out_path = LOGS_DIR / f"mock-agent-{ts}.json"
-                    with open(out_path, "w", encoding="utf-8") as f:
-                        json.dump(res, f, indent=2)
-                    st.session_state.last_run = ts
-                    st.success(f"Agent run completed. Trace saved: {out_path.name}")
-                    st.write("**Final Answer**")
-                    st.code(res.get("final_text", ""), language="markdown")
-                except Exception as e:
-                    st.error(f"Agent run failed: {e}")
+                    job_id = get_executor().submit(prompt)
+                    st.session_state.setdefault("job_ids", []).insert(0, job_id)
+                except QueueFull as e:
+                    st.error(f"Agent run not started: {e}")
+
+        def session_jobs():
+            return [j for j in map(get_executor().get, st.session_state.get("job_ids", [])) if j]
+
+        def job_monitor():
+            jobs = session_jobs()
+            for job in jobs:
+                label = f"{job.id} · {job.status} · {job.prompt[:60]}"
+                with st.expander(label, expanded=job.status in ("queued", "running")):
+                    for ev in job.events_since(0):
+                        st.markdown(f"**{ev['type']}**")
+                        st.json({k: v for k, v in ev.items() if k not in ("seq", "at", "type")}, expanded=False)
+                    if job.status == "done":
+                        st.session_state.last_run = job.finished
+                        st.success(f"Agent run completed. Trace saved: {job.trace_file or '—'}")
+                        st.write("**Final Answer**")
+                        st.code(job.result.get("final_text", ""), language="markdown")
+                    elif job.status == "failed":
+                        st.error(f"Agent run failed: {job.error}")
+            if st.session_state.get("monitor_polling") and not any(
+                    j.status in ("queued", "running") for j in jobs):
+                # The last run just finished: rerun the page so the monitor stops
+                # polling and the Overview and Agent Logs tabs pick it up
+                st.session_state.monitor_polling = False
+                st.rerun(scope="app")
+
+        # While runs are in flight the monitor reruns on its own every 0.5s, so
+        # steps show up as they happen; idle, it renders once
+        polling = any(j.status in ("queued", "running") for j in session_jobs())
+        st.session_state.monitor_polling = polling
+        st.fragment(job_monitor, run_every=0.5 if polling else None)()
 
 # ---- Agent Logs
 with tabs[2]:
     st.subheader("Agent Logs")
-    if not LOGS_DIR.exists():
-        st.info("No logs directory yet. Run the agent first.")
+    if _agent_import_error:
+        st.info("Trace store unavailable until the agent imports.")
     else:
-        # Find recent JSON traces
-        traces = sorted(LOGS_DIR.glob("mock-agent-*.json"), reverse=True)
-        if not traces:
-            st.info("No mock-agent JSON traces found yet. Click **Run Agent**.")
+        store = get_store()
+        # Filters and paging run as indexed SQL; steps are loaded one at a time
+        f1, f2, f3, f4 = st.columns(4)
+        mode = f1.selectbox("Mode", ["(any)"] + store.modes())
+        status = f2.selectbox("Status", ["(any)", "done", "failed"])
+        day_from = f3.date_input("From", value=None)
+        day_to = f4.date_input("To", value=None)
+        filters = {"mode": None if mode == "(any)" else mode, "status": None if status == "(any)" else status,
+                   "day_from": day_from, "day_to": day_to}
+
+        total = store.count(**filters)
+        if not total:
+            if any(filters.values()):
+                st.info("No traces match these filters.")
+            else:
+                st.info("No agent traces found yet. Click **Run Agent**.")
         else:
-            # List the recent logs and show the selected one
-            names = [p.name for p in traces]
-            choice = st.selectbox("Select a trace to view", names, index=0)
-            selected = LOGS_DIR / choice
-            try:
-                data = json.loads(selected.read_text(encoding="utf-8"))
-            except Exception as e:
-                st.error(f"Failed to read {choice}: {e}")
-                data = None
-
-            if data:
-                st.markdown(f"**Trace file:** `{choice}`")
-                # Summary
-                meta_cols = st.columns(3)
-                meta_cols[0].metric("Steps", len(data.get("trace", {}).get("steps", [])))
-                meta_cols[1].metric("Mode", data.get("trace", {}).get("mode", "—"))
-                meta_cols[2].metric("Started", data.get("trace", {}).get("start", "—"))
-
-                st.divider()
-                st.write("### Final Answer")
-                st.code(data.get("final_text", ""), language="markdown")
-
-                st.write("### Steps")
-                for i, step in enumerate(data.get("trace", {}).get("steps", []), start=1):
-                    with st.expander(f"Step {i}: {step.get('type','(unknown)')}"):
-                        st.json(step)
+            page_size = 25
+            pages = (total + page_size - 1) // page_size
+            page = st.number_input(f"Page (of {pages}, {total} runs)", min_value=1, max_value=pages, value=1)
+            runs = store.list_runs(limit=page_size, offset=(page - 1) * page_size, **filters)
+            labels = {r["run_id"]: f"{r['run_id']} · {r['status']} · {r['n_steps']} steps" for r in runs}
+            choice = st.selectbox("Select a trace to view", list(labels), format_func=labels.get, index=0)
+            run = store.get_run(choice)
+
+            st.markdown(f"**Trace:** `{choice}`")
+            # Summary
+            meta_cols = st.columns(3)
+            meta_cols[0].metric("Steps", run["n_steps"])
+            meta_cols[1].metric("Mode", run["mode"] or "—")
+            meta_cols[2].metric("Started", run["started"] or "—")
+
+            st.divider()
+            st.write("### Final Answer")
+            st.code(run["final_text"] or "", language="markdown")
+
+            st.write("### Steps")
+            types = store.step_types(choice)
+            if types:
+                idx = st.radio("Step", range(len(types)), horizontal=True,
+                               format_func=lambda i: f"{i + 1}: {types[i] or '(unknown)'}")
+                try:
+                    steps = load_steps(choice)
+                except LookupError:
+                    steps = []
+                st.json(steps[idx] if idx < len(steps) else None)